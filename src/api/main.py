@@ -1,33 +1,72 @@
 # filepath: c:\Users\lucas\Projects\chat-with-pdf\api.py
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, Request
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import os
 import asyncio
-import json
-from typing import Dict, Tuple, AsyncGenerator
+from contextlib import asynccontextmanager
+from typing import Dict, Tuple, AsyncGenerator, Optional
 
 from src.config.settings import settings
 from src.core.services import IndexService, QueryService
 from src.core.event_manager import EventManager
 from src.core.observers import LoggingObserver
 from src.core.prompt_builder import PromptBuilder
-from src.core.llm_client import LLMClient
+from src.core.llm_client import LLMClient, GenerationOptions
+from src.core.service_cache import ServiceCache
+from src.core.response_cache import response_cache_stats
+from src.core.admission import GenerationQueueFullError, classify_priority
+from src.core.llm_client import get_admission_controller
+from src.core.ollama_pool import get_ollama_pool
+from src.core.single_flight import SingleFlight
+from src.api.sse import SSEWriter
+from src.api.upload_limit import UploadSizeLimitMiddleware
+from src.core.indexing_jobs import IndexingJob, IndexingJobManager, IndexingQueueFullError
+from src.utils.file_utils import has_index, save_upload_streaming, UploadTooLargeError
+from src.infra.embeddings_factory import embedding_registry
+from src.infra.embedding_cache import embedding_cache_stats, query_embedding_cache_stats
+from src.infra.index_catalog import get_index_catalog
 
 import logging
 import uvicorn
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.EMBEDDING_WARMUP_ON_STARTUP:
+        # Load the shared embedding model before serving so the first /ask does not pay for it
+        logger.info(f"Warming up embedding model '{settings.EMBEDDING_MODEL_NAME}'...")
+        await asyncio.to_thread(embedding_registry.warm_up, settings.EMBEDDING_MODEL_NAME, settings.DEVICE_CONFIGURATION)
+    indexing_jobs.start()
+    yield
+    await indexing_jobs.stop()
+
 app = FastAPI(
     title="Chat with PDF API",
     version="1.1.0",
-    description="API for uploading PDFs and asking questions about their content."
+    description="API for uploading PDFs and asking questions about their content.",
+    lifespan=lifespan
+)
+# Oversized uploads that declare their size are refused before the body is received
+app.add_middleware(UploadSizeLimitMiddleware, path="/upload-pdf/", max_bytes=settings.API_PDF_MAX_SIZE_MB * 1024 * 1024)
+
+# Global LRU cache for service instances, keyed by PDF filename (basename).
+# Bounded by SERVICE_CACHE_MAX_SIZE entries and an estimated memory budget; evicted PDFs are reloaded from disk on demand.
+service_instances_cache = ServiceCache(
+    max_entries=settings.SERVICE_CACHE_MAX_SIZE,
+    max_bytes=settings.SERVICE_CACHE_MAX_MEMORY_MB * 1024 * 1024
+)
+# Coordinates concurrent loads/builds of the same PDF's services
+service_loader = SingleFlight()
+# PDF name -> content hash -> content-addressed index
+index_catalog = get_index_catalog(settings.INDICES_DIR)
+# Encodes /ask streams, batching answer tokens into fewer, larger SSE events
+sse_writer = SSEWriter(
+    flush_interval=settings.SSE_FLUSH_INTERVAL_MS / 1000,
+    flush_chars=settings.SSE_FLUSH_MAX_CHARS,
+    max_buffered_events=settings.SSE_MAX_BUFFERED_EVENTS,
+    disconnect_poll_interval=settings.SSE_DISCONNECT_POLL_SECONDS
 )
-
-# Global cache for service instances, keyed by PDF filename (basename)
-# This is a simple in-memory cache. For production, consider a more robust solution
-# or manage service lifecycles with FastAPI dependencies if appropriate.
-service_instances_cache: Dict[str, Tuple[IndexService, QueryService]] = {}
 
 # Setup global event manager and logger for API context
 api_event_manager = EventManager()
@@ -36,7 +75,9 @@ event_types_to_log = [
     'index_setup_started', 'index_loaded', 'index_creation_started', 'chunks_split', 
     'index_created', 'index_setup_completed', 'retrieval_started', 'retrieval_completed', 
     'generation_started', 'generation_completed', 'generation_failed', 'api_upload_request',
-    'api_ask_request'
+    'api_ask_request', 'indexing_job_queued', 'indexing_job_started', 'indexing_job_completed',
+    'indexing_job_failed', 'index_incremental_update', 'semantic_cache_hit',
+    'answer_stream_joined', 'context_packed', 'generation_first_token', 'generation_cancelled'
 ]
 for ev_type in event_types_to_log:
     api_event_manager.subscribe(ev_type, api_logger)
@@ -46,10 +87,34 @@ class UploadResponse(BaseModel):
     message: str
     pdf_filename: str
     index_status: str
+    job_id: Optional[str] = None # Poll GET /jobs/{job_id} for indexing progress
+    content_hash: Optional[str] = None # SHA-256 of the PDF; identical content shares one index
+
+class IndexingJobStatus(BaseModel):
+    job_id: str
+    pdf_filename: str
+    status: str # 'queued' | 'running' | 'completed' | 'failed'
+    stage: str
+    progress: float
+    chunk_count: Optional[int] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
 
 class QuestionRequest(BaseModel):
     pdf_filename: str # Basename of the PDF, e.g., "mydoc.pdf"
     question: str
+    priority: Optional[str] = None # 'interactive' | 'normal' | 'bulk'; short questions default to 'interactive'
+    # Per-request Ollama options; unset ones come from the settings (OLLAMA_KEEP_ALIVE, LLM_CONTEXT_WINDOW, OLLAMA_NUM_PREDICT)
+    keep_alive: Optional[str] = None
+    num_ctx: Optional[int] = Field(default=None, gt=0)
+    num_predict: Optional[int] = None
+
+    def generation_options(self) -> Optional[GenerationOptions]:
+        if self.keep_alive is None and self.num_ctx is None and self.num_predict is None:
+            return None
+        return GenerationOptions(keep_alive=self.keep_alive, num_ctx=self.num_ctx, num_predict=self.num_predict)
 
 # SSE Stream Event Model (conceptual, not directly used by Pydantic for StreamingResponse)
 # class SSEEvent(BaseModel):
@@ -57,14 +122,36 @@ class QuestionRequest(BaseModel):
 #     data: str # JSON stringified data
 
 # --- Helper Function to Get or Create Services ---
-async def get_or_create_services(pdf_filename_basename: str, force_reindex: bool = False) -> Tuple[IndexService, QueryService]:
-    if pdf_filename_basename in service_instances_cache and not force_reindex:
-        logger.info(f"Using cached services for {pdf_filename_basename}")
-        # Potentially re-validate if index still exists or needs refresh if not forcing
-        # For simplicity, we return cached if not forcing reindex.
-        # A more robust check might involve IndexService.is_valid() or similar.
-        return service_instances_cache[pdf_filename_basename]
+async def get_or_create_services(
+    pdf_filename_basename: str,
+    force_reindex: bool = False,
+    index_event_manager: Optional[EventManager] = None, # Events of the index load/build (e.g. a job's own manager)
+    refresh: bool = False # Bypass cached services (e.g. the PDF content changed); the index is only rebuilt if missing
+) -> Tuple[IndexService, QueryService]:
+    refresh = refresh or force_reindex
+    if not refresh:
+        cached_services = service_instances_cache.get(pdf_filename_basename)
+        if cached_services:
+            logger.info(f"Using cached services for {pdf_filename_basename}")
+            # Potentially re-validate if index still exists or needs refresh if not forcing
+            # For simplicity, we return cached if not forcing reindex.
+            # A more robust check might involve IndexService.is_valid() or similar.
+            return cached_services
+
+    # Single-flight per PDF: concurrent requests for a cold PDF share one load/build.
+    # A refresh never joins a plain load; it waits for it and then runs on its own,
+    # so two builds never write into the same index directory at the same time.
+    return await service_loader.run(
+        pdf_filename_basename,
+        lambda: _create_services(pdf_filename_basename, force_reindex, index_event_manager or api_event_manager),
+        join_existing=not refresh
+    )
 
+async def _create_services(
+    pdf_filename_basename: str,
+    force_reindex: bool,
+    index_event_manager: EventManager
+) -> Tuple[IndexService, QueryService]:
     # Path to the PDF within the managed PDFS_DIR
     pdf_path_in_managed_dir = os.path.join(settings.PDFS_DIR, pdf_filename_basename)
     if not os.path.exists(pdf_path_in_managed_dir) and not force_reindex: # if force_reindex, upload will place it
@@ -78,12 +165,18 @@ async def get_or_create_services(pdf_filename_basename: str, force_reindex: bool
     # IndexService needs the original path or the path it will be copied to.
     # If force_reindex is true, it's typically an upload, so pdf_path_in_managed_dir is the target.
     # If not force_reindex, it's a query, so pdf_path_in_managed_dir must exist.
-    index_service = IndexService(
+    # Constructed off the event loop: it may hash the PDF and load the shared embedding model
+    index_service = await asyncio.to_thread(
+        IndexService,
         pdf_path=pdf_path_in_managed_dir, # IndexService handles ensuring it's in PDFS_DIR
-        event_manager=api_event_manager,
+        event_manager=index_event_manager,
         force_reindex=force_reindex 
     )
-    await index_service.initialize_index() # This loads or creates the index
+    try:
+        await index_service.initialize_index() # This loads or creates the index
+    except Exception:
+        index_service.close()
+        raise
 
     vector_store = index_service.get_vector_store()
     all_chunks = index_service.get_all_chunks()
@@ -91,6 +184,7 @@ async def get_or_create_services(pdf_filename_basename: str, force_reindex: bool
     if not vector_store or not all_chunks:
         # This indicates a problem during index initialization
         logger.error(f"Failed to obtain vector_store or all_chunks for {pdf_filename_basename} after initialization.")
+        index_service.close()
         raise HTTPException(status_code=500, detail=f"Index initialization failed for {pdf_filename_basename}. Cannot create QueryService.")
 
     prompt_builder = PromptBuilder()
@@ -101,14 +195,31 @@ async def get_or_create_services(pdf_filename_basename: str, force_reindex: bool
         all_chunks=all_chunks,
         event_manager=api_event_manager,
         prompt_builder=prompt_builder,
-        llm_client=llm_client
+        llm_client=llm_client,
+        bm25_index=index_service.get_bm25_index(),
+        content_hash=index_service.content_hash
     )
     
-    service_instances_cache[pdf_filename_basename] = (index_service, query_service)
+    # Replaced or evicted entries are closed by the cache (releasing their embedding model reference)
+    service_instances_cache.put(pdf_filename_basename, (index_service, query_service))
     return index_service, query_service
 
+async def _run_indexing_job(job: IndexingJob, job_event_manager: EventManager):
+    """Worker body of an indexing job: builds the PDF's index (unless its content is already indexed) and refreshes its cached services."""
+    await get_or_create_services(job.pdf_filename, refresh=True, index_event_manager=job_event_manager)
+
+# Background indexing: uploads enqueue a job and return immediately; workers build indices
+# with bounded concurrency, reporting progress from the IndexService events.
+indexing_jobs = IndexingJobManager(
+    run_job=_run_indexing_job,
+    event_manager=api_event_manager,
+    concurrency=settings.INDEXING_MAX_CONCURRENT_JOBS,
+    max_queue_size=settings.INDEXING_QUEUE_MAX_SIZE,
+    forwarded_events=event_types_to_log
+)
+
 # --- API Endpoints ---
-@app.post("/upload-pdf/", response_model=UploadResponse)
+@app.post("/upload-pdf/", response_model=UploadResponse, status_code=202)
 async def upload_pdf(file: UploadFile = File(...)):
     api_event_manager.emit('api_upload_request', {'filename': file.filename, 'content_type': file.content_type})
     
@@ -117,97 +228,152 @@ async def upload_pdf(file: UploadFile = File(...)):
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Invalid file type. Only PDF files are allowed.")
 
-    # Size check
     max_size_bytes = settings.API_PDF_MAX_SIZE_MB * 1024 * 1024
-    # Read the file content to check its size
-    file_content = await file.read()
-    file_size = len(file_content)
-    if file_size > max_size_bytes:
-        raise HTTPException(
-            status_code=413, 
-            detail=f"File too large. Maximum size is {settings.API_PDF_MAX_SIZE_MB}MB. Provided: {file_size / (1024*1024):.2f}MB"
-        )
-    # Reset the file pointer for further reading
-    file.file.seek(0)
+    too_large_detail = f"File too large. Maximum size is {settings.API_PDF_MAX_SIZE_MB}MB."
+    # Starlette has already spooled the whole body to a temp file at this point (the middleware refuses
+    # oversized bodies that declare a Content-Length); these checks cover chunked requests
+    if file.size is not None and file.size > max_size_bytes:
+        await file.close()
+        raise HTTPException(status_code=413, detail=f"{too_large_detail} Provided: {file.size / (1024*1024):.2f}MB")
 
     pdf_target_path = os.path.join(settings.PDFS_DIR, file.filename)
     
     try:
-        # Save the uploaded PDF to the PDFS_DIR
-        with open(pdf_target_path, "wb") as buffer:
-            buffer.write(file_content)
-        logger.info(f"PDF '{file.filename}' uploaded and saved to '{pdf_target_path}'")
+        # Copy the spooled upload to PDFS_DIR in fixed-size chunks, hashing it on the way; the file
+        # only replaces any previous version once fully written
+        file_size, content_hash = await save_upload_streaming(
+            file,
+            pdf_target_path,
+            max_bytes=max_size_bytes,
+            chunk_size=settings.API_UPLOAD_CHUNK_SIZE_KB * 1024
+        )
+        logger.info(f"PDF '{file.filename}' uploaded and saved to '{pdf_target_path}' ({file_size} bytes, sha256={content_hash})")
+    except UploadTooLargeError:
+        raise HTTPException(status_code=413, detail=too_large_detail)
     except Exception as e:
         logger.error(f"Error saving uploaded PDF '{file.filename}': {e}")
         raise HTTPException(status_code=500, detail=f"Could not save PDF: {str(e)}")
     finally:
         await file.close()
 
-    try:
-        # Initialize services with force_reindex=True for the uploaded PDF
-        index_service, _ = await get_or_create_services(file.filename, force_reindex=True)
-        status_message = "PDF processed and index created/updated successfully."
-        index_status = "Indexed"
-        if not index_service.get_vector_store() or not index_service.get_all_chunks():
-            status_message = "PDF uploaded, but index creation might have issues. Check logs."
-            index_status = "Indexing Error"
-            logger.error(f"Index seems problematic for {file.filename} after processing upload.")
+    index_catalog.remember_content_hash(pdf_target_path, content_hash)
+    # Drop services built for a previous version of this file; they reload on the next question
+    stale_services = service_instances_cache.pop(file.filename)
+    if stale_services:
+        old_hash = stale_services[1].content_hash
+        # Answers are keyed by content hash, so they are only dropped once no PDF has the old bytes anymore
+        if old_hash != content_hash and old_hash not in index_catalog.referenced_content_hashes():
+            stale_services[1].invalidate_response_caches()
+        service_instances_cache.retire(stale_services) # Closed once in-flight questions on it finish
+
+    if has_index(file.filename):
+        # Same bytes already indexed (under this or another name) with the current config
         return UploadResponse(
-            message=status_message,
+            message="PDF uploaded. Identical content is already indexed.",
             pdf_filename=file.filename,
-            index_status=index_status
+            index_status="Indexed",
+            content_hash=content_hash
         )
-    except FileNotFoundError as fnf:
-        logger.error(f"FileNotFoundError during upload processing for {file.filename}: {fnf}")
-        raise HTTPException(status_code=404, detail=str(fnf))
-    except Exception as e:
-        logger.error(f"Error processing PDF '{file.filename}' after upload: {e}", exc_info=True)
-        if os.path.exists(pdf_target_path):
-            logger.info(f"Uploaded PDF {pdf_target_path} kept despite processing error for debugging.")
-        raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
 
+    # Index in the background; the client polls GET /jobs/{job_id}
+    try:
+        job = indexing_jobs.submit(file.filename)
+    except IndexingQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return UploadResponse(
+        message="PDF uploaded. Indexing job queued.",
+        pdf_filename=file.filename,
+        index_status="Queued",
+        job_id=job.job_id,
+        content_hash=content_hash
+    )
+
+
+@app.get("/jobs/{job_id}", response_model=IndexingJobStatus)
+async def get_indexing_job(job_id: str):
+    """Status and progress of a background indexing job."""
+    job = indexing_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Indexing job '{job_id}' not found.")
+    return IndexingJobStatus(**job.to_dict())
+
+
+def _pending_indexing_job(pdf_filename: str) -> Optional[IndexingJob]:
+    """
+    Returns the indexing job that must finish before `pdf_filename` can be queried, enqueuing one
+    if the PDF exists but has never been indexed, so questions never build an index inline.
+    """
+    job = indexing_jobs.active_job_for(pdf_filename)
+    if job:
+        return job
+    pdf_path_in_managed_dir = os.path.join(settings.PDFS_DIR, pdf_filename)
+    if pdf_filename not in service_instances_cache and os.path.exists(pdf_path_in_managed_dir) and not has_index(pdf_filename):
+        return indexing_jobs.submit(pdf_filename)
+    return None
+
+
+async def stream_answer_events(
+    pdf_filename: str,
+    question: str,
+    priority: str = 'normal',
+    options: Optional[GenerationOptions] = None
+) -> AsyncGenerator[Tuple[str, dict], None]:
+    """Generates the Server-Sent Events of the /ask endpoint as (event type, data) pairs; SSEWriter encodes and batches them."""
+    try:
+        pending_job = _pending_indexing_job(pdf_filename)
+    except IndexingQueueFullError as e:
+        yield "error", {"error": str(e)}
+        return
+    if pending_job:
+        # Never build the index inline: tell the client to retry once the job completes
+        yield "indexing_in_progress", {
+            "message": f"Indexing in progress for '{pdf_filename}'. Please try again when the job completes.",
+            "job_id": pending_job.job_id,
+            "status": pending_job.status,
+            "progress": pending_job.progress
+        }
+        yield "end_stream", {"message": "Stream ended."}
+        return
 
-async def stream_answer_events(pdf_filename: str, question: str) -> AsyncGenerator[str, None]:
-    """Generates Server-Sent Events (SSE) for the /ask endpoint."""
     try:
-        _, query_service = await get_or_create_services(pdf_filename, force_reindex=False)
+        services = await get_or_create_services(pdf_filename, force_reindex=False)
     except FileNotFoundError:
-        event_data = json.dumps({"error": f"PDF '{pdf_filename}' not found or not processed. Please upload it first."})
-        yield f"event: error\ndata: {event_data}\n\n"
+        yield "error", {"error": f"PDF '{pdf_filename}' not found or not processed. Please upload it first."}
         return
     except Exception as e:
         logger.error(f"Failed to get services for {pdf_filename} during ask: {e}", exc_info=True)
-        event_data = json.dumps({"error": f"Internal server error while preparing for your question: {str(e)}"})
-        yield f"event: error\ndata: {event_data}\n\n"
+        yield "error", {"error": f"Internal server error while preparing for your question: {str(e)}"}
         return
 
-    try:
-        async for event_type, data in query_service.answer_question_streaming(question):
-            if event_type == "text_chunk":
-                event_data = json.dumps({"chunk": data.get("chunk", "")})
-                yield f"event: text_chunk\ndata: {event_data}\n\n"
-            elif event_type == "sources":
-                event_data = json.dumps({"sources": data.get("sources", [])})
-                yield f"event: sources\ndata: {event_data}\n\n"
-            elif event_type == "error": # If QueryService itself yields an error event
-                event_data = json.dumps({"error": data.get("error", "An unknown error occurred during generation.")})
-                yield f"event: error\ndata: {event_data}\n\n"
-            await asyncio.sleep(0.01) # Small sleep to allow other tasks, adjust as needed
-    except Exception as e:
-        logger.error(f"Error during answer streaming for '{question}' on '{pdf_filename}': {e}", exc_info=True)
-        event_data = json.dumps({"error": f"An error occurred while generating the answer: {str(e)}"})
-        yield f"event: error\ndata: {event_data}\n\n"
-    finally:
-        # Signal end of stream (optional, client can also detect close)
-        event_data = json.dumps({"message": "Stream ended."})
-        yield f"event: end_stream\ndata: {event_data}\n\n"
+    # Keeps the services (and their embedding model reference) open even if the cache evicts them meanwhile
+    with service_instances_cache.in_use(services) as (_, query_service):
+        try:
+            async for event_type, data in query_service.answer_question_streaming(question, priority=priority, options=options):
+                if event_type == "text_chunk":
+                    yield "text_chunk", {"chunk": data.get("chunk", "")}
+                elif event_type == "sources":
+                    yield "sources", {"sources": data.get("sources", [])}
+                elif event_type == "queue_position": # Waiting for a free LLM slot
+                    yield "queue_position", data
+                elif event_type == "error": # If QueryService itself yields an error event
+                    yield "error", {"error": data.get("error", "An unknown error occurred during generation.")}
+        except GenerationQueueFullError as e:
+            logger.warning(f"Rejected question for '{pdf_filename}': {e}")
+            yield "error", {"error": str(e), "code": "generation_queue_full"}
+        except Exception as e:
+            logger.error(f"Error during answer streaming for '{question}' on '{pdf_filename}': {e}", exc_info=True)
+            yield "error", {"error": f"An error occurred while generating the answer: {str(e)}"}
+    # Signal end of stream (optional, client can also detect close)
+    yield "end_stream", {"message": "Stream ended."}
 
 
 @app.post("/ask")
-async def ask_question(request: QuestionRequest):
+async def ask_question(request: QuestionRequest, http_request: Request):
     """
     Endpoint to handle user questions about a specific PDF.
     Emits events for logging and streams the response as Server-Sent Events (SSE).
+    If the client disconnects, retrieval and generation are cancelled (unless other clients share them).
     """
     api_event_manager.emit('api_ask_request', {'pdf_filename': request.pdf_filename, 'question': request.question})
 
@@ -215,11 +381,28 @@ async def ask_question(request: QuestionRequest):
         raise HTTPException(status_code=400, detail="pdf_filename and question are required.")
 
     # Stream the response using the helper function
+    priority = classify_priority(request.question, request.priority, settings.LLM_INTERACTIVE_MAX_QUESTION_CHARS)
     return StreamingResponse(
-        stream_answer_events(request.pdf_filename, request.question),
+        sse_writer.stream(
+            stream_answer_events(request.pdf_filename, request.question, priority, request.generation_options()),
+            is_disconnected=http_request.is_disconnected
+        ),
         media_type="text/event-stream"
     )
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Reports service cache, shared embedding model, embedding cache, query embedding cache and response cache usage, plus the LLM queue."""
+    return {
+        'services': service_instances_cache.stats(),
+        'embedding_models': embedding_registry.stats(),
+        'embedding_cache': embedding_cache_stats(),
+        'query_embedding_cache': query_embedding_cache_stats(),
+        'response_cache': response_cache_stats(),
+        'generation_admission': get_admission_controller().stats(),
+        'ollama': get_ollama_pool(settings).stats()
+    }
+
 # Example of a non-streaming endpoint (can be removed if only streaming is desired)
 class AnswerResponse(BaseModel):
     answer: str
@@ -234,21 +417,32 @@ async def ask_question_non_streaming(request: QuestionRequest):
     api_event_manager.emit('api_ask_request_non_streaming', {'pdf_filename': request.pdf_filename, 'question': request.question})
 
     try:
-        _, query_service = await get_or_create_services(request.pdf_filename, force_reindex=False)
-
-        # Check cache first (QueryService handles its internal cache)
-        cached_q = query_service.response_cache.get(request.question)
-        if cached_q and isinstance(cached_q, dict) and 'final_answer' in cached_q:
-            return AnswerResponse(
-                answer=cached_q['final_answer'], 
-                sources=cached_q['sources'], 
-                cached_response=True
-            )
-
-        # Generate the answer and return it
-        answer, sources = await query_service.answer_question_non_streaming(request.question)
-        return AnswerResponse(answer=answer, sources=sources, cached_response=False)
+        pending_job = _pending_indexing_job(request.pdf_filename)
+    except IndexingQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if pending_job:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Indexing in progress for '{request.pdf_filename}' (job {pending_job.job_id}). Please try again later."
+        )
 
+    try:
+        services = await get_or_create_services(request.pdf_filename, force_reindex=False)
+        with service_instances_cache.in_use(services) as (_, query_service):
+            # Check cache first (QueryService handles its internal cache)
+            options = request.generation_options()
+            cached_answer = query_service.get_cached_answer(request.question, options)
+            if cached_answer is not None:
+                answer, sources = cached_answer
+                return AnswerResponse(answer=answer, sources=sources, cached_response=True)
+
+            # Generate the answer and return it (blocking callers are never 'interactive' unless they ask for it)
+            priority = classify_priority(request.question, request.priority)
+            answer, sources = await query_service.answer_question_non_streaming(request.question, priority=priority, options=options)
+            return AnswerResponse(answer=answer, sources=sources, cached_response=False)
+
+    except GenerationQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except FileNotFoundError as fnf:
         raise HTTPException(status_code=404, detail=str(fnf))
     except ValueError as ve:
@@ -267,7 +461,7 @@ if __name__ == "__main__":
     logger.info(f"Starting Uvicorn server on {settings.UVICORN_HOST}:{settings.UVICORN_PORT}")
     logger.info(f"PDFs will be stored in: {os.path.abspath(settings.PDFS_DIR)}")
     logger.info(f"Indices will be stored in: {os.path.abspath(settings.INDICES_DIR)}")
-    logger.info(f"Ollama server expected at: {settings.OLLAMA_HOST}")
+    logger.info(f"Ollama server(s) expected at: {settings.OLLAMA_HOSTS or settings.OLLAMA_HOST}")
     
     uvicorn.run(
         "src.api.main:app", 
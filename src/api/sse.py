@@ -0,0 +1,157 @@
+import json
+import time
+import asyncio
+from contextlib import aclosing
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+try:
+    import orjson # Opcional: bem mais rápido que json para os muitos payloads pequenos do streaming
+except ImportError: # pragma: no cover
+    orjson = None
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+def encode_json(data: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(data).decode()
+    return json.dumps(data)
+
+def sse_frame(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {encode_json(data)}\n\n"
+
+_DONE = object()
+_DISCONNECTED = object()
+
+
+class SSEWriter:
+    """
+    Turns a stream of (event_type, data) pairs into Server-Sent Events, coalescing text chunks.
+
+    The first text chunk is sent right away (time-to-first-token is what users notice); the following
+    ones are merged into one `text_chunk` event per `flush_interval` seconds or `flush_chars` characters,
+    whichever comes first. Any other event flushes the pending text and is sent as is, so order is kept.
+
+    Events are pulled by a separate task into a queue of at most `max_buffered_events`. When a client
+    reads slower than the answer is generated, the queue fills up and the producer (and the Ollama stream
+    behind it) waits instead of buffering the answer in memory. Closing the stream cancels the producer.
+
+    With `is_disconnected` (e.g. Starlette's `Request.is_disconnected`), the client is also checked every
+    `disconnect_poll_interval` seconds, so a client that left is noticed even while nothing is being
+    written (retrieval, queueing, prefill): the producer is cancelled and the stream ends.
+    """
+    TEXT_EVENT = "text_chunk"
+
+    def __init__(
+        self,
+        flush_interval: float = 0.02,
+        flush_chars: int = 4096,
+        max_buffered_events: int = 256,
+        disconnect_poll_interval: float = 0.5
+    ):
+        self.flush_interval = max(0.0, flush_interval)
+        self.flush_chars = max(1, flush_chars)
+        self.max_buffered_events = max(1, max_buffered_events)
+        self.disconnect_poll_interval = disconnect_poll_interval
+
+    async def stream(
+        self,
+        events: AsyncGenerator[Tuple[str, dict], None],
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+    ) -> AsyncIterator[str]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_buffered_events)
+        producer = asyncio.create_task(self._produce(events, queue))
+        watcher = None
+        if is_disconnected is not None:
+            watcher = asyncio.create_task(self._watch_disconnect(is_disconnected, producer, queue))
+        pending: List[str] = []
+        pending_chars = 0
+        deadline = None
+        text_started = False
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError: # Flush window elapsed
+                    yield self._text_frame(pending)
+                    pending, pending_chars, deadline = [], 0, None
+                    continue
+
+                if item is _DONE:
+                    break
+                if item is _DISCONNECTED: # Nobody left to send pending text to
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                event_type, data = item
+
+                if event_type == self.TEXT_EVENT:
+                    chunk = (data or {}).get("chunk", "")
+                    if not chunk:
+                        continue
+                    if not text_started:
+                        text_started = True
+                        yield self._text_frame([chunk])
+                        continue
+                    pending.append(chunk)
+                    pending_chars += len(chunk)
+                    if pending_chars >= self.flush_chars or self.flush_interval == 0:
+                        yield self._text_frame(pending)
+                        pending, pending_chars, deadline = [], 0, None
+                    elif deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                    continue
+
+                # Pending text and the event go out in a single write
+                frames = self._text_frame(pending) if pending else ""
+                pending, pending_chars, deadline = [], 0, None
+                yield frames + sse_frame(event_type, data)
+
+            if pending:
+                yield self._text_frame(pending)
+        finally:
+            for task in (watcher, producer):
+                if task is None:
+                    continue
+                if not task.done():
+                    task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+    async def _watch_disconnect(self, is_disconnected: Callable[[], Awaitable[bool]], producer: asyncio.Task, queue: asyncio.Queue):
+        while not producer.done():
+            await asyncio.sleep(self.disconnect_poll_interval)
+            if await is_disconnected():
+                break
+        else:
+            return
+        logger.info("SSEWriter: client disconnected. Cancelling its event stream.")
+        producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+        while queue.full(): # The client is gone: buffered events can be dropped to make room
+            queue.get_nowait()
+        queue.put_nowait(_DISCONNECTED)
+
+    def _text_frame(self, chunks: List[str]) -> str:
+        return sse_frame(self.TEXT_EVENT, {"chunk": "".join(chunks)})
+
+    @staticmethod
+    async def _produce(events: AsyncGenerator[Tuple[str, dict], None], queue: asyncio.Queue):
+        try:
+            async with aclosing(events):
+                async for item in events:
+                    await queue.put(item)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"SSEWriter: event stream failed: {e}", exc_info=True)
+            await queue.put(e)
+            return
+        await queue.put(_DONE)
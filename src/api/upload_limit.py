@@ -0,0 +1,37 @@
+from starlette.responses import JSONResponse
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Room for the multipart envelope (boundaries, part headers, other fields) around the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects requests to `path` whose Content-Length is over `max_bytes` (plus the multipart overhead)
+    with a 413, before any of the body is received.
+
+    This has to happen here: by the time an endpoint with an `UploadFile` parameter runs, Starlette has
+    already received the whole multipart body and spooled it to a temp file. Bodies sent without a
+    Content-Length (chunked) are still spooled in full and only checked afterwards by the endpoint.
+    """
+    def __init__(self, app, path: str, max_bytes: int):
+        self.app = app
+        self.path = path
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == self.path:
+            content_length = dict(scope["headers"]).get(b"content-length")
+            if content_length is not None and content_length.isdigit() \
+                    and int(content_length) > self.max_bytes + MULTIPART_OVERHEAD_BYTES:
+                logger.info(f"Rejected upload of {int(content_length)} bytes to {self.path} before receiving it.")
+                response = JSONResponse(
+                    {"detail": f"File too large. Maximum size is {self.max_bytes / (1024*1024):.0f}MB."},
+                    status_code=413
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
@@ -84,7 +84,9 @@ async def main_cli():
             all_chunks=all_chunks,
             event_manager=event_manager,
             prompt_builder=PromptBuilder(),  # Instanciação correta do PromptBuilder
-            llm_client=LLMClient(event_manager=event_manager, prompt_builder=PromptBuilder())  # Instanciação correta do LLMClient
+            llm_client=LLMClient(event_manager=event_manager, prompt_builder=PromptBuilder()),  # Instanciação correta do LLMClient
+            bm25_index=index_service.get_bm25_index(),
+            content_hash=index_service.content_hash
         )
     except Exception as e:
         logger.error(f"Erro ao inicializar serviços: {e}")
@@ -29,24 +29,69 @@ class Settings(BaseSettings):
     EMBEDDING_MODEL_NAME: str = "sentence-transformers/all-mpnet-base-v2"
     OLLAMA_MODEL_NAME: str = "llama3.2"
     OLLAMA_HOST: str = "http://localhost:11434"
+    OLLAMA_HOSTS: str = "" # Comma-separated Ollama hosts to spread generations over; empty = OLLAMA_HOST only
+    OLLAMA_EJECT_AFTER_FAILURES: int = 3 # Consecutive connection/5xx failures before a host stops receiving traffic
+    OLLAMA_EJECTION_SECONDS: float = 30.0 # How long an ejected host is skipped before being tried again
     OLLAMA_TIMEOUT: int = 120
+    OLLAMA_MAX_CONCURRENT_GENERATIONS: int = 4 # Generations sent to each Ollama host at once (0 = unlimited); others wait in a queue
+    OLLAMA_MAX_QUEUED_GENERATIONS: int = 64 # Questions allowed to wait for a generation slot before new ones are rejected
+    LLM_INTERACTIVE_MAX_QUESTION_CHARS: int = 200 # Questions up to this size (without an explicit priority) are served first
+    LLM_CONTEXT_WINDOW: int = 4096 # Model context window in tokens (sent to Ollama as num_ctx); retrieved chunks are packed to fit it
+    LLM_ANSWER_TOKEN_RESERVE: int = 512 # Tokens of the window kept free for the answer
+    LLM_TOKENIZER: str = "" # tokenizer.json path (or directory / cached Hugging Face id) of the LLM; empty = estimated counts
+    PROMPT_LAYOUT: str = "system_prefix" # 'system_prefix' (instructions as a fixed system message, reusable KV prefix) || 'single_message'
+    OLLAMA_KEEP_ALIVE: str = "30m" # How long Ollama keeps the model (and its KV cache) loaded after a request, e.g. '30m', '-1' = forever; empty = server default
+    OLLAMA_NUM_PREDICT: int = 0 # Max tokens per answer (0 = model default); LLM_CONTEXT_WINDOW is sent as num_ctx
 
     RETRIEVAL_K: int = 4 # Default K for simple vector retrieval if used directly
     INITIAL_VECTOR_K: int = 50
     VECTOR_DISTANCE_THRESHOLD: float = 1.0
+    VECTOR_INDEX_TYPE: str = "auto" # 'auto' || 'flat' || 'ivfflat' || 'hnsw' || 'ivfpq' (all L2, so the threshold applies to each)
+    VECTOR_INDEX_AUTO_ANN_MIN_CHUNKS: int = 10000 # 'auto': exact flat search below this many chunks, HNSW above (IVFPQ from 500k)
+    VECTOR_INDEX_IVF_NLIST: int = 0 # IVF lists (0 = ~4*sqrt(chunks))
+    VECTOR_INDEX_NPROBE: int = 16 # IVF lists scanned per query (recall vs. speed)
+    VECTOR_INDEX_HNSW_M: int = 32
+    VECTOR_INDEX_HNSW_EF_CONSTRUCTION: int = 200
+    VECTOR_INDEX_HNSW_EF_SEARCH: int = 128 # HNSW candidate list size per query (recall vs. speed)
+    VECTOR_INDEX_PQ_M: int = 16 # IVFPQ sub-quantizers (rounded down to a divisor of the embedding dimension)
+    FAISS_MMAP_LOAD: bool = True # Memory-map saved indices read-only (shared OS page cache across workers) instead of reading them into the heap
     FINAL_BM25_K: int = 6
     DEVICE_CONFIGURATION: str = "cpu" # 'cpu' || 'cuda' || 'npu' || 'mps'
+    EMBEDDING_WARMUP_ON_STARTUP: bool = False # Load (and pin) the shared embedding model when the API starts
+    EMBEDDING_CACHE_ENABLED: bool = True # Reuse chunk embeddings across PDFs (keyed by model + normalized chunk text)
+    EMBEDDING_CACHE_DIR: str = "" # Defaults to <INDICES_DIR>/embedding_cache
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 500000 # New vectors are no longer cached past this many entries per model (0 = unlimited)
+    QUERY_EMBEDDING_CACHE_SIZE: int = 4096 # In-memory LRU of question embeddings shared by all PDFs (0 = disabled)
+
+    PDF_EXTRACTION_WORKERS: int = 0 # Processes for page-parallel text extraction (0 = CPU count, 1 = serial)
+    PDF_PARALLEL_MIN_PAGES: int = 100 # Smaller PDFs are extracted serially (process pool startup is not worth it)
+    EMBEDDING_BATCH_SIZE: int = 64 # Chunks embedded per batch while the next pages are being extracted and split
+    INGESTION_QUEUE_SIZE: int = 16 # Pages buffered between the extraction, chunking and embedding stages
 
     API_PDF_MAX_SIZE_MB: int = 100
+    API_UPLOAD_CHUNK_SIZE_KB: int = 1024 # Spooled uploads are copied to PDFS_DIR in chunks of this size
+    INDEXING_MAX_CONCURRENT_JOBS: int = 1 # Background indexing workers (each builds one PDF index at a time)
+    INDEXING_QUEUE_MAX_SIZE: int = 100 # Pending indexing jobs accepted before uploads are rejected with 503
     
+    SSE_FLUSH_INTERVAL_MS: int = 20 # Answer tokens are batched into one SSE event per window (the first token is sent at once; 0 = no batching)
+    SSE_FLUSH_MAX_CHARS: int = 4096 # Batched text sent before the window ends once this long
+    SSE_MAX_BUFFERED_EVENTS: int = 256 # Events buffered per stream for a slow client before generation pauses
+    SSE_DISCONNECT_POLL_SECONDS: float = 0.5 # How often /ask checks whether its client is still connected
+
     UVICORN_HOST: str = "0.0.0.0"
     UVICORN_PORT: int = 8000
     UVICORN_TIMEOUT_KEEP_ALIVE: int = 120
 
     RESPONSE_CACHE_MAX_SIZE: int = 100
     RESPONSE_CACHE_TTL_SECONDS: int = 3600
+    RESPONSE_CACHE_BACKEND: str = "memory" # 'memory' (per process) || 'sqlite' (on disk, shared by workers and kept across restarts)
+    RESPONSE_CACHE_PATH: str = "" # SQLite file; defaults to <INDICES_DIR>/response_cache.sqlite3
+    SEMANTIC_CACHE_ENABLED: bool = False # Also answer paraphrases of already answered questions from cache (per PDF)
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95 # Minimum cosine similarity between questions for a semantic cache hit
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 256 # Per PDF; oldest questions are evicted first
 
     SERVICE_CACHE_MAX_SIZE: int = 10 # Max number of service instances (and their vector stores) to keep in memory
+    SERVICE_CACHE_MAX_MEMORY_MB: int = 2048 # Estimated memory budget for cached services (0 = only count-based eviction)
 
     # Ensure directories exist
     def __init__(self, **values):
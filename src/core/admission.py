@@ -0,0 +1,147 @@
+import asyncio
+import heapq
+import itertools
+from typing import AsyncIterator, List, Optional
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first
+PRIORITY_CLASSES = {'interactive': 0, 'normal': 1, 'bulk': 2}
+
+class GenerationQueueFullError(Exception):
+    """Raised when a generation cannot even wait for a slot because the wait queue is full."""
+    pass
+
+def classify_priority(question: str, requested: Optional[str] = None, interactive_max_chars: int = 0) -> str:
+    """Priority class of a request: the one requested if valid, else 'interactive' for short questions, else 'normal'."""
+    if requested:
+        if requested in PRIORITY_CLASSES:
+            return requested
+        logger.warning(f"Unknown priority class '{requested}'. Classifying the question instead.")
+    if interactive_max_chars > 0 and len(question) <= interactive_max_chars:
+        return 'interactive'
+    return 'normal'
+
+
+class AdmissionTicket:
+    """
+    A request's place in the AdmissionController: either admitted (holding a generation slot) or waiting.
+    Use as an async context manager so the slot, or the place in the queue, is always given back.
+    """
+    def __init__(self, controller: "AdmissionController", priority: str):
+        self.controller = controller
+        self.priority = priority
+        self.admitted = False
+        self.released = False
+        self.position = 0 # 1-based place in the wait queue while waiting
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def positions(self) -> AsyncIterator[int]:
+        """Yields the queue position each time it changes, and returns once the ticket is admitted."""
+        reported = None
+        while not self.admitted:
+            changed = self._changed
+            if self.position != reported:
+                reported = self.position
+                yield self.position
+                continue
+            await changed.wait()
+
+    async def wait(self):
+        async for _ in self.positions():
+            pass
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        if self.admitted:
+            self.controller._release()
+        else:
+            self.controller._abandon(self)
+
+    async def __aenter__(self) -> "AdmissionTicket":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class AdmissionController:
+    """
+    Bounds concurrent LLM generations, process-wide.
+
+    At most `max_concurrent` tickets are admitted at once (0 = unlimited). Others wait in a queue of
+    at most `max_queue_size` ordered by priority class and then arrival, and further requests fail fast
+    with GenerationQueueFullError. Runs on the event loop only (no locking).
+    """
+    def __init__(self, max_concurrent: int, max_queue_size: int):
+        self.max_concurrent = max_concurrent
+        self.max_queue_size = max(0, max_queue_size)
+        self.active = 0
+        self._waiting: List[list] = [] # heap of [priority rank, arrival, ticket]
+        self._arrivals = itertools.count()
+        self.admitted_total = 0
+        self.queued_total = 0
+        self.rejected_total = 0
+
+    def _has_free_slot(self) -> bool:
+        return self.max_concurrent <= 0 or self.active < self.max_concurrent
+
+    def ticket(self, priority: str = 'normal') -> AdmissionTicket:
+        """Admits immediately when a slot is free and nobody is waiting; otherwise queues, or raises if the queue is full."""
+        ticket = AdmissionTicket(self, priority)
+        if self._has_free_slot() and not self._waiting:
+            self._admit(ticket)
+            return ticket
+        if len(self._waiting) >= self.max_queue_size:
+            self.rejected_total += 1
+            raise GenerationQueueFullError(
+                f"Too many questions waiting for the LLM ({len(self._waiting)} queued, {self.active} generating). Try again later."
+            )
+        heapq.heappush(self._waiting, [PRIORITY_CLASSES.get(priority, PRIORITY_CLASSES['normal']), next(self._arrivals), ticket])
+        self.queued_total += 1
+        self._publish_positions()
+        return ticket
+
+    def _admit(self, ticket: AdmissionTicket):
+        self.active += 1
+        self.admitted_total += 1
+        ticket.admitted = True
+        ticket.position = 0
+        ticket._notify()
+
+    def _release(self):
+        self.active -= 1
+        while self._waiting and self._has_free_slot():
+            self._admit(heapq.heappop(self._waiting)[2])
+        self._publish_positions()
+
+    def _abandon(self, ticket: AdmissionTicket):
+        self._waiting = [entry for entry in self._waiting if entry[2] is not ticket]
+        heapq.heapify(self._waiting)
+        self._publish_positions()
+
+    def _publish_positions(self):
+        for position, entry in enumerate(sorted(self._waiting, key=lambda e: (e[0], e[1])), start=1):
+            ticket = entry[2]
+            if ticket.position != position:
+                ticket.position = position
+                ticket._notify()
+
+    def stats(self) -> dict:
+        return {
+            'active': self.active,
+            'queued': len(self._waiting),
+            'max_concurrent': self.max_concurrent,
+            'max_queue_size': self.max_queue_size,
+            'admitted_total': self.admitted_total,
+            'queued_total': self.queued_total,
+            'rejected_total': self.rejected_total,
+        }
@@ -0,0 +1,212 @@
+import os
+import re
+import math
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from langchain_core.documents import Document
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCounter(ABC):
+    """Counts tokens of the LLM's prompt. Subclasses only implement `count`."""
+    name = "base"
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        pass
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of `text` (cut at a whitespace when possible) with at most `max_tokens` tokens."""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        low, high = 0, len(text)
+        while low < high: # Binary search on the prefix length: O(log n) counts
+            middle = (low + high + 1) // 2
+            if self.count(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        prefix = text[:low]
+        cut = prefix.rfind(" ")
+        return prefix[:cut] if cut > len(prefix) // 2 else prefix
+
+
+class HeuristicTokenCounter(TokenCounter):
+    """
+    Tokenizer-free estimate for when no local tokenizer is configured: one token per punctuation
+    mark and one per 4 characters of each word. Errs on the high side for Portuguese and English text.
+    """
+    name = "heuristic"
+    _PIECES = re.compile(r"\w+|[^\w\s]")
+
+    def count(self, text: str) -> int:
+        return sum(math.ceil(len(piece) / 4) for piece in self._PIECES.findall(text))
+
+
+class HFTokenCounter(TokenCounter):
+    """Exact counts with a Hugging Face `tokenizers` tokenizer (a local tokenizer.json or a cached hub id)."""
+    def __init__(self, tokenizer, name: str):
+        self.tokenizer = tokenizer
+        self.name = name
+
+    @classmethod
+    def load(cls, name_or_path: str) -> "HFTokenCounter":
+        from tokenizers import Tokenizer
+        if os.path.isdir(name_or_path):
+            name_or_path = os.path.join(name_or_path, "tokenizer.json")
+        tokenizer = Tokenizer.from_file(name_or_path) if os.path.isfile(name_or_path) else Tokenizer.from_pretrained(name_or_path)
+        return cls(tokenizer, name_or_path)
+
+    def count(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        encoding = self.tokenizer.encode(text, add_special_tokens=False)
+        if len(encoding.ids) <= max_tokens:
+            return text
+        return text[:encoding.offsets[max_tokens - 1][1]]
+
+_counters = {}
+
+def get_token_counter(tokenizer_name: str) -> TokenCounter:
+    """Shared counter for LLM_TOKENIZER; falls back (once, with a warning) to the heuristic if it cannot be loaded."""
+    if tokenizer_name not in _counters:
+        counter: TokenCounter = HeuristicTokenCounter()
+        if tokenizer_name:
+            try:
+                counter = HFTokenCounter.load(tokenizer_name)
+            except Exception as e:
+                logger.warning(f"Could not load tokenizer '{tokenizer_name}' ({e}). Estimating token counts instead.")
+        _counters[tokenizer_name] = counter
+    return _counters[tokenizer_name]
+
+
+def remove_overlap(previous: str, current: str, min_chars: int = 20, max_chars: int = 0) -> str:
+    """Drops from `current` the longest prefix that `previous` ends with (the splitter's chunk overlap)."""
+    limit = min(len(previous), len(current), max_chars or len(current))
+    for size in range(limit, min_chars - 1, -1):
+        if previous.endswith(current[:size]):
+            return current[size:].lstrip()
+    return current
+
+
+@dataclass
+class PackedContext:
+    text: str
+    documents: List[Document] # Chunks that made it into the context, in document order
+    context_tokens: int
+    prompt_tokens: int
+    budget_tokens: int
+    retrieved: int
+    truncated: int = 0
+    overlap_chars_removed: int = 0
+    dropped: List[Document] = field(default_factory=list)
+
+    def stats(self) -> dict:
+        return {
+            'chunks_retrieved': self.retrieved,
+            'chunks_used': len(self.documents),
+            'chunks_truncated': self.truncated,
+            'chunks_dropped': len(self.dropped),
+            'overlap_chars_removed': self.overlap_chars_removed,
+            'context_tokens': self.context_tokens,
+            'prompt_tokens': self.prompt_tokens,
+            'budget_tokens': self.budget_tokens,
+        }
+
+
+class ContextPacker:
+    """
+    Assembles the prompt context within the model's token budget instead of concatenating every chunk.
+
+    The budget is the context window minus the tokens reserved for the answer and the tokens of the
+    prompt itself (instructions + question). Chunks are taken in retrieval (relevance) order until the
+    budget is spent, the last one truncated if enough room is left for it to be useful. The chosen chunks
+    are then laid out in document order, where the overlap the splitter repeats between consecutive
+    chunks of the same PDF is removed.
+    """
+    SEPARATOR = "\n"
+
+    def __init__(self, token_counter: TokenCounter, context_window: int, answer_reserve_tokens: int, min_chunk_tokens: int = 64):
+        self.token_counter = token_counter
+        self.context_window = context_window
+        self.answer_reserve_tokens = answer_reserve_tokens
+        self.min_chunk_tokens = min_chunk_tokens
+
+    @staticmethod
+    def _document_order(doc: Document):
+        meta = doc.metadata or {}
+        return (str(meta.get('source', '')), meta.get('chunk_index') or 0)
+
+    @staticmethod
+    def _consecutive(previous: Document, doc: Document) -> bool:
+        index = doc.metadata.get('chunk_index')
+        return (
+            index is not None
+            and previous.metadata.get('source') == doc.metadata.get('source')
+            and previous.metadata.get('chunk_index') == index - 1
+        )
+
+    def pack(self, docs: List[Document], prompt_overhead_tokens: int, context_window: Optional[int] = None) -> PackedContext:
+        """
+        `prompt_overhead_tokens`: tokens of the prompt with an empty context (instructions, question, labels).
+        `context_window` overrides the packer's window for this call (e.g. a per-request num_ctx).
+        """
+        budget = max(0, (context_window or self.context_window) - self.answer_reserve_tokens - prompt_overhead_tokens)
+        separator_tokens = self.token_counter.count(self.SEPARATOR)
+
+        # Relevance (retrieval) order decides what fits
+        chosen = {}
+        used = truncated = 0
+        dropped = []
+        for position, doc in enumerate(docs):
+            if not doc.page_content.strip():
+                continue
+            tokens = self.token_counter.count(doc.page_content) + separator_tokens
+            if used + tokens <= budget:
+                chosen[position] = doc.page_content
+                used += tokens
+                continue
+            room = budget - used - separator_tokens
+            if room >= self.min_chunk_tokens:
+                chosen[position] = self.token_counter.truncate(doc.page_content, room)
+                used += self.token_counter.count(chosen[position]) + separator_tokens
+                truncated += 1
+            else:
+                dropped.append(doc)
+
+        # Document order for the prompt; only shrinks the context, so the budget still holds
+        packed: List[Document] = []
+        overlap_removed = 0
+        previous: Optional[Document] = None
+        for position in sorted(chosen, key=lambda p: (self._document_order(docs[p]), p)):
+            text = chosen[position]
+            if previous is not None and self._consecutive(previous, docs[position]):
+                deduplicated = remove_overlap(previous.page_content, text)
+                overlap_removed += len(text) - len(deduplicated)
+                text = deduplicated
+            previous = Document(page_content=chosen[position], metadata=docs[position].metadata)
+            if text.strip():
+                packed.append(Document(page_content=text, metadata=docs[position].metadata))
+
+        text = self.SEPARATOR.join(doc.page_content for doc in packed).strip()
+        context_tokens = self.token_counter.count(text)
+        return PackedContext(
+            text=text,
+            documents=packed,
+            context_tokens=context_tokens,
+            prompt_tokens=context_tokens + prompt_overhead_tokens,
+            budget_tokens=budget,
+            retrieved=len(docs),
+            truncated=truncated,
+            overlap_chars_removed=overlap_removed,
+            dropped=dropped,
+        )
@@ -0,0 +1,180 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from src.core.event_manager import EventManager, Observer
+from src.core.observers import ForwardingObserver
+import logging
+
+logger = logging.getLogger(__name__)
+
+class IndexingQueueFullError(Exception):
+    """Raised when the indexing queue cannot accept another job."""
+    pass
+
+@dataclass
+class IndexingJob:
+    job_id: str
+    pdf_filename: str
+    status: str = "queued" # 'queued' | 'running' | 'completed' | 'failed'
+    stage: str = "queued"
+    progress: float = 0.0
+    chunk_count: Optional[int] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+class JobProgressObserver(Observer):
+    """Turns IndexService events into stage/progress updates on a job."""
+    STAGES = {
+        'index_setup_started': ('starting', 0.05),
+        'index_creation_started': ('parsing', 0.1),
+        'chunks_split': ('embedding', 0.3),
+        'index_loaded': ('loaded', 0.9),
+        'index_created': ('finalizing', 0.95),
+        'index_setup_completed': ('finalizing', 0.99),
+    }
+    # Pages processed by the ingestion pipeline move progress between 'parsing' and 'finalizing'
+    PROGRESS_EVENT = 'ingestion_progress'
+
+    def __init__(self, job: IndexingJob):
+        self.job = job
+
+    def update(self, event_type: str, data: dict = None):
+        stage = self.STAGES.get(event_type)
+        if stage:
+            self.job.stage, progress = stage
+            self.job.progress = max(self.job.progress, progress)
+        if event_type == 'chunks_split' and data:
+            self.job.chunk_count = data.get('count')
+        if event_type == self.PROGRESS_EVENT and data:
+            self.job.stage, self.job.chunk_count = "embedding", data.get('chunks')
+            if data.get('total_pages'):
+                done = min(1.0, data['pages_done'] / data['total_pages'])
+                self.job.progress = max(self.job.progress, 0.1 + 0.8 * done)
+
+class IndexingJobManager:
+    """
+    Bounded background queue for PDF indexing jobs.
+
+    `submit` enqueues a job and returns immediately; `concurrency` worker tasks run the jobs
+    through `run_job(job, job_event_manager)`. Each job gets its own EventManager, which updates
+    the job's progress and forwards every event to the shared `event_manager` for logging.
+    Workers are started lazily on the running event loop.
+    """
+    def __init__(
+        self,
+        run_job: Callable[[IndexingJob, EventManager], Awaitable[None]],
+        event_manager: EventManager,
+        concurrency: int,
+        max_queue_size: int,
+        forwarded_events: List[str],
+        max_finished_jobs: int = 1000
+    ):
+        self.run_job = run_job
+        self.event_manager = event_manager
+        self.concurrency = max(1, concurrency)
+        self.max_queue_size = max_queue_size
+        self.forwarded_events = forwarded_events
+        self.max_finished_jobs = max_finished_jobs
+
+        self.jobs: "OrderedDict[str, IndexingJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self):
+        """Starts the worker tasks on the running loop (no-op if already running there)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._workers:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.concurrency)]
+        # Jobs queued on a previous loop would never run; re-enqueue them on this one
+        for job in self.jobs.values():
+            if job.status == "queued":
+                self._queue.put_nowait(job)
+        logger.info(f"IndexingJobManager started with {self.concurrency} worker(s).")
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._loop = None
+
+    def submit(self, pdf_filename: str) -> IndexingJob:
+        """Enqueues an indexing job. A job still waiting in the queue for the same PDF is reused."""
+        self.start()
+        queued = next((j for j in self.jobs.values() if j.pdf_filename == pdf_filename and j.status == "queued"), None)
+        if queued:
+            return queued
+
+        job = IndexingJob(job_id=uuid.uuid4().hex, pdf_filename=pdf_filename)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise IndexingQueueFullError(f"Indexing queue is full ({self.max_queue_size} jobs). Try again later.")
+        self.jobs[job.job_id] = job
+        self._prune_finished()
+        self.event_manager.emit('indexing_job_queued', {'job_id': job.job_id, 'pdf_filename': pdf_filename})
+        return job
+
+    def get(self, job_id: str) -> Optional[IndexingJob]:
+        return self.jobs.get(job_id)
+
+    def active_job_for(self, pdf_filename: str) -> Optional[IndexingJob]:
+        return next((j for j in self.jobs.values() if j.pdf_filename == pdf_filename and j.is_active), None)
+
+    def _prune_finished(self):
+        finished = [job_id for job_id, j in self.jobs.items() if not j.is_active]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    def _job_event_manager(self, job: IndexingJob) -> EventManager:
+        job_events = EventManager()
+        progress_observer = JobProgressObserver(job)
+        forwarder = ForwardingObserver(self.event_manager)
+        for event_type in [*JobProgressObserver.STAGES, JobProgressObserver.PROGRESS_EVENT]:
+            job_events.subscribe(event_type, progress_observer)
+        for event_type in self.forwarded_events:
+            job_events.subscribe(event_type, forwarder)
+        return job_events
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: IndexingJob):
+        job.status, job.stage, job.started_at = "running", "starting", time.time()
+        self.event_manager.emit('indexing_job_started', {'job_id': job.job_id, 'pdf_filename': job.pdf_filename})
+        try:
+            await self.run_job(job, self._job_event_manager(job))
+        except asyncio.CancelledError:
+            job.status, job.error, job.finished_at = "failed", "Cancelled", time.time()
+            raise
+        except Exception as e:
+            logger.error(f"Indexing job {job.job_id} for '{job.pdf_filename}' failed: {e}", exc_info=True)
+            job.status, job.stage, job.error, job.finished_at = "failed", "failed", str(e), time.time()
+            self.event_manager.emit('indexing_job_failed', {'job_id': job.job_id, 'pdf_filename': job.pdf_filename, 'error': str(e)})
+            return
+        job.status, job.stage, job.progress, job.finished_at = "completed", "completed", 1.0, time.time()
+        self.event_manager.emit('indexing_job_completed', {
+            'job_id': job.job_id, 'pdf_filename': job.pdf_filename, 'time': job.finished_at - job.started_at
+        })
@@ -1,79 +1,224 @@
 # LLM client for interacting with Ollama
 import time
-import ollama # type: ignore
+import asyncio
+from contextlib import aclosing
+from dataclasses import dataclass, fields
 from src.core.event_manager import EventManager
 from src.core.prompt_builder import PromptBuilder
+from src.core.admission import AdmissionController, AdmissionTicket
+from src.core.ollama_pool import get_ollama_pool, is_backend_failure
 from src.config.settings import settings
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional, Union
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Start of the text chunk `generate` yields instead of raising when the generation fails
+GENERATION_ERROR_PREFIX = "Error communicating with LLM: "
+
+_admission_controller: Optional[AdmissionController] = None
+
+def get_admission_controller() -> AdmissionController:
+    """Process-wide limiter shared by every LLMClient, since they all share the same Ollama pool."""
+    global _admission_controller
+    if _admission_controller is None:
+        per_host = settings.OLLAMA_MAX_CONCURRENT_GENERATIONS
+        _admission_controller = AdmissionController(
+            max_concurrent=per_host * len(get_ollama_pool(settings)) if per_host > 0 else 0,
+            max_queue_size=settings.OLLAMA_MAX_QUEUED_GENERATIONS
+        )
+    return _admission_controller
+
+@dataclass(frozen=True)
+class GenerationOptions:
+    """Options sent with each Ollama request; None leaves the server's (or the model's) default."""
+    keep_alive: Optional[str] = None # e.g. '30m'; '-1' keeps the model loaded forever
+    num_ctx: Optional[int] = None
+    num_predict: Optional[int] = None
+
+    @classmethod
+    def from_settings(cls, settings) -> "GenerationOptions":
+        return cls(
+            keep_alive=settings.OLLAMA_KEEP_ALIVE or None,
+            num_ctx=settings.LLM_CONTEXT_WINDOW or None,
+            num_predict=settings.OLLAMA_NUM_PREDICT or None
+        )
+
+    def merged(self, overrides: Optional["GenerationOptions"]) -> "GenerationOptions":
+        """These options with the ones set in `overrides` taking precedence."""
+        if overrides is None:
+            return self
+        return GenerationOptions(**{
+            f.name: getattr(overrides, f.name) if getattr(overrides, f.name) is not None else getattr(self, f.name)
+            for f in fields(self)
+        })
+
+    def ollama_options(self) -> dict:
+        return {name: value for name, value in (('num_ctx', self.num_ctx), ('num_predict', self.num_predict)) if value is not None}
+
+    def ollama_keep_alive(self) -> Union[float, str, None]:
+        # Ollama parses strings as Go durations, so bare numbers ('-1', '600') must go as seconds
+        try:
+            return float(self.keep_alive)
+        except (TypeError, ValueError):
+            return self.keep_alive
+
+    def cache_tag(self) -> str:
+        """The options that change the answer (keep_alive does not), for cache keys."""
+        return f"num_ctx={self.num_ctx};num_predict={self.num_predict}"
+
+def token_usage(response) -> dict:
+    """Token counts (and prefill/load times) Ollama reports on its final response; missing ones are left out."""
+    usage = {}
+    if response.get('prompt_eval_count') is not None:
+        usage['prompt_tokens'] = response['prompt_eval_count']
+    if response.get('eval_count') is not None:
+        usage['completion_tokens'] = response['eval_count']
+    if response.get('prompt_eval_duration') is not None:
+        usage['prompt_eval_time'] = response['prompt_eval_duration'] / 1e9
+    if response.get('load_duration') is not None:
+        usage['load_time'] = response['load_duration'] / 1e9
+    return usage
+
 class LLMClient:
     def __init__(self, event_manager: EventManager, prompt_builder: PromptBuilder):
         self.model_name = settings.OLLAMA_MODEL_NAME
         self.event_manager = event_manager
         self.prompt_builder = prompt_builder
-        # Initialize AsyncClient with host and timeout
-        self.async_client = ollama.AsyncClient(
-            host=settings.OLLAMA_HOST, 
-            timeout=settings.OLLAMA_TIMEOUT
-        )
-        logger.info(f"LLMClient initialized for model: {self.model_name} at host: {settings.OLLAMA_HOST}")
+        self.options = GenerationOptions.from_settings(settings)
+        # Shared pool of Ollama hosts (and their HTTP connections) instead of one client per PDF
+        self.pool = get_ollama_pool(settings)
+        self.admission = get_admission_controller()
+        logger.info(f"LLMClient initialized for model: {self.model_name} at hosts: {[e.host for e in self.pool.endpoints]}")
 
-    async def generate(self, context: str, question: str) -> AsyncGenerator[str, None]:
+    async def generate(
+        self,
+        context: str,
+        question: str,
+        ticket: Optional[AdmissionTicket] = None,
+        priority: str = 'normal',
+        options: Optional[GenerationOptions] = None
+    ) -> AsyncGenerator[str, None]:
         """
         Envia prompt para o modelo e retorna um gerador assíncrono para a resposta em chunks.
+
+        A geração só começa com uma vaga do AdmissionController: a do `ticket` recebido (liberada por quem
+        o criou) ou uma obtida aqui com `priority` (lança GenerationQueueFullError se a fila estiver cheia).
+        `options` sobrepõe, nesta requisição, as GenerationOptions das configurações.
+
+        Se o gerador for fechado ou a task cancelada no meio (p.ex. o cliente desconectou), o stream do Ollama
+        é fechado na hora, o que interrompe a geração no servidor, e o evento 'generation_cancelled' é emitido.
         """
-        self.event_manager.emit('generation_started', {'question': question, 'model': self.model_name})
+        if ticket is None:
+            async with self.admission.ticket(priority) as own_ticket:
+                await own_ticket.wait()
+                async for content_part in self.generate(context, question, ticket=own_ticket, options=options):
+                    yield content_part
+            return
+        await ticket.wait()
+
+        options = self.options.merged(options)
+        self.event_manager.emit('generation_started', {'question': question, 'model': self.model_name, 'layout': self.prompt_builder.layout})
         start_time = time.time()
         
-        prompt = self.prompt_builder.build(context, question)
+        messages = self.prompt_builder.build_messages(context, question)
         
+        full_answer = ""
+        usage = {}
+        time_to_first_token = None
+        tried = []
         try:
-            stream = await self.async_client.chat(
-                model=self.model_name,
-                messages=[{'role': 'user', 'content': prompt}],
-                stream=True
-            )
-            
-            full_answer = ""
-            async for chunk in stream:
-                content_part = chunk['message']['content']
-                full_answer += content_part
-                yield content_part
+            while True:
+                try:
+                    async with self.pool.endpoint(exclude=tried) as endpoint:
+                        tried.append(endpoint)
+                        stream = await endpoint.client.chat(
+                            model=self.model_name,
+                            messages=messages,
+                            stream=True,
+                            options=options.ollama_options() or None,
+                            keep_alive=options.ollama_keep_alive()
+                        )
+                        async with aclosing(stream): # Closing the HTTP stream is what stops Ollama on cancellation
+                            async for chunk in stream:
+                                if chunk.get('done'):
+                                    usage = token_usage(chunk)
+                                content_part = chunk['message']['content']
+                                if time_to_first_token is None and content_part:
+                                    # Queue wait is excluded (the clock starts once admitted): this is prefill + first decode step
+                                    time_to_first_token = time.time() - start_time
+                                    self.event_manager.emit('generation_first_token', {
+                                        'question': question, 'ttft': time_to_first_token, 'host': endpoint.host
+                                    })
+                                full_answer += content_part
+                                yield content_part
+                    break
+                except Exception as e:
+                    # Another host can still take over while nothing has been streamed
+                    if full_answer or not is_backend_failure(e) or len(tried) >= len(self.pool):
+                        raise
+                    logger.warning(f"Ollama host {endpoint.host} failed ({e}). Retrying on another host.")
+        except (asyncio.CancelledError, GeneratorExit):
+            elapsed_time = time.time() - start_time
+            logger.info(f"LLM generation cancelled after {elapsed_time:.2f}s ({len(full_answer)} chars generated).")
+            self.event_manager.emit('generation_cancelled', {
+                'question': question, 'time': elapsed_time, 'answer_length': len(full_answer)
+            })
+            raise
         except Exception as e:
             logger.error(f"Error during LLM generation: {e}")
             self.event_manager.emit('generation_failed', {'error': str(e)})
             # Yield an error message or re-raise, depending on desired handling
-            yield f"Error communicating with LLM: {str(e)}" # Or raise e
+            yield f"{GENERATION_ERROR_PREFIX}{str(e)}" # Or raise e
             return # Ensure generator stops
 
         elapsed_time = time.time() - start_time
-        self.event_manager.emit('generation_completed', {'time': elapsed_time, 'answer_length': len(full_answer)})
+        self.event_manager.emit('generation_completed', {
+            'time': elapsed_time, 'ttft': time_to_first_token, 'answer_length': len(full_answer), **usage
+        })
         logger.info(f"LLM generation completed in {elapsed_time:.2f}s")
 
-    async def generate_non_streaming(self, context: str, question: str) -> str:
+    async def generate_non_streaming(self, context: str, question: str, priority: str = 'normal', options: Optional[GenerationOptions] = None) -> str:
         """
-        Envia prompt para o modelo e retorna a resposta completa (não-streaming).
+        Envia prompt para o modelo e retorna a resposta completa (não-streaming), após obter uma vaga do AdmissionController.
         """
-        self.event_manager.emit('generation_started', {'question': question, 'model': self.model_name, 'streaming': False})
+        async with self.admission.ticket(priority) as ticket:
+            await ticket.wait()
+            return await self._generate_non_streaming(context, question, self.options.merged(options))
+
+    async def _generate_non_streaming(self, context: str, question: str, options: GenerationOptions) -> str:
+        self.event_manager.emit('generation_started', {
+            'question': question, 'model': self.model_name, 'layout': self.prompt_builder.layout, 'streaming': False
+        })
         start_time = time.time()
-        prompt = self.prompt_builder.build(context, question)
+        messages = self.prompt_builder.build_messages(context, question)
         
+        tried = []
         try:
-            response = await self.async_client.chat(
-                model=self.model_name,
-                messages=[{'role': 'user', 'content': prompt}],
-                stream=False # Explicitly non-streaming
-            )
-            answer = response['message']['content']
+            while True:
+                try:
+                    async with self.pool.endpoint(exclude=tried) as endpoint:
+                        tried.append(endpoint)
+                        response = await endpoint.client.chat(
+                            model=self.model_name,
+                            messages=messages,
+                            stream=False, # Explicitly non-streaming
+                            options=options.ollama_options() or None,
+                            keep_alive=options.ollama_keep_alive()
+                        )
+                    answer = response['message']['content']
+                    usage = token_usage(response)
+                    break
+                except Exception as e:
+                    if not is_backend_failure(e) or len(tried) >= len(self.pool):
+                        raise
+                    logger.warning(f"Ollama host {endpoint.host} failed ({e}). Retrying on another host.")
         except Exception as e:
             logger.error(f"Error during non-streaming LLM generation: {e}")
             self.event_manager.emit('generation_failed', {'error': str(e)})
             raise  # Re-raise the exception to be handled by the caller
 
         elapsed_time = time.time() - start_time
-        self.event_manager.emit('generation_completed', {'time': elapsed_time, 'answer_length': len(answer), 'streaming': False})
+        self.event_manager.emit('generation_completed', {'time': elapsed_time, 'answer_length': len(answer), 'streaming': False, **usage})
         logger.info(f"Non-streaming LLM generation completed in {elapsed_time:.2f}s")
         return answer
@@ -1,4 +1,4 @@
-from src.core.event_manager import Observer # Assuming event_manager.py is in the same root
+from src.core.event_manager import EventManager, Observer # Assuming event_manager.py is in the same root
 import logging
 
 # Configure basic logging
@@ -16,6 +16,13 @@ class CLILoggingObserver(Observer): # Specific for CLI if more detailed CLI outp
     def update(self, event_type: str, data: dict = None):
         print(f"[CLI EVENT] {event_type}: {data if data else ''}")
 
+class ForwardingObserver(Observer): # Re-emits events on another EventManager (e.g. per-job events to the API's manager)
+    def __init__(self, target: EventManager):
+        self.target = target
+
+    def update(self, event_type: str, data: dict = None):
+        self.target.emit(event_type, data)
+
 # Example of another observer if needed in the future
 # class MetricsObserver(Observer):
 #     def update(self, event_type: str, data: dict = None):
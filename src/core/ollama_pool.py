@@ -0,0 +1,124 @@
+import time
+import itertools
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+import httpx
+import ollama # type: ignore
+import logging
+
+logger = logging.getLogger(__name__)
+
+def parse_hosts(hosts: str, default_host: str) -> List[str]:
+    """Comma-separated OLLAMA_HOSTS; falls back to the single OLLAMA_HOST."""
+    parsed = [h.strip() for h in hosts.split(",") if h.strip()] if hosts else []
+    return parsed or [default_host]
+
+def is_backend_failure(error: BaseException) -> bool:
+    """Errors that say the host is unhealthy (unreachable, timing out, 5xx), as opposed to a bad request."""
+    if isinstance(error, ollama.ResponseError):
+        return getattr(error, 'status_code', 0) >= 500
+    return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
+
+
+class OllamaEndpoint:
+    """One Ollama host: a long-lived AsyncClient (reusing its HTTP connections) plus routing and health state."""
+    def __init__(self, host: str, timeout: float):
+        self.host = host
+        self.client = ollama.AsyncClient(host=host, timeout=timeout)
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def stats(self, now: float) -> dict:
+        return {
+            'host': self.host,
+            'healthy': self.healthy(now),
+            'outstanding': self.outstanding,
+            'requests': self.requests,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+        }
+
+
+class OllamaClientPool:
+    """
+    Process-wide pool of Ollama endpoints shared by every LLMClient.
+
+    Each generation goes to the healthy endpoint with the fewest outstanding requests (ties rotate).
+    Health is checked passively: after `max_failures` consecutive backend failures an endpoint is
+    ejected for `ejection_seconds`, then gets traffic again and is re-ejected if it keeps failing.
+    When every endpoint is ejected, the one coming back soonest is used instead of failing outright.
+    """
+    def __init__(self, hosts: List[str], timeout: float, max_failures: int = 3, ejection_seconds: float = 30.0):
+        if not hosts:
+            raise ValueError("At least one Ollama host is required.")
+        self.endpoints = [OllamaEndpoint(host, timeout) for host in hosts]
+        self.max_failures = max(1, max_failures)
+        self.ejection_seconds = ejection_seconds
+        self._rotation = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def pick(self, exclude: Optional[List[OllamaEndpoint]] = None) -> OllamaEndpoint:
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if not exclude or e not in exclude] or self.endpoints
+        healthy = [e for e in candidates if e.healthy(now)]
+        if not healthy:
+            return min(candidates, key=lambda e: e.ejected_until)
+        # Rotating the start makes ties (e.g. an idle pool) spread over all endpoints
+        offset = next(self._rotation) % len(healthy)
+        rotated = healthy[offset:] + healthy[:offset]
+        return min(rotated, key=lambda e: e.outstanding)
+
+    @asynccontextmanager
+    async def endpoint(self, exclude: Optional[List[OllamaEndpoint]] = None) -> AsyncIterator[OllamaEndpoint]:
+        """Routes one request; the endpoint's health is updated from how the `async with` body ends."""
+        endpoint = self.pick(exclude)
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+        try:
+            yield endpoint
+        except BaseException as e:
+            if isinstance(e, Exception) and is_backend_failure(e):
+                self._record_failure(endpoint, e)
+            raise
+        else:
+            endpoint.consecutive_failures = 0
+        finally:
+            endpoint.outstanding -= 1
+
+    def _record_failure(self, endpoint: OllamaEndpoint, error: Exception):
+        endpoint.failures += 1
+        endpoint.consecutive_failures += 1
+        if endpoint.consecutive_failures >= self.max_failures and endpoint.healthy(time.monotonic()):
+            endpoint.ejected_until = time.monotonic() + self.ejection_seconds
+            logger.warning(
+                f"OllamaClientPool: ejecting {endpoint.host} for {self.ejection_seconds:.0f}s after "
+                f"{endpoint.consecutive_failures} consecutive failures (last: {error})."
+            )
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {'endpoints': [e.stats(now) for e in self.endpoints]}
+
+
+_pool: Optional[OllamaClientPool] = None
+
+def get_ollama_pool(settings) -> OllamaClientPool:
+    global _pool
+    if _pool is None:
+        _pool = OllamaClientPool(
+            parse_hosts(settings.OLLAMA_HOSTS, settings.OLLAMA_HOST),
+            timeout=settings.OLLAMA_TIMEOUT,
+            max_failures=settings.OLLAMA_EJECT_AFTER_FAILURES,
+            ejection_seconds=settings.OLLAMA_EJECTION_SECONDS
+        )
+        logger.info(f"OllamaClientPool: routing generations over {[e.host for e in _pool.endpoints]}.")
+    return _pool
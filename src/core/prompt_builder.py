@@ -1,7 +1,24 @@
+from typing import List, Optional
+
+from src.config.settings import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
 class PromptBuilder:
     """
     Constrói prompt para o modelo a partir de instruções base.
+
+    Layouts (PROMPT_LAYOUT):
+    - 'system_prefix': as instruções vão sozinhas numa mensagem de sistema, byte a byte idêntica em toda
+      requisição, e contexto + pergunta numa mensagem de usuário. O prefixo estável permite ao Ollama
+      reaproveitar o KV cache já calculado para ele, encurtando o prefill (e o tempo até o primeiro token).
+    - 'single_message': tudo numa única mensagem de usuário (layout original).
     """
+    # Faz parte da chave do cache de respostas: incremente ao mudar as instruções ou o formato do prompt
+    PROMPT_VERSION = "1"
+    LAYOUTS = ('system_prefix', 'single_message')
+
     BASE_INSTRUCTIONS = (
         "Você é um assistente de IA especializado em analisar documentos e responder perguntas com base no conteúdo fornecido, além de resumir informações de forma eficaz.\n\n"
         "**Instruções Gerais:**\n"
@@ -33,5 +50,27 @@ class PromptBuilder:
         "Agora, use o contexto abaixo para responder à próxima pergunta ou realizar a tarefa solicitada:\n\n"
     )
 
+    def __init__(self, layout: Optional[str] = None):
+        layout = layout or settings.PROMPT_LAYOUT
+        if layout not in self.LAYOUTS:
+            logger.warning(f"Unknown prompt layout '{layout}'. Using 'system_prefix'.")
+            layout = 'system_prefix'
+        self.layout = layout
+        # Versão efetiva do prompt (para a chave do cache): o layout também muda o que o modelo recebe
+        self.version = f"{self.PROMPT_VERSION}-{layout}"
+
     def build(self, context: str, question: str) -> str:
-        return f"{self.BASE_INSTRUCTIONS}\n\nContexto: {context}\n\nPergunta: {question}\n\nResposta:"
\ No newline at end of file
+        return f"{self.BASE_INSTRUCTIONS}\n\n{self._question_block(context, question)}"
+
+    def build_messages(self, context: str, question: str) -> List[dict]:
+        """Mensagens de chat para o Ollama, conforme o layout."""
+        if self.layout == 'single_message':
+            return [{'role': 'user', 'content': self.build(context, question)}]
+        return [
+            {'role': 'system', 'content': self.BASE_INSTRUCTIONS},
+            {'role': 'user', 'content': self._question_block(context, question)},
+        ]
+
+    @staticmethod
+    def _question_block(context: str, question: str) -> str:
+        return f"Contexto: {context}\n\nPergunta: {question}\n\nResposta:"
\ No newline at end of file
@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+import cachetools
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def response_cache_key(content_hash: str, model: str, prompt_version: str, question: str) -> str:
+    """Answers depend on the PDF content, the LLM and the prompt: any of them changing is a different entry."""
+    raw = json.dumps([content_hash, model, str(prompt_version), question], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCacheBackend(ABC):
+    """
+    Storage for answered questions. Entries are dicts with 'final_answer', 'sources' and
+    'streamed_parts' (the (event_type, data) tuples yielded by answer_question_streaming).
+    """
+    @abstractmethod
+    def get(self, key: str) -> Optional[dict]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: dict, content_hash: str = ""):
+        pass
+
+    @abstractmethod
+    def invalidate(self, content_hash: str):
+        """Drops every entry stored for a PDF content hash."""
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    @abstractmethod
+    def stats(self) -> dict:
+        pass
+
+    def close(self):
+        pass
+
+
+class MemoryResponseCache(ResponseCacheBackend):
+    """Process-local TTL + LRU cache (the previous behaviour): lost on restart, not shared between workers."""
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        if ttl_seconds > 0:
+            self._entries = cachetools.TTLCache(maxsize=max(1, max_entries), ttl=ttl_seconds)
+        else:
+            self._entries = cachetools.LRUCache(maxsize=max(1, max_entries))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: dict, content_hash: str = ""):
+        with self._lock:
+            self._entries[key] = (content_hash, value)
+
+    def invalidate(self, content_hash: str):
+        with self._lock:
+            for key in [k for k, (h, _) in self._entries.items() if h == content_hash]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'backend': 'memory', 'entries': len(self._entries), 'max_entries': self._entries.maxsize,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+class SQLiteResponseCache(ResponseCacheBackend):
+    """
+    On-disk cache in a SQLite database (WAL mode), shared by every worker process using the same file
+    and kept across restarts. Expired entries are never served; past `max_entries` the least
+    recently used ones are deleted.
+    """
+    def __init__(self, path: str, max_entries: int, ttl_seconds: int, busy_timeout_seconds: float = 5.0):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # One connection per process, used under the lock; other processes are serialized by SQLite itself
+        self._conn = sqlite3.connect(path, timeout=busy_timeout_seconds, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, content_hash TEXT NOT NULL, value TEXT NOT NULL,"
+            " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_content_hash ON responses (content_hash)")
+
+    def _oldest_valid(self, now: float) -> float:
+        return now - self.ttl_seconds if self.ttl_seconds > 0 else float("-inf")
+
+    @staticmethod
+    def _decode(raw: str) -> dict:
+        value = json.loads(raw)
+        # JSON turns the (event_type, data) tuples into lists
+        value['streamed_parts'] = [tuple(part) for part in value.get('streamed_parts', [])]
+        return value
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM responses WHERE key = ? AND created_at > ?", (key, self._oldest_valid(now))
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return self._decode(row[0])
+
+    def set(self, key: str, value: dict, content_hash: str = ""):
+        raw = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, content_hash, value, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, content_hash, raw, now, now)
+                )
+                self._conn.execute("DELETE FROM responses WHERE created_at <= ?", (self._oldest_valid(now),))
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def invalidate(self, content_hash: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE content_hash = ?", (content_hash,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {'backend': 'sqlite', 'path': self.path, 'entries': entries, 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_backends: Dict[tuple, ResponseCacheBackend] = {}
+_backends_lock = threading.Lock()
+
+def get_response_cache(settings) -> ResponseCacheBackend:
+    """Process-wide backend selected by RESPONSE_CACHE_BACKEND ('memory' or 'sqlite'), shared by all QueryServices."""
+    backend = settings.RESPONSE_CACHE_BACKEND.lower()
+    path = settings.RESPONSE_CACHE_PATH or os.path.join(settings.INDICES_DIR, "response_cache.sqlite3")
+    key = (backend, os.path.abspath(path) if backend == "sqlite" else "")
+    with _backends_lock:
+        if key not in _backends:
+            if backend == "sqlite":
+                _backends[key] = SQLiteResponseCache(path, settings.RESPONSE_CACHE_MAX_SIZE, settings.RESPONSE_CACHE_TTL_SECONDS)
+            else:
+                if backend != "memory":
+                    logger.warning(f"Unknown RESPONSE_CACHE_BACKEND '{settings.RESPONSE_CACHE_BACKEND}'. Using 'memory'.")
+                _backends[key] = MemoryResponseCache(settings.RESPONSE_CACHE_MAX_SIZE, settings.RESPONSE_CACHE_TTL_SECONDS)
+        return _backends[key]
+
+def response_cache_stats() -> list:
+    with _backends_lock:
+        backends = list(_backends.values())
+    return [backend.stats() for backend in backends]
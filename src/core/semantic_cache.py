@@ -0,0 +1,96 @@
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+import faiss
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticResponseCache:
+    """
+    Per-PDF cache of answers keyed by question meaning rather than by the exact string.
+
+    Question embeddings are L2-normalized and kept in a small FAISS inner-product index, so the
+    search score is the cosine similarity. A lookup is a hit when the closest cached question is at
+    least `threshold` similar and its entry has not expired. Oldest entries are evicted past `max_entries`.
+    """
+    def __init__(self, threshold: float, max_entries: int, ttl_seconds: float = 0):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._index: Optional[faiss.IndexFlatIP] = None
+        self._entries: List[Tuple[str, Any, float]] = [] # (question, value, stored_at), aligned with the index rows
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.array(vector, dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _remove_locked(self, position: int):
+        self._index.remove_ids(np.array([position], dtype=np.int64)) # IndexFlat shifts later rows down, like the list
+        del self._entries[position]
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - stored_at > self.ttl_seconds
+
+    def lookup(self, vector) -> Optional[Tuple[Any, str, float]]:
+        """Returns (value, cached question, similarity) for the closest cached question above the threshold, or None."""
+        query = self._normalize(vector)
+        with self._lock:
+            if self._index is None or self._index.ntotal == 0 or self._index.d != query.shape[1]:
+                self.misses += 1
+                return None
+            scores, positions = self._index.search(query, 1)
+            similarity, position = float(scores[0][0]), int(positions[0][0])
+            if position < 0 or similarity < self.threshold:
+                self.misses += 1
+                return None
+            question, value, stored_at = self._entries[position]
+            if self._expired(stored_at):
+                self._remove_locked(position)
+                self.misses += 1
+                return None
+            self.hits += 1
+            return value, question, similarity
+
+    def store(self, vector, question: str, value: Any):
+        if self.max_entries <= 0:
+            return
+        row = self._normalize(vector)
+        with self._lock:
+            if self._index is None or self._index.d != row.shape[1]:
+                self._index = faiss.IndexFlatIP(row.shape[1])
+                self._entries = []
+            while len(self._entries) >= self.max_entries:
+                self._remove_locked(0)
+            self._index.add(row)
+            self._entries.append((question, value, time.time()))
+
+    def clear(self):
+        with self._lock:
+            if self._index is not None:
+                self._index.reset()
+            self._entries = []
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'threshold': self.threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            }
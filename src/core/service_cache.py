@@ -0,0 +1,158 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from src.core.services import IndexService, QueryService
+import logging
+
+logger = logging.getLogger(__name__)
+
+ServicePair = Tuple[IndexService, QueryService]
+
+class ServiceCache:
+    """
+    LRU cache of (IndexService, QueryService) pairs, keyed by PDF filename.
+
+    Entries are evicted least-recently-used first whenever the cache holds more than
+    `max_entries` pairs or their estimated memory exceeds `max_bytes` (0 disables the byte budget).
+    The most recently inserted entry is never evicted, so a single oversized PDF can still be served.
+    Evicted services are closed and are simply reloaded from disk the next time they are requested.
+
+    Requests hold the pair they answer with through `in_use`. A pair that is evicted, replaced or
+    `retire`d while in use is only closed when its last user is done, so its shared embedding model
+    reference is not released (and the model unloaded, then loaded again) under a running request.
+    """
+    def __init__(self, max_entries: int, max_bytes: int = 0):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(0, max_bytes)
+        self._entries: "OrderedDict[str, ServicePair]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._users: Dict[int, int] = {} # id(IndexService) -> requests using the pair
+        self._retired: Dict[int, ServicePair] = {} # Pairs out of the cache waiting for their users to finish
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def get(self, key: str) -> Optional[ServicePair]:
+        """Returns the cached pair (marking it most recently used) or None, updating hit/miss counters."""
+        with self._lock:
+            services = self._entries.get(key)
+            if services is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return services
+
+    def put(self, key: str, services: ServicePair):
+        """Inserts or replaces a pair, closing the replaced one, then evicts until within limits."""
+        size = self._estimate_size(services)
+        to_close = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            self._sizes.pop(key, None)
+            if previous is not None and previous[0] is not services[0]:
+                to_close.append(previous)
+            self._entries[key] = services
+            self._sizes[key] = size
+            to_close.extend(self._evict_locked(protected_key=key))
+            to_close = self._defer_in_use_locked(to_close)
+        for index_service, _ in to_close:
+            index_service.close()
+
+    def pop(self, key: str) -> Optional[ServicePair]:
+        """Removes a pair without closing it (the caller takes ownership, see `retire`)."""
+        with self._lock:
+            self._sizes.pop(key, None)
+            return self._entries.pop(key, None)
+
+    def retire(self, services: ServicePair):
+        """Closes a pair taken out with `pop`, now or once the requests still using it are done."""
+        with self._lock:
+            to_close = self._defer_in_use_locked([services])
+        for index_service, _ in to_close:
+            index_service.close()
+
+    @contextmanager
+    def in_use(self, services: ServicePair):
+        """Marks a pair as used by a request for the duration of the block."""
+        user_id = id(services[0])
+        with self._lock:
+            self._users[user_id] = self._users.get(user_id, 0) + 1
+        try:
+            yield services
+        finally:
+            retired = None
+            with self._lock:
+                self._users[user_id] -= 1
+                if self._users[user_id] == 0:
+                    del self._users[user_id]
+                    retired = self._retired.pop(user_id, None)
+            if retired is not None:
+                logger.info("ServiceCache: closing services evicted while in use.")
+                retired[0].close()
+
+    def _defer_in_use_locked(self, pairs: list) -> list:
+        """Of the pairs leaving the cache, returns the ones to close now and keeps the in-use ones for later."""
+        to_close = []
+        for services in pairs:
+            if self._users.get(id(services[0])):
+                self._retired[id(services[0])] = services
+            else:
+                to_close.append(services)
+        return to_close
+
+    def _evict_locked(self, protected_key: str) -> list:
+        evicted = []
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes and sum(self._sizes.values()) > self.max_bytes)
+        ):
+            oldest_key = next(iter(self._entries))
+            if oldest_key == protected_key:
+                break
+            evicted.append(self._entries.pop(oldest_key))
+            freed = self._sizes.pop(oldest_key, 0)
+            self.evictions += 1
+            logger.info(f"ServiceCache: evicted services for '{oldest_key}' (~{freed / (1024 * 1024):.1f}MB).")
+        return evicted
+
+    @staticmethod
+    def _estimate_size(services: ServicePair) -> int:
+        try:
+            return services[0].estimate_memory_bytes()
+        except Exception as e:
+            logger.warning(f"ServiceCache: could not estimate memory for cached services: {e}")
+            return 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'estimated_bytes': sum(self._sizes.values()),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'in_use': sum(self._users.values()),
+                'retired_in_use': len(self._retired),
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+                'keys': list(self._entries.keys()),
+            }
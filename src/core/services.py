@@ -3,7 +3,8 @@ import re
 import shutil
 import time
 import asyncio
-import cachetools
+import uuid
+import numpy as np
 from typing import Optional, List, Tuple, AsyncGenerator
 import pickle
 
@@ -11,13 +12,23 @@ from langchain_core.documents import Document
 
 from src.config.settings import settings
 from src.infra.pdf_repository import PDFRepository
-from src.infra.embeddings_factory import EmbeddingFactory
+from src.infra.embeddings_factory import embedding_registry
+from src.infra.embedding_cache import CachedEmbeddings, get_embedding_cache, get_query_embedding_cache
 from src.infra.chunk_strategies import ChunkStrategyFactory, ChunkStrategy
 from src.infra.vector_store_repository import VectorStoreRepository
-from src.infra.retriever_strategies import HybridRetrieverStrategy, RetrieverStrategy # Add others if needed
+from src.infra.chunk_store import ChunkStore
+from src.infra.vector_index_factory import VectorIndexOptions
+from src.infra.ingestion_pipeline import IngestionPipeline, PreviousPages
+from src.infra.retriever_strategies import HybridRetrieverStrategy, RetrieverStrategy, embed_queries # Add others if needed
+from src.infra.bm25_index import BM25Index
+from src.infra.index_catalog import get_index_catalog, compute_index_config_hash, build_index_key
 from src.core.prompt_builder import PromptBuilder
-from src.core.llm_client import LLMClient
+from src.core.llm_client import LLMClient, GenerationOptions, GENERATION_ERROR_PREFIX
 from src.core.event_manager import EventManager
+from src.core.semantic_cache import SemanticResponseCache
+from src.core.response_cache import ResponseCacheBackend, get_response_cache, response_cache_key
+from src.core.stream_coalescer import StreamCoalescer
+from src.core.context_packer import ContextPacker, PackedContext, get_token_counter
 from src.utils.format_utils import format_docs_for_api, format_docs_for_cli
 from src.utils.cli_utils import LoadingIndicator # For CLI usage, might be conditional
 from src.utils.file_utils import ensure_pdf_is_in_pdfs_dir
@@ -35,21 +46,46 @@ class IndexService:
         self.original_pdf_path = pdf_path
         self.pdf_path_in_managed_dir = ensure_pdf_is_in_pdfs_dir(pdf_path)
         
-        self.pdf_basename = os.path.basename(self.pdf_path_in_managed_dir).split('.')[0]
-        self.index_path = os.path.join(settings.INDICES_DIR, f"index_{self.pdf_basename}")
+        self.pdf_filename = os.path.basename(self.pdf_path_in_managed_dir)
+        self.pdf_basename = self.pdf_filename.split('.')[0]
+
+        # Content-addressed storage: the index is keyed by the PDF bytes plus the chunking/embedding
+        # config, so identical PDFs share one index and config changes never reuse stale vectors.
+        self.index_catalog = get_index_catalog(settings.INDICES_DIR)
+        self.content_hash = self.index_catalog.content_hash_for(self.pdf_path_in_managed_dir)
+        self.config_hash = compute_index_config_hash(settings)
+        self.index_key = build_index_key(self.content_hash, self.config_hash)
+        self.index_path = self.index_catalog.index_path_for_key(self.index_key)
         
         self.event_manager = event_manager
         self.force_reindex = force_reindex
 
-        self.pdf_repo = PDFRepository()
-        self.embedding_model = EmbeddingFactory.get_model(
+        self.pdf_repo = PDFRepository(
+            workers=settings.PDF_EXTRACTION_WORKERS,
+            parallel_min_pages=settings.PDF_PARALLEL_MIN_PAGES
+        )
+        # Shared, reference-counted model instance; released in close()
+        self.embedding_model = embedding_registry.acquire(
             settings.EMBEDDING_MODEL_NAME,             
             settings.DEVICE_CONFIGURATION,
             show_progress=True
         )
+        self._embedding_released = False
+        self.embedding_cache = None
+        index_embeddings = self.embedding_model
+        if settings.EMBEDDING_CACHE_ENABLED:
+            # Chunks repetidos entre PDFs (cabeçalhos, avisos legais, anexos) são embedados uma única vez
+            self.embedding_cache = get_embedding_cache(
+                settings.EMBEDDING_CACHE_DIR or os.path.join(settings.INDICES_DIR, "embedding_cache"),
+                settings.EMBEDDING_MODEL_NAME,
+                max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES
+            )
+            index_embeddings = CachedEmbeddings(self.embedding_model, self.embedding_cache)
         self.vs_repo = VectorStoreRepository(
             storage_path=self.index_path, 
-            embeddings=self.embedding_model
+            embeddings=index_embeddings,
+            index_options=VectorIndexOptions.from_settings(settings),
+            mmap=settings.FAISS_MMAP_LOAD
         )
         self.chunk_strategy: ChunkStrategy = ChunkStrategyFactory.get_strategy(
             mode=settings.CHUNKING_MODE,
@@ -59,6 +95,7 @@ class IndexService:
         
         self.vector_store = None
         self.all_chunks: Optional[List[Document]] = None
+        self.bm25_index: Optional[BM25Index] = None
         logger.info(f"IndexService initialized for PDF: {self.pdf_path_in_managed_dir}, Force reindex: {self.force_reindex}")
 
     async def initialize_index(self, use_cli_indicator: bool = False):
@@ -73,6 +110,8 @@ class IndexService:
                     self.vector_store, self.all_chunks = await asyncio.to_thread(self.vs_repo.load)
             else:
                 self.vector_store, self.all_chunks = await asyncio.to_thread(self.vs_repo.load)
+            self.bm25_index = self.vs_repo.bm25_index
+            self._relabel_chunk_sources()
 
             logger.info(f"Index loaded successfully from {self.index_path}")
             self.event_manager.emit('index_loaded', {'path': self.index_path})
@@ -83,15 +122,35 @@ class IndexService:
                 logger.info(f"No index found or re-index forced for {self.pdf_path_in_managed_dir}. Creating new index.")
             await self._create_index(use_cli_indicator)
 
+        self.index_catalog.record_index(self.pdf_path_in_managed_dir, self.content_hash, self.index_key)
         self.event_manager.emit('index_setup_completed', {'pdf_path': self.pdf_path_in_managed_dir})
 
+    def _relabel_chunk_sources(self):
+        """Indices are shared by identical PDFs: point the chunks' source metadata at this PDF's file."""
+        if isinstance(self.all_chunks, ChunkStore):
+            # Documents are built on demand from the store, which also backs the FAISS docstore
+            self.all_chunks.override_metadata(source=self.pdf_path_in_managed_dir, file_path=self.pdf_path_in_managed_dir)
+            return
+        docs = list(self.all_chunks or [])
+        docstore = getattr(self.vector_store, 'docstore', None)
+        docs.extend(getattr(docstore, '_dict', {}).values())
+        for doc in docs:
+            if doc.metadata.get('source') not in (None, self.pdf_path_in_managed_dir):
+                doc.metadata['source'] = self.pdf_path_in_managed_dir
+                if 'file_path' in doc.metadata:
+                    doc.metadata['file_path'] = self.pdf_path_in_managed_dir
+
     async def _ensure_chunks_available_for_retriever(self, use_cli_indicator: bool = False):
         """Ensures self.all_chunks is populated, loading from disk if available."""
-        chunks_path = os.path.join(self.index_path, "index_chunks.pkl")
+        legacy_chunks_path = os.path.join(self.index_path, VectorStoreRepository.LEGACY_CHUNKS_FILE)
         if self.all_chunks is None:
-            if os.path.exists(chunks_path):
+            if ChunkStore.exists(self.index_path):
+                logger.info("Opening chunk store from disk.")
+                self.all_chunks = ChunkStore.open(self.index_path)
+                self._relabel_chunk_sources()
+            elif os.path.exists(legacy_chunks_path):
                 logger.info("Loading chunks from disk.")
-                with open(chunks_path, "rb") as f:
+                with open(legacy_chunks_path, "rb") as f:
                     self.all_chunks = pickle.load(f)
             else:
                 logger.info("Chunks not found on disk. Processing PDF to generate chunks.")
@@ -106,10 +165,6 @@ class IndexService:
                 for i, doc_chunk in enumerate(self.all_chunks):
                     doc_chunk.metadata['chunk_index'] = i + 1
 
-                # Save chunks to disk for future use
-                with open(chunks_path, "wb") as f:
-                    pickle.dump(self.all_chunks, f)
-
                 logger.info(f"PDF processed into {len(self.all_chunks)} chunks for retriever.")
 
 
@@ -117,32 +172,79 @@ class IndexService:
         logger.info(f"Starting PDF processing for indexing: {self.pdf_path_in_managed_dir}")
         self.event_manager.emit('index_creation_started', {'path': self.index_path})
 
-        indicator_msg_pdf = "Lendo PDF..."
+        previous = await asyncio.to_thread(self._load_previous_index)
+        # Páginas fluem da extração para o chunking e para o embedding em lotes; páginas sem alteração
+        # em relação ao índice anterior reaproveitam os vetores em vez de serem embedadas de novo.
+        pipeline = IngestionPipeline(
+            chunk_strategy=self.chunk_strategy,
+            embeddings=self.vs_repo.embeddings,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            queue_size=settings.INGESTION_QUEUE_SIZE,
+            on_progress=self._emit_ingestion_progress
+        )
+        run_pipeline = lambda: pipeline.run(
+            self.pdf_repo.iter_pages(self.pdf_path_in_managed_dir),
+            PreviousPages(*previous) if previous else None
+        )
+
+        indicator_msg = "Lendo PDF e criando vetores e índice FAISS..."
         if use_cli_indicator:
-            with LoadingIndicator(indicator_msg_pdf):
-                documents = await asyncio.to_thread(self.pdf_repo.load, self.pdf_path_in_managed_dir)
+            with LoadingIndicator(indicator_msg):
+                result = await asyncio.to_thread(run_pipeline)
         else:
-            documents = await asyncio.to_thread(self.pdf_repo.load, self.pdf_path_in_managed_dir)
-        
-        logger.info(f"PDF loaded: {len(documents)} pages.")
-        # Add document stats logging here if desired
-
-        self.all_chunks = await asyncio.to_thread(self.chunk_strategy.split, documents)
-        for i, doc_chunk in enumerate(self.all_chunks): # Add chunk_index metadata
-            doc_chunk.metadata['chunk_index'] = i + 1
+            result = await asyncio.to_thread(run_pipeline)
+        self.all_chunks = result.chunks
 
-        logger.info(f"Document split into {len(self.all_chunks)} chunks using mode: {settings.CHUNKING_MODE}")
+        logger.info(f"PDF processed: {len(result.page_fingerprints)} pages split into {len(self.all_chunks)} chunks using mode: {settings.CHUNKING_MODE}")
         self.event_manager.emit('chunks_split', {'count': len(self.all_chunks), 'mode': settings.CHUNKING_MODE})
-
-        indicator_msg_faiss = "Criando vetores e índice FAISS..."
-        if use_cli_indicator:
-            with LoadingIndicator(indicator_msg_faiss):
-                self.vector_store = await asyncio.to_thread(self.vs_repo.create, self.all_chunks)
-        else:
-            self.vector_store = await asyncio.to_thread(self.vs_repo.create, self.all_chunks)
+        if result.pages_reused:
+            logger.info(
+                f"Incremental re-index: {result.pages_reused}/{len(result.page_fingerprints)} pages unchanged, "
+                f"{result.chunks_embedded}/{len(self.all_chunks)} chunks embedded."
+            )
+            self.event_manager.emit('index_incremental_update', {
+                'pages_total': len(result.page_fingerprints),
+                'pages_reused': result.pages_reused,
+                'chunks_total': len(self.all_chunks),
+                'chunks_embedded': result.chunks_embedded,
+            })
+
+        await asyncio.to_thread(self.vs_repo.optimize_index, result.index)
+        await asyncio.to_thread(self.vs_repo.save, result.index, self.all_chunks, result.page_fingerprints)
+        # Reabre do disco: chunks passam a ser servidos pelo ChunkStore (mmap) e as cópias em memória são liberadas
+        self.vector_store, self.all_chunks = await asyncio.to_thread(self.vs_repo.load)
+        self.bm25_index = self.vs_repo.bm25_index
             
         logger.info(f"FAISS index created and saved to {self.index_path}")
-        self.event_manager.emit('index_created', {'path': self.index_path})
+        self.event_manager.emit('index_created', {
+            'path': self.index_path,
+            'embedding_cache': self.embedding_cache.stats() if self.embedding_cache else None
+        })
+
+    def _emit_ingestion_progress(self, pages_done: int, chunks: int, total_pages: Optional[int]):
+        self.event_manager.emit('ingestion_progress', {'pages_done': pages_done, 'total_pages': total_pages, 'chunks': chunks})
+
+    def _load_previous_index(self):
+        """
+        Índice anterior deste PDF com a mesma configuração, para reindexação incremental: o próprio
+        diretório (force_reindex) ou o índice da versão anterior do arquivo registrado no catálogo.
+        """
+        candidates = [self.index_path]
+        entry = self.index_catalog.get(self.pdf_filename) or {}
+        previous_key = entry.get('index_key')
+        if previous_key and previous_key != self.index_key and previous_key.endswith(f"_{self.config_hash[:12]}"):
+            candidates.append(self.index_catalog.index_path_for_key(previous_key))
+
+        for path in candidates:
+            try:
+                previous = VectorStoreRepository(storage_path=path, embeddings=self.embedding_model).load_for_reuse()
+            except Exception as e:
+                logger.warning(f"Could not load previous index at {path} for reuse: {e}")
+                continue
+            if previous:
+                logger.info(f"Reusing unchanged pages from previous index at {path}")
+                return previous
+        return None
 
     def get_vector_store(self):
         if not self.vector_store:
@@ -164,6 +266,29 @@ class IndexService:
             return None
         return self.all_chunks
 
+    def get_bm25_index(self) -> Optional[BM25Index]:
+        return self.bm25_index
+
+    def estimate_memory_bytes(self) -> int:
+        """Rough in-memory footprint of the loaded index: vectors, chunk texts (held by both the
+        docstore and all_chunks) and the BM25 arrays. Used for memory-aware cache eviction."""
+        total = 0
+        faiss_index = getattr(self.vector_store, 'index', None)
+        if faiss_index is not None and not self.vs_repo.memory_mapped: # Mapped vectors live in the shared page cache
+            total += faiss_index.ntotal * faiss_index.d * 4
+        if self.all_chunks and not isinstance(self.all_chunks, ChunkStore): # The store is memory-mapped
+            per_chunk_overhead = 1024 # Document object + metadata dict
+            total += 2 * sum(len(c.page_content) * 2 + per_chunk_overhead for c in self.all_chunks)
+        if self.bm25_index is not None:
+            total += self.bm25_index.nbytes
+        return total
+
+    def close(self):
+        """Releases the shared embedding model reference held by this service."""
+        if not self._embedding_released:
+            embedding_registry.release(settings.EMBEDDING_MODEL_NAME, settings.DEVICE_CONFIGURATION)
+            self._embedding_released = True
+
 
 class QueryService:
     def __init__(
@@ -172,7 +297,10 @@ class QueryService:
         all_chunks: List[Document], # Needed for BM25 part of HybridRetriever
         event_manager: EventManager,
         prompt_builder: PromptBuilder,
-        llm_client: LLMClient
+        llm_client: LLMClient,
+        bm25_index: Optional[BM25Index] = None, # Prebuilt BM25 index; built from all_chunks if not provided
+        content_hash: Optional[str] = None, # SHA-256 of the PDF; scopes cached answers (process-local if not given)
+        response_cache: Optional[ResponseCacheBackend] = None # Defaults to the process-wide backend from settings
     ):
         self.vector_store = vector_store
         self.all_chunks = all_chunks
@@ -180,9 +308,27 @@ class QueryService:
         self.prompt_builder = prompt_builder
         self.llm_client = llm_client
 
-        self.response_cache = cachetools.TTLCache(
-            maxsize=settings.RESPONSE_CACHE_MAX_SIZE,
-            ttl=settings.RESPONSE_CACHE_TTL_SECONDS
+        # Answers are shared with every service (and, with the SQLite backend, every worker) serving the same
+        # PDF content, model and prompt version
+        self.content_hash = content_hash or f"instance-{uuid.uuid4().hex}"
+        self.response_cache = response_cache if response_cache is not None else get_response_cache(settings)
+        # Identical questions arriving while an answer is still streaming share that generation
+        self.stream_coalescer = StreamCoalescer()
+        # Optional cache matching paraphrases of questions already answered for this PDF.
+        # It lives and dies with this QueryService, which is rebuilt whenever the PDF is re-indexed.
+        self.semantic_cache: Optional[SemanticResponseCache] = None
+        if settings.SEMANTIC_CACHE_ENABLED:
+            self.semantic_cache = SemanticResponseCache(
+                threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+                max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS
+            )
+        self.query_embedding_cache = get_query_embedding_cache(settings.QUERY_EMBEDDING_CACHE_SIZE) if settings.QUERY_EMBEDDING_CACHE_SIZE > 0 else None
+        # Fits the retrieved chunks into the LLM's context window
+        self.context_packer = ContextPacker(
+            token_counter=get_token_counter(settings.LLM_TOKENIZER),
+            context_window=settings.LLM_CONTEXT_WINDOW,
+            answer_reserve_tokens=settings.LLM_ANSWER_TOKEN_RESERVE
         )
         
         # Setup Retriever Strategy
@@ -197,10 +343,72 @@ class QueryService:
                 threshold=settings.VECTOR_DISTANCE_THRESHOLD,
                 initial_k=settings.INITIAL_VECTOR_K,
                 final_k=settings.FINAL_BM25_K,
-                documents=self.all_chunks
+                documents=self.all_chunks,
+                bm25_index=bm25_index,
+                query_cache=self.query_embedding_cache
             )
         logger.info("QueryService initialized.")
 
+    def invalidate_response_caches(self):
+        """Drops every cached answer (exact and semantic), e.g. when the PDF behind this service changes."""
+        self.response_cache.invalidate(self.content_hash)
+        if self.semantic_cache is not None:
+            self.semantic_cache.clear()
+
+    def _response_cache_key(self, question: str, options: Optional[GenerationOptions] = None) -> str:
+        # Generation options that change the answer (num_ctx, num_predict) are part of the prompt version
+        prompt_version = f"{self.prompt_builder.version}|{self.llm_client.options.merged(options).cache_tag()}"
+        return response_cache_key(self.content_hash, self.llm_client.model_name, prompt_version, question)
+
+    def _uses_default_options(self, options: Optional[GenerationOptions]) -> bool:
+        """The semantic cache only holds answers generated with the configured options."""
+        return self.llm_client.options.merged(options) == self.llm_client.options
+
+    def get_cached_answer(self, question: str, options: Optional[GenerationOptions] = None) -> Optional[Tuple[str, List[str]]]:
+        """(answer, sources) if this exact question is in the response cache, without generating anything."""
+        cached_response = self.response_cache.get(self._response_cache_key(question, options))
+        if cached_response is None:
+            return None
+        return cached_response['final_answer'], cached_response['sources']
+
+    def _cache_response(
+        self,
+        question: str,
+        answer: str,
+        sources: List[str],
+        streamed_parts: Optional[list] = None,
+        options: Optional[GenerationOptions] = None
+    ) -> dict:
+        """Stores an answer in the response cache. Non-streamed answers replay as a sources event plus one text chunk."""
+        entry = {
+            'final_answer': answer,
+            'sources': sources,
+            'streamed_parts': streamed_parts or [("sources", {"sources": sources}), ("text_chunk", {"chunk": answer})]
+        }
+        self.response_cache.set(self._response_cache_key(question, options), entry, content_hash=self.content_hash)
+        return entry
+
+    async def _semantic_lookup(self, question: str, options: Optional[GenerationOptions] = None) -> Tuple[Optional[dict], Optional[np.ndarray]]:
+        """Looks the question up in the semantic cache. Returns (cached entry or None, question vector for storing later)."""
+        if self.semantic_cache is None or not self._uses_default_options(options):
+            return None, None
+        # Goes through the query embedding cache, so retrieval does not embed the question again on a miss
+        vector = (await asyncio.to_thread(
+            embed_queries, self.vector_store.embedding_function, [question], self.query_embedding_cache
+        ))[0]
+        hit = self.semantic_cache.lookup(vector)
+        if hit is None:
+            return None, vector
+        entry, cached_question, similarity = hit
+        logger.info(f"Semantic cache hit for '{question}' (matches '{cached_question}', similarity {similarity:.3f}).")
+        self.event_manager.emit('semantic_cache_hit', {'question': question, 'cached_question': cached_question, 'similarity': similarity})
+        return entry, vector
+
+    def _semantic_store(self, vector: Optional[np.ndarray], question: str, entry: dict):
+        if self.semantic_cache is None or vector is None:
+            return
+        self.semantic_cache.store(vector, question, entry)
+
     def _decompose_complex_query(self, query: str) -> List[str]:
         """Decomposes a complex query into simpler sub-queries."""
         # Enhanced decomposition logic
@@ -259,9 +467,13 @@ class QueryService:
         all_retrieved_docs: List[Document] = []
         if len(sub_queries) > 1:
             logger.info(f"Decomposed query into {len(sub_queries)} parts: {sub_queries}")
-            for sub_q in sub_queries:
-                # Run retrieval in thread pool as it might have sync parts
-                docs = await asyncio.to_thread(self.retriever_strategy.retrieve, sub_q)
+            # One embedding batch and one vector search for all parts, then the per-part reranks run concurrently
+            candidates = await asyncio.to_thread(self.retriever_strategy.search_many, sub_queries)
+            reranked = await asyncio.gather(*(
+                asyncio.to_thread(self.retriever_strategy.rerank, sub_q, sub_candidates)
+                for sub_q, sub_candidates in zip(sub_queries, candidates)
+            ))
+            for docs in reranked:
                 all_retrieved_docs.extend(docs)
             # Deduplicate documents
             seen_content_hashes = set()
@@ -280,18 +492,60 @@ class QueryService:
         self.event_manager.emit('retrieval_completed', {'count': len(final_docs), 'time': retrieval_time})
         return final_docs
 
-    async def answer_question_streaming(self, question: str) -> AsyncGenerator[Tuple[str, Optional[dict]], None]:
+    def _pack_context(self, question: str, docs: List[Document], options: Optional[GenerationOptions] = None) -> PackedContext:
+        """Packs the retrieved chunks into the token budget left by the prompt for this question."""
+        overhead = self.context_packer.token_counter.count(self.prompt_builder.build("", question))
+        packed = self.context_packer.pack(docs, overhead, context_window=self.llm_client.options.merged(options).num_ctx)
+        self.event_manager.emit('context_packed', {'question': question, 'tokenizer': self.context_packer.token_counter.name, **packed.stats()})
+        if packed.dropped or packed.truncated:
+            logger.info(
+                f"Context packed into {packed.budget_tokens} tokens: {len(packed.documents)}/{packed.retrieved} chunks used "
+                f"({packed.truncated} truncated, {len(packed.dropped)} dropped)."
+            )
+        return packed
+
+    async def answer_question_streaming(
+        self,
+        question: str,
+        priority: str = 'normal',
+        options: Optional[GenerationOptions] = None
+    ) -> AsyncGenerator[Tuple[str, Optional[dict]], None]:
         """
         Answers a question by retrieving documents, then generating a response with LLM, streaming results.
         Yields tuples of (event_type, data_dict).
         Example events: ("text_chunk", {"chunk": "..."}), ("sources", {"sources": [...]})
+
+        Concurrent requests for the same question are coalesced: one retrieval and generation runs and
+        its events are broadcast to every request, late joiners first receiving the events produced so far.
+        Once every request has gone away (closed this generator), the run is cancelled and nothing is cached.
+        While waiting for an LLM slot, ("queue_position", {"position": n, "priority": ...}) events are yielded;
+        GenerationQueueFullError is raised if the LLM wait queue is full.
+        `options` overrides the configured GenerationOptions (keep_alive, num_ctx, num_predict) for this question.
         """
-        cached_response = self.response_cache.get(question)
-        if cached_response and isinstance(cached_response, dict) and 'answer_stream_complete' in cached_response:
+        key = (question, self.llm_client.options.merged(options).cache_tag())
+        if self.stream_coalescer.in_flight(key):
+            self.event_manager.emit('answer_stream_joined', {'question': question})
+        async for part in self.stream_coalescer.stream(key, lambda: self._answer_question_streaming(question, priority, options)):
+            yield part
+
+    async def _answer_question_streaming(
+        self,
+        question: str,
+        priority: str,
+        options: Optional[GenerationOptions]
+    ) -> AsyncGenerator[Tuple[str, Optional[dict]], None]:
+        cached_response = self.response_cache.get(self._response_cache_key(question, options))
+        if cached_response is not None:
             logger.info(f"Full answer stream for '{question}' found in cache.")
-            # This simplistic cache re-yields stored chunks. A real SSE cache might be more complex.
-            for part in cached_response.get('streamed_parts', []):
-                yield part # part is (event_type, data_dict)
+            # Replays the same (event_type, data_dict) sequence the original generation yielded
+            for part in cached_response['streamed_parts']:
+                yield part
+            return
+
+        semantic_entry, question_vector = await self._semantic_lookup(question, options)
+        if semantic_entry is not None:
+            for part in semantic_entry['streamed_parts']:
+                yield part
             return
 
         logger.info(f"Processing question (streaming): '{question}'")
@@ -303,7 +557,9 @@ class QueryService:
             yield ("sources", {"sources": []})
             return
 
-        context_text, sources_list = format_docs_for_api(final_docs)
+        packed = self._pack_context(question, final_docs, options)
+        context_text = packed.text
+        _, sources_list = format_docs_for_api(packed.documents)
         # Yield sources first
         yield ("sources", {"sources": sources_list})
         
@@ -315,30 +571,44 @@ class QueryService:
             yield ("text_chunk", {"chunk": "O contexto extraído dos documentos está vazio."})
             return
 
-        logger.info(f"Context generated: {len(context_text)} chars. Asking LLM.")
+        logger.info(f"Context generated: {len(context_text)} chars, ~{packed.prompt_tokens} prompt tokens. Asking LLM.")
         
         full_answer = ""
-        async for answer_chunk in self.llm_client.generate(context_text, question):
-            yield ("text_chunk", {"chunk": answer_chunk})
-            streamed_parts_for_cache.append(("text_chunk", {"chunk": answer_chunk}))
-            full_answer += answer_chunk
-        
-        # Cache the full streamed response if needed (more complex for generators)
-        # For simplicity, we'll cache the final answer and sources for non-streaming,
-        # and a marker that the stream was completed.
-        self.response_cache[question] = {
-            'answer_stream_complete': True, 
-            'final_answer_for_reference': full_answer, # Not directly used by streaming client
-            'sources': sources_list,
-            'streamed_parts': streamed_parts_for_cache # For re-yielding if cached
-        }
+        generation_failed = False
+        # Queue positions are reported to the client but never cached
+        async with self.llm_client.admission.ticket(priority) as ticket:
+            async for position in ticket.positions():
+                yield ("queue_position", {"position": position, "priority": priority})
+            async for answer_chunk in self.llm_client.generate(context_text, question, ticket=ticket, options=options):
+                yield ("text_chunk", {"chunk": answer_chunk})
+                streamed_parts_for_cache.append(("text_chunk", {"chunk": answer_chunk}))
+                full_answer += answer_chunk
+                generation_failed = answer_chunk.startswith(GENERATION_ERROR_PREFIX)
+
+        # Only complete answers are cached: a cancelled stream never gets here, a failed one ends with the error
+        if generation_failed:
+            logger.warning(f"Not caching the answer to '{question}': the generation failed.")
+            return
+        # Cache the complete stream; the non-streaming path serves the same entry from 'final_answer'
+        entry = self._cache_response(question, full_answer, sources_list, streamed_parts_for_cache, options=options)
+        self._semantic_store(question_vector, question, entry)
 
-    async def answer_question_non_streaming(self, question: str, use_cli_formatting: bool = False) -> Tuple[str, List[str]]:
+    async def answer_question_non_streaming(
+        self,
+        question: str,
+        use_cli_formatting: bool = False,
+        priority: str = 'normal',
+        options: Optional[GenerationOptions] = None
+    ) -> Tuple[str, List[str]]:
         """Answers a question, returns full answer and sources (non-streaming)."""
-        cached_response = self.response_cache.get(question)
-        if cached_response and isinstance(cached_response, dict) and 'final_answer' in cached_response:
+        cached_answer = self.get_cached_answer(question, options)
+        if cached_answer is not None:
             logger.info(f"Answer for '{question}' found in cache.")
-            return cached_response['final_answer'], cached_response['sources']
+            return cached_answer
+
+        semantic_entry, question_vector = await self._semantic_lookup(question, options)
+        if semantic_entry is not None:
+            return semantic_entry['final_answer'], semantic_entry['sources']
 
         logger.info(f"Processing question (non-streaming): '{question}'")
         
@@ -347,24 +617,21 @@ class QueryService:
             logger.warning("No relevant documents found.")
             return "Não foram encontrados documentos relevantes para essa pergunta.", []
 
+        packed = self._pack_context(question, final_docs, options)
+        context_text = packed.text
         if use_cli_formatting:
-            # format_docs_for_cli prints, so we need a version that returns text for context
-            # For now, let's use a simplified context for CLI or adapt format_docs_for_cli
-            context_text_cli = "\n\n".join([doc.page_content for doc in final_docs])
             # Call the printing version for CLI feedback
-            format_docs_for_cli(final_docs) # This prints to console
-            context_text = context_text_cli
-            _, sources_list = format_docs_for_api(final_docs) # Get sources consistently
-        else:
-            context_text, sources_list = format_docs_for_api(final_docs)
+            format_docs_for_cli(packed.documents) # This prints to console
+        _, sources_list = format_docs_for_api(packed.documents) # Get sources consistently
 
         if not context_text.strip():
             logger.warning("Context text is empty after formatting documents.")
             return "O contexto extraído dos documentos está vazio.", []
         
-        logger.info(f"Context generated: {len(context_text)} chars. Asking LLM (non-streaming).")
+        logger.info(f"Context generated: {len(context_text)} chars, ~{packed.prompt_tokens} prompt tokens. Asking LLM (non-streaming).")
         
-        answer = await self.llm_client.generate_non_streaming(context_text, question)
+        answer = await self.llm_client.generate_non_streaming(context_text, question, priority=priority, options=options)
         
-        self.response_cache[question] = {'final_answer': answer, 'sources': sources_list}
+        entry = self._cache_response(question, answer, sources_list, options=options)
+        self._semantic_store(question_vector, question, entry)
         return answer, sources_list
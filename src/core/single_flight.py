@@ -0,0 +1,52 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """
+    Per-key async single-flight coordination.
+
+    Concurrent callers of `run` with the same key share a single execution of the factory:
+    the first caller starts it as a task and every other caller awaits that same result
+    (or exception). Waiters are shielded, so a cancelled request does not cancel the shared work.
+    """
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[T]], join_existing: bool = True) -> T:
+        """
+        Runs `factory()` once per key at a time.
+
+        With `join_existing=False` the caller never reuses an in-flight result: it waits for any
+        current execution for the key to finish and then starts its own, so two executions for
+        the same key (e.g. a load and a rebuild of the same index directory) never overlap.
+        """
+        if not join_existing:
+            while key in self._inflight:
+                try:
+                    await asyncio.shield(self._inflight[key])
+                except Exception:
+                    pass # The previous execution's failure belongs to its own callers
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._on_done(key, t))
+        else:
+            logger.info(f"SingleFlight: joining in-flight execution for '{key}'.")
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception() # Mark as retrieved even if every waiter went away
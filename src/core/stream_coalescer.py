@@ -0,0 +1,99 @@
+import asyncio
+from typing import AsyncIterator, Callable, Dict, Hashable, List, Optional, TypeVar
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class _Broadcast:
+    """One running stream: every item produced so far plus a signal for new items or the end."""
+    def __init__(self):
+        self.items: List = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Future] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, item):
+        self.items.append(item)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+    def _notify(self):
+        # Each change replaces the event, so subscribers waiting on the old one all wake up exactly once
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self) -> AsyncIterator:
+        position = 0
+        while True:
+            changed = self._changed
+            while position < len(self.items):
+                yield self.items[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+class StreamCoalescer:
+    """
+    Per-key fan-out of async streams (the streaming counterpart of SingleFlight).
+
+    Concurrent callers of `stream` with the same key share a single run of the factory's async
+    iterator: every subscriber receives every item in order, and one that joins late first gets
+    the items produced so far. An exception ends every subscriber's stream with that exception.
+
+    When the last subscriber goes away before the run ends, the run is cancelled (its iterator gets
+    CancelledError), unless `cancel_abandoned` is False; a later caller with the same key starts a new run.
+    """
+    def __init__(self, cancel_abandoned: bool = True):
+        self._inflight: Dict[Hashable, _Broadcast] = {}
+        self.cancel_abandoned = cancel_abandoned
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        broadcast = self._inflight.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            self._inflight[key] = broadcast
+            broadcast.task = asyncio.ensure_future(self._produce(key, broadcast, factory))
+            broadcast.task.add_done_callback(lambda t: t.cancelled() or t.exception()) # Errors are delivered to the subscribers
+        else:
+            logger.info(f"StreamCoalescer: joining in-flight stream for '{key}' ({len(broadcast.items)} items already produced).")
+        broadcast.subscribers += 1
+        try:
+            async for item in broadcast.subscribe():
+                yield item
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.done and self.cancel_abandoned:
+                logger.info(f"StreamCoalescer: every subscriber of '{key}' left. Cancelling its run.")
+                if self._inflight.get(key) is broadcast:
+                    del self._inflight[key]
+                broadcast.task.cancel()
+
+    async def _produce(self, key: Hashable, broadcast: _Broadcast, factory: Callable[[], AsyncIterator[T]]):
+        error = None
+        try:
+            async for item in factory():
+                broadcast.publish(item)
+        except BaseException as e: # Including cancellation: subscribers must not wait forever
+            error = e
+        finally:
+            if self._inflight.get(key) is broadcast:
+                del self._inflight[key]
+            broadcast.finish(error)
+        if isinstance(error, asyncio.CancelledError):
+            raise error
@@ -0,0 +1,192 @@
+import os
+import json
+from collections import Counter
+from typing import Callable, Iterable, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+def default_preprocess(text: str) -> List[str]:
+    """Mesma tokenização padrão do BM25Retriever do LangChain."""
+    return text.split()
+
+
+class BM25Index:
+    """
+    Índice BM25 (Okapi) pré-computado uma única vez sobre todos os chunks de um PDF.
+
+    As frequências de termos ficam em arrays ordenados por (posição do chunk, termo), de forma que
+    pontuar um subconjunto de chunks candidatos custa apenas buscas binárias vetorizadas, sem
+    re-tokenizar nem reconstruir estatísticas a cada pergunta.
+    """
+    ARRAYS_FILE = "bm25_index.npz"
+    VOCAB_FILE = "bm25_vocab.json"
+
+    def __init__(
+        self,
+        chunk_ids: np.ndarray,
+        vocabulary: dict,
+        keys: np.ndarray,
+        term_freqs: np.ndarray,
+        doc_len: np.ndarray,
+        idf: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+        preprocess_func: Callable[[str], List[str]] = default_preprocess
+    ):
+        self.chunk_ids = chunk_ids
+        self.vocabulary = vocabulary
+        self.keys = keys              # posição_do_chunk * tamanho_do_vocabulário + id_do_termo (ordenado)
+        self.term_freqs = term_freqs  # frequência do termo alinhada com `keys`
+        self.doc_len = doc_len
+        self.idf = idf
+        self.k1 = k1
+        self.b = b
+        self.preprocess_func = preprocess_func
+        self.avgdl = float(doc_len.mean()) if len(doc_len) and doc_len.mean() > 0 else 1.0
+        self._position_by_chunk_id = {int(cid): pos for pos, cid in enumerate(chunk_ids)}
+
+    @classmethod
+    def from_documents(
+        cls,
+        documents: List[Document],
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+        preprocess_func: Callable[[str], List[str]] = default_preprocess
+    ) -> "BM25Index":
+        """Constrói o índice a partir dos chunks. O id de cada chunk é o metadado 'chunk_index' (ou a posição + 1)."""
+        chunk_ids = [doc.metadata.get('chunk_index', pos + 1) for pos, doc in enumerate(documents)]
+        return cls.from_texts((doc.page_content for doc in documents), chunk_ids, k1=k1, b=b, epsilon=epsilon, preprocess_func=preprocess_func)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: Iterable[str],
+        chunk_ids: Sequence[int],
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+        preprocess_func: Callable[[str], List[str]] = default_preprocess
+    ) -> "BM25Index":
+        """Constrói o índice a partir dos textos dos chunks (ex.: lidos de um ChunkStore) e dos seus ids."""
+        vocabulary: dict = {}
+        rows: List[Counter] = []
+        for text in texts:
+            counts = Counter()
+            for token in preprocess_func(text):
+                counts[vocabulary.setdefault(token, len(vocabulary))] += 1
+            rows.append(counts)
+
+        vocab_size = max(len(vocabulary), 1)
+        keys: List[int] = []
+        term_freqs: List[int] = []
+        doc_freq = np.zeros(len(vocabulary), dtype=np.int64)
+        for pos, counts in enumerate(rows):
+            for term_id in sorted(counts):
+                keys.append(pos * vocab_size + term_id)
+                term_freqs.append(counts[term_id])
+                doc_freq[term_id] += 1
+
+        # Mesmo cálculo de IDF do rank_bm25.BM25Okapi (com piso epsilon * idf médio)
+        corpus_size = len(rows)
+        idf = np.log(corpus_size - doc_freq + 0.5) - np.log(doc_freq + 0.5)
+        if len(idf):
+            idf[idf < 0] = epsilon * idf.mean()
+
+        return cls(
+            chunk_ids=np.asarray(chunk_ids, dtype=np.int64),
+            vocabulary=vocabulary,
+            keys=np.array(keys, dtype=np.int64),
+            term_freqs=np.array(term_freqs, dtype=np.float32),
+            doc_len=np.array([sum(c.values()) for c in rows], dtype=np.float32),
+            idf=idf.astype(np.float32),
+            k1=k1,
+            b=b,
+            preprocess_func=preprocess_func
+        )
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Tamanho aproximado em memória (arrays + vocabulário)."""
+        arrays = (self.chunk_ids, self.keys, self.term_freqs, self.doc_len, self.idf)
+        return sum(a.nbytes for a in arrays) + sum(len(t) + 64 for t in self.vocabulary)
+
+    def get_scores(self, query: str, chunk_ids: Sequence[int]) -> np.ndarray:
+        """Pontua somente os chunks indicados. Ids desconhecidos recebem score 0."""
+        positions = np.array([self._position_by_chunk_id.get(int(cid), -1) for cid in chunk_ids], dtype=np.int64)
+        scores = np.zeros(len(positions), dtype=np.float32)
+        term_ids = [self.vocabulary[t] for t in self.preprocess_func(query) if t in self.vocabulary]
+        known = positions >= 0
+        if not term_ids or not known.any() or not len(self.keys):
+            return scores
+
+        vocab_size = max(len(self.vocabulary), 1)
+        known_positions = positions[known]
+        terms = np.array(term_ids, dtype=np.int64)
+        wanted = known_positions[:, None] * vocab_size + terms[None, :]
+        idx = np.searchsorted(self.keys, wanted)
+        idx_clipped = np.minimum(idx, len(self.keys) - 1)
+        found = self.keys[idx_clipped] == wanted
+        tf = np.where(found, self.term_freqs[idx_clipped], 0.0)
+
+        dl = self.doc_len[known_positions][:, None]
+        denom = tf + self.k1 * (1 - self.b + self.b * dl / self.avgdl)
+        scores[known] = (self.idf[terms][None, :] * (tf * (self.k1 + 1) / denom)).sum(axis=1)
+        return scores
+
+    def top_n(self, query: str, documents: List[Document], n: int) -> List[Document]:
+        """Reordena os documentos candidatos por BM25 e retorna os n melhores (empates mantêm a ordem de entrada)."""
+        if not documents or n <= 0:
+            return []
+        chunk_ids = [doc.metadata.get('chunk_index', -1) for doc in documents]
+        scores = self.get_scores(query, chunk_ids)
+        order = np.argsort(-scores, kind="stable")[:n]
+        return [documents[i] for i in order]
+
+    @classmethod
+    def exists(cls, dir_path: str) -> bool:
+        return (
+            os.path.exists(os.path.join(dir_path, cls.ARRAYS_FILE))
+            and os.path.exists(os.path.join(dir_path, cls.VOCAB_FILE))
+        )
+
+    def save(self, dir_path: str):
+        """Salva o índice BM25 ao lado dos arquivos do FAISS."""
+        os.makedirs(dir_path, exist_ok=True)
+        np.savez(
+            os.path.join(dir_path, self.ARRAYS_FILE),
+            chunk_ids=self.chunk_ids,
+            keys=self.keys,
+            term_freqs=self.term_freqs,
+            doc_len=self.doc_len,
+            idf=self.idf,
+            params=np.array([self.k1, self.b], dtype=np.float64)
+        )
+        with open(os.path.join(dir_path, self.VOCAB_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.vocabulary, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, dir_path: str) -> Optional["BM25Index"]:
+        """Carrega o índice BM25 salvo, ou None se não existir."""
+        if not cls.exists(dir_path):
+            return None
+        with np.load(os.path.join(dir_path, cls.ARRAYS_FILE)) as data:
+            arrays = {name: data[name] for name in data.files}
+        with open(os.path.join(dir_path, cls.VOCAB_FILE), "r", encoding="utf-8") as f:
+            vocabulary = json.load(f)
+        k1, b = arrays['params'].tolist()
+        return cls(
+            chunk_ids=arrays['chunk_ids'],
+            vocabulary=vocabulary,
+            keys=arrays['keys'],
+            term_freqs=arrays['term_freqs'],
+            doc_len=arrays['doc_len'],
+            idf=arrays['idf'],
+            k1=k1,
+            b=b
+        )
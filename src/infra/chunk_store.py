@@ -0,0 +1,161 @@
+import os
+import json
+import mmap
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterator, List, Optional, Union
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+
+
+class ChunkStore(Sequence):
+    """
+    Armazenamento colunar e somente leitura dos chunks de um índice, no lugar dos pickles de `Document`.
+
+    - `chunks_text.bin`: textos UTF-8 concatenados; `chunks_offsets.npy`: offsets em bytes (n + 1)
+    - `chunks_<coluna>.npy`: metadados inteiros por chunk (chunk_index, page, paragraph; -1 = ausente)
+    - `chunks_meta.json`: metadados iguais em todos os chunks (source, total_pages, ...) e, se houver,
+      os demais metadados por chunk
+
+    Tudo é aberto com mmap, então abrir o store custa O(1) e um chunk só é lido (e o `Document`
+    montado) quando acessado pela posição, que é também a posição do vetor no índice FAISS.
+    """
+    TEXT_FILE = "chunks_text.bin"
+    OFFSETS_FILE = "chunks_offsets.npy"
+    META_FILE = "chunks_meta.json"
+    COLUMNS = ("chunk_index", "page", "paragraph")
+    MISSING = -1
+
+    def __init__(self, text, offsets: np.ndarray, columns: Dict[str, np.ndarray], common: dict, extra: Optional[List[dict]]):
+        self._text = text
+        self._offsets = offsets
+        self._columns = columns
+        self._common = common
+        self._extra = extra
+        self._overrides: dict = {}
+
+    @staticmethod
+    def _column_file(name: str) -> str:
+        return f"chunks_{name}.npy"
+
+    @classmethod
+    def exists(cls, directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, cls.META_FILE))
+
+    @classmethod
+    def write(cls, directory: str, documents: Sequence):
+        """Grava os chunks (na ordem dos vetores do índice) no formato colunar."""
+        metadatas = [doc.metadata for doc in documents]
+        keys = {key for meta in metadatas for key in meta}
+
+        columns = {}
+        for name in cls.COLUMNS:
+            values = [meta.get(name) for meta in metadatas]
+            if name in keys and all(v is None or (isinstance(v, int) and not isinstance(v, bool) and v >= 0) for v in values):
+                columns[name] = np.array([cls.MISSING if v is None else v for v in values], dtype=np.int64)
+        common = {
+            key: metadatas[0][key] for key in keys - columns.keys()
+            if all(key in meta and meta[key] == metadatas[0][key] for meta in metadatas)
+        }
+        per_chunk_keys = keys - columns.keys() - common.keys()
+        extra = [{k: meta[k] for k in per_chunk_keys if k in meta} for meta in metadatas] if per_chunk_keys else None
+
+        encoded = [doc.page_content.encode("utf-8") for doc in documents]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        with open(os.path.join(directory, cls.TEXT_FILE), "wb") as f:
+            for data in encoded:
+                f.write(data)
+        np.save(os.path.join(directory, cls.OFFSETS_FILE), offsets)
+        for name, values in columns.items():
+            np.save(os.path.join(directory, cls._column_file(name)), values)
+        with open(os.path.join(directory, cls.META_FILE), "w", encoding="utf-8") as f:
+            json.dump({'count': len(encoded), 'columns': list(columns), 'common': common, 'extra': extra}, f, ensure_ascii=False, default=str)
+
+    @classmethod
+    def open(cls, directory: str) -> "ChunkStore":
+        with open(os.path.join(directory, cls.META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        offsets = np.load(os.path.join(directory, cls.OFFSETS_FILE), mmap_mode="r")
+        columns = {name: np.load(os.path.join(directory, cls._column_file(name)), mmap_mode="r") for name in meta['columns']}
+        text = b""
+        if offsets[-1] > 0:
+            with open(os.path.join(directory, cls.TEXT_FILE), "rb") as f:
+                text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) # Continua válido após fechar o arquivo
+        return cls(text, offsets, columns, meta['common'], meta.get('extra'))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def text(self, position: int) -> str:
+        return self._text[int(self._offsets[position]):int(self._offsets[position + 1])].decode("utf-8")
+
+    def iter_texts(self) -> Iterator[str]:
+        for position in range(len(self)):
+            yield self.text(position)
+
+    @property
+    def chunk_ids(self) -> np.ndarray:
+        if "chunk_index" in self._columns:
+            return np.asarray(self._columns["chunk_index"])
+        return np.arange(1, len(self) + 1, dtype=np.int64)
+
+    def metadata(self, position: int) -> dict:
+        metadata = dict(self._common)
+        if self._extra is not None:
+            metadata.update(self._extra[position])
+        for name, values in self._columns.items():
+            value = int(values[position])
+            if value != self.MISSING:
+                metadata[name] = value
+        for key, value in self._overrides.items():
+            if key in metadata:
+                metadata[key] = value
+        return metadata
+
+    def override_metadata(self, **fields):
+        """Substitui, nos Documents devolvidos, o valor de metadados existentes (ex.: 'source' de um PDF idêntico)."""
+        self._overrides.update(fields)
+
+    def __getitem__(self, position: Union[int, slice]):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(f"Chunk position {position} out of range")
+        return Document(page_content=self.text(position), metadata=self.metadata(position))
+
+    def __iter__(self) -> Iterator[Document]:
+        for position in range(len(self)):
+            yield self[position]
+
+
+class PositionIds(Mapping):
+    """index_to_docstore_id do FAISS quando o id do chunk é a própria posição do vetor (sem dict de n entradas)."""
+    def __init__(self, size: int):
+        self.size = size
+
+    def __getitem__(self, position: int) -> str:
+        if not 0 <= position < self.size:
+            raise KeyError(position)
+        return str(position)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self):
+        return iter(range(self.size))
+
+
+class ChunkStoreDocstore(Docstore):
+    """Docstore do LangChain que lê os Documents do ChunkStore sob demanda."""
+    def __init__(self, store: ChunkStore):
+        self.store = store
+
+    def search(self, search: str) -> Union[str, Document]:
+        try:
+            return self.store[int(search)]
+        except (ValueError, IndexError):
+            return f"ID {search} not found."
@@ -0,0 +1,262 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+import cachetools
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl # Lock entre processos (API + CLI usando o mesmo cache); indisponível no Windows
+except ImportError: # pragma: no cover
+    fcntl = None
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+def normalize_chunk_text(text: str) -> str:
+    """Normaliza espaços em branco para que o mesmo texto extraído com quebras diferentes gere a mesma chave."""
+    return " ".join(text.split())
+
+def embedding_cache_key(text: str) -> str:
+    return hashlib.sha256(normalize_chunk_text(text).encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    Cache em disco de embeddings de um modelo, compartilhado por todos os PDFs.
+
+    Cada entrada é uma linha de uma matriz float32 (`vectors.f32`, lida via memmap) e a chave
+    (SHA-256 do texto normalizado do chunk) fica na mesma linha de `keys.txt`. Os arquivos só
+    recebem append; os vetores são gravados antes das chaves, então uma chave sempre aponta para
+    um vetor completo. Outros processos que escrevem no mesmo cache são percebidos pelo tamanho de `keys.txt`.
+    """
+    VECTORS_FILE = "vectors.f32"
+    KEYS_FILE = "keys.txt"
+    META_FILE = "meta.json"
+    LOCK_FILE = ".lock"
+
+    def __init__(self, cache_dir: str, model_name: str, max_entries: int = 0):
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        model_hash = hashlib.sha256(model_name.encode("utf-8")).hexdigest()[:8]
+        self.model_name = model_name
+        self.path = os.path.join(cache_dir, f"{safe_name}_{model_hash}")
+        self.max_entries = max(0, max_entries)
+        self._lock = threading.Lock()
+        self._rows: Dict[str, int] = {}
+        self._count = 0 # Linhas em keys.txt (== linhas válidas em vectors.f32)
+        self._keys_offset = 0
+        self._dim: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _read_dim(self):
+        if self._dim is None and os.path.exists(self._file(self.META_FILE)):
+            with open(self._file(self.META_FILE), "r", encoding="utf-8") as f:
+                self._dim = json.load(f)['dim']
+
+    def _refresh(self):
+        """Lê as chaves adicionadas (por este ou outro processo) desde a última leitura."""
+        keys_path = self._file(self.KEYS_FILE)
+        if not os.path.exists(keys_path) or os.path.getsize(keys_path) == self._keys_offset:
+            return
+        self._read_dim()
+        with open(keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1] # Ignora uma última linha ainda sendo escrita
+        for key in complete.decode("ascii").splitlines():
+            self._rows.setdefault(key, self._count)
+            self._count += 1
+        self._keys_offset += len(complete)
+        self._vectors = None # Remapeia na próxima leitura, o arquivo cresceu
+
+    def _matrix(self) -> Optional[np.memmap]:
+        if self._vectors is None and self._count and self._dim:
+            self._vectors = np.memmap(self._file(self.VECTORS_FILE), dtype=np.float32, mode="r", shape=(self._count, self._dim))
+        return self._vectors
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Retorna o vetor em cache de cada texto, ou None para os ausentes (atualizando hits/misses)."""
+        keys = [embedding_cache_key(t) for t in texts]
+        with self._lock:
+            self._refresh()
+            matrix = self._matrix()
+            results = []
+            for key in keys:
+                row = self._rows.get(key)
+                results.append(matrix[row].tolist() if row is not None else None)
+            found = sum(r is not None for r in results)
+            self.hits += found
+            self.misses += len(results) - found
+        return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        """Acrescenta ao cache os vetores de textos ainda não armazenados."""
+        if not texts:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock, open(self._file(self.LOCK_FILE), "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                self._read_dim()
+                if self._dim is None:
+                    self._dim = int(matrix.shape[1])
+                    with open(self._file(self.META_FILE), "w", encoding="utf-8") as f:
+                        json.dump({'model_name': self.model_name, 'dim': self._dim}, f)
+                if matrix.shape[1] != self._dim:
+                    logger.warning(f"EmbeddingCache: dimension mismatch ({matrix.shape[1]} != {self._dim}) for '{self.model_name}'. Not caching.")
+                    return
+
+                new_keys, new_rows = [], []
+                pending = set()
+                for text, row in zip(texts, matrix):
+                    key = embedding_cache_key(text)
+                    if key in self._rows or key in pending:
+                        continue
+                    if self.max_entries and self._count + len(new_keys) >= self.max_entries:
+                        break
+                    pending.add(key)
+                    new_keys.append(key)
+                    new_rows.append(row)
+                if not new_keys:
+                    return
+
+                with open(self._file(self.VECTORS_FILE), "ab") as f:
+                    f.truncate(self._count * self._dim * 4) # Descarta vetores órfãos de uma escrita interrompida
+                    f.write(np.ascontiguousarray(new_rows, dtype=np.float32).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                with open(self._file(self.KEYS_FILE), "ab") as f:
+                    f.write("".join(f"{k}\n" for k in new_keys).encode("ascii"))
+                self._refresh()
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'model_name': self.model_name,
+                'entries': self._count,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            }
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings que consultam o EmbeddingCache antes do modelo: só os textos ausentes (sem
+    repetição) são embedados, e o resultado é gravado no cache. Consultas passam direto para o modelo.
+    """
+    def __init__(self, model: Embeddings, cache: EmbeddingCache):
+        self.model = model
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(texts)
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(normalize_chunk_text(texts[i]), []).append(i)
+        if missing:
+            # Um representante por texto normalizado; os demais recebem o mesmo vetor
+            representatives = [texts[positions[0]] for positions in missing.values()]
+            # float32, como no cache e no FAISS: o resultado não depende de ter vindo do cache ou do modelo
+            computed = np.asarray(self.model.embed_documents(representatives), dtype=np.float32).tolist()
+            for positions, vector in zip(missing.values(), computed):
+                for i in positions:
+                    vectors[i] = vector
+            self.cache.put_many(representatives, computed)
+        logger.info(f"EmbeddingCache: {len(texts) - sum(len(p) for p in missing.values())}/{len(texts)} chunk embeddings served from cache.")
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.embed_query(text)
+
+
+_caches: Dict[tuple, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+def get_embedding_cache(cache_dir: str, model_name: str, max_entries: int = 0) -> EmbeddingCache:
+    """Instância compartilhada do cache por (diretório, modelo), para que as métricas sejam do processo todo."""
+    key = (os.path.abspath(cache_dir), model_name)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = EmbeddingCache(cache_dir, model_name, max_entries=max_entries)
+        return _caches[key]
+
+def embedding_cache_stats() -> List[dict]:
+    with _caches_lock:
+        caches = list(_caches.values())
+    return [cache.stats() for cache in caches]
+
+
+class QueryEmbeddingCache:
+    """
+    Cache LRU em memória de embeddings de perguntas, compartilhado pelo processo (todos os PDFs).
+
+    A chave é (modelo, texto normalizado): a mesma pergunta feita a outro PDF não passa de novo pelo modelo.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = cachetools.LRUCache(maxsize=max_entries)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model_name: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        with self._lock:
+            vectors = [self._entries.get((model_name, normalize_chunk_text(text))) for text in texts]
+            found = sum(v is not None for v in vectors)
+            self.hits += found
+            self.misses += len(texts) - found
+        return vectors
+
+    def put_many(self, model_name: str, texts: List[str], vectors: np.ndarray):
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                vector = np.array(vector, dtype=np.float32)
+                vector.setflags(write=False)
+                self._entries[(model_name, normalize_chunk_text(text))] = vector
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+_query_cache: Optional[QueryEmbeddingCache] = None
+
+def get_query_embedding_cache(max_entries: int) -> QueryEmbeddingCache:
+    """Instância única do processo; o tamanho é o da primeira chamada."""
+    global _query_cache
+    with _caches_lock:
+        if _query_cache is None:
+            _query_cache = QueryEmbeddingCache(max_entries)
+        return _query_cache
+
+def query_embedding_cache_stats() -> Optional[dict]:
+    return _query_cache.stats() if _query_cache is not None else None
@@ -1,6 +1,7 @@
 from langchain_huggingface import HuggingFaceEmbeddings as HFEmbeddings
 import torch
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -88,3 +89,76 @@ class EmbeddingFactory:
             model_kwargs={'device': final_device},
             show_progress=show_progress
         )
+
+
+class EmbeddingModelRegistry:
+    """
+    Process-wide, reference-counted registry of embedding models.
+
+    Every caller asking for the same (model name, resolved device) receives the same
+    HFEmbeddings instance, so serving many PDFs does not load one model copy per document.
+    A model is dropped when its last reference is released, unless it was pinned by `warm_up`.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+        self._ref_counts = {}
+        self._pinned = set()
+        self._load_locks = {}
+
+    def _key(self, name: str, preferred_device_config: str) -> tuple:
+        return (name, _select_device(preferred_device_config, logger))
+
+    def acquire(self, name: str, preferred_device_config: str, show_progress: bool = True):
+        """Returns the shared model for (name, device), loading it on first use, and takes a reference."""
+        key = self._key(name, preferred_device_config)
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Per-key lock: concurrent callers for the same model wait for a single load,
+        # while different models can still load in parallel.
+        with load_lock:
+            with self._lock:
+                model = self._models.get(key)
+            if model is None:
+                model = EmbeddingFactory.get_model(name, key[1], show_progress=show_progress)
+            with self._lock:
+                model = self._models.setdefault(key, model)
+                self._ref_counts[key] = self._ref_counts.get(key, 0) + 1
+                logger.info(f"EmbeddingModelRegistry: '{name}' on '{key[1]}' acquired (refs={self._ref_counts[key]}).")
+        return model
+
+    def release(self, name: str, preferred_device_config: str):
+        """Drops a reference taken with `acquire`; unpinned models are unloaded when no references remain."""
+        key = self._key(name, preferred_device_config)
+        with self._lock:
+            if key not in self._ref_counts:
+                return
+            self._ref_counts[key] -= 1
+            if self._ref_counts[key] <= 0:
+                del self._ref_counts[key]
+                if key not in self._pinned:
+                    self._models.pop(key, None)
+                    logger.info(f"EmbeddingModelRegistry: '{name}' on '{key[1]}' released and unloaded.")
+
+    def warm_up(self, name: str, preferred_device_config: str):
+        """Loads and pins a model, running one embedding so the first real request does not pay the load."""
+        key = self._key(name, preferred_device_config)
+        model = self.acquire(name, preferred_device_config, show_progress=False)
+        with self._lock:
+            self._pinned.add(key)
+        self.release(name, preferred_device_config)
+        model.embed_query("warm-up")
+        logger.info(f"EmbeddingModelRegistry: '{name}' on '{key[1]}' warmed up and pinned.")
+        return model
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'models_loaded': len(self._models),
+                'references': {f"{name}@{device}": count for (name, device), count in self._ref_counts.items()},
+                'pinned': [f"{name}@{device}" for name, device in self._pinned],
+            }
+
+
+embedding_registry = EmbeddingModelRegistry()
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import fcntl # Lock entre processos (workers da API + CLI no mesmo catálogo); indisponível no Windows
+except ImportError: # pragma: no cover
+    fcntl = None
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Versão do formato em disco dos índices; alterar invalida todos os índices existentes
+INDEX_FORMAT_VERSION = 1
+
+def compute_file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Calcula o SHA-256 do arquivo em blocos (memória constante)."""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def compute_index_config_hash(settings) -> str:
+    """Hash das configurações que alteram o conteúdo do índice (chunking, modelo de embeddings e tipo do índice vetorial)."""
+    config = {
+        'format_version': INDEX_FORMAT_VERSION,
+        'chunk_size': settings.CHUNK_SIZE,
+        'chunk_overlap': settings.CHUNK_OVERLAP,
+        'chunking_mode': settings.CHUNKING_MODE,
+        'embedding_model': settings.EMBEDDING_MODEL_NAME,
+    }
+    if settings.VECTOR_INDEX_TYPE.lower() != "auto":
+        # Um tipo de índice explícito gera um índice próprio; em 'auto' o tipo segue o número de chunks
+        # e índices já existentes continuam válidos.
+        config['vector_index'] = {
+            'type': settings.VECTOR_INDEX_TYPE.lower(),
+            'ivf_nlist': settings.VECTOR_INDEX_IVF_NLIST,
+            'hnsw_m': settings.VECTOR_INDEX_HNSW_M,
+            'hnsw_ef_construction': settings.VECTOR_INDEX_HNSW_EF_CONSTRUCTION,
+            'pq_m': settings.VECTOR_INDEX_PQ_M,
+        }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+def build_index_key(content_hash: str, config_hash: str) -> str:
+    return f"{content_hash[:32]}_{config_hash[:12]}"
+
+class IndexCatalog:
+    """
+    Catálogo nome do PDF -> hash do conteúdo -> chave do índice, salvo em JSON no INDICES_DIR.
+
+    Os índices são endereçados pelo conteúdo do PDF mais a configuração de chunking/embeddings,
+    então PDFs idênticos (mesmo com nomes diferentes) compartilham o mesmo índice e uma mudança de
+    configuração aponta para um índice novo. O hash de cada arquivo fica em cache por (tamanho, mtime)
+    para não reler o PDF a cada carregamento.
+
+    Leituras e read-modify-write do JSON são protegidos por um lock de thread e por `flock` num
+    arquivo de lock ao lado, pois vários workers da API e a CLI podem atualizar o catálogo ao mesmo tempo.
+    """
+    FILE_NAME = "catalog.json"
+    LOCK_FILE = "catalog.json.lock"
+
+    def __init__(self, indices_dir: str):
+        self.indices_dir = indices_dir
+        self.path = os.path.join(indices_dir, self.FILE_NAME)
+        self._lock = threading.Lock()
+
+    def index_path_for_key(self, index_key: str) -> str:
+        return os.path.join(self.indices_dir, f"index_{index_key}")
+
+    @contextmanager
+    def _locked(self, exclusive: bool = True):
+        os.makedirs(self.indices_dir, exist_ok=True)
+        with self._lock, open(os.path.join(self.indices_dir, self.LOCK_FILE), "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {'pdfs': {}}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Catálogo de índices ilegível em {self.path}: {e}. Ignorando.")
+            return {'pdfs': {}}
+
+    def _write(self, data: dict):
+        os.makedirs(self.indices_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.indices_dir, prefix=".catalog-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _update(self, pdf_filename: str, **fields):
+        with self._locked():
+            data = self._read()
+            entry = data['pdfs'].setdefault(pdf_filename, {})
+            entry.update(fields)
+            entry['updated_at'] = time.time()
+            self._write(data)
+
+    def get(self, pdf_filename: str) -> Optional[dict]:
+        with self._locked(exclusive=False):
+            return self._read()['pdfs'].get(pdf_filename)
+
+    def entries(self) -> dict:
+        with self._locked(exclusive=False):
+            return self._read()['pdfs']
+
+    def remove(self, pdf_filename: str):
+        with self._locked():
+            data = self._read()
+            if data['pdfs'].pop(pdf_filename, None) is not None:
+                self._write(data)
+
+    def remember_content_hash(self, pdf_path: str, content_hash: str):
+        """Registra o hash já conhecido de um arquivo (ex.: calculado durante o upload)."""
+        stat = os.stat(pdf_path)
+        self._update(os.path.basename(pdf_path), content_hash=content_hash, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+    def content_hash_for(self, pdf_path: str) -> str:
+        """Hash do conteúdo do PDF, reaproveitando o valor do catálogo se tamanho e mtime não mudaram."""
+        stat = os.stat(pdf_path)
+        entry = self.get(os.path.basename(pdf_path)) or {}
+        if entry.get('content_hash') and entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+            return entry['content_hash']
+        content_hash = compute_file_sha256(pdf_path)
+        self.remember_content_hash(pdf_path, content_hash)
+        return content_hash
+
+    def record_index(self, pdf_path: str, content_hash: str, index_key: str):
+        """Associa o nome do PDF ao índice construído/carregado para o seu conteúdo atual."""
+        stat = os.stat(pdf_path)
+        self._update(
+            os.path.basename(pdf_path),
+            content_hash=content_hash, size=stat.st_size, mtime_ns=stat.st_mtime_ns, index_key=index_key
+        )
+
+    def cached_index_key(self, pdf_path: str, config_hash: str) -> Optional[str]:
+        """
+        Chave do índice válido para o conteúdo atual do PDF sem reler o arquivo: só responde se o
+        hash em cache ainda corresponde ao arquivo (tamanho/mtime) e o diretório do índice existe.
+        """
+        if not os.path.exists(pdf_path):
+            return None
+        entry = self.get(os.path.basename(pdf_path))
+        if not entry or not entry.get('content_hash'):
+            return None
+        stat = os.stat(pdf_path)
+        if entry.get('size') != stat.st_size or entry.get('mtime_ns') != stat.st_mtime_ns:
+            return None
+        index_key = build_index_key(entry['content_hash'], config_hash)
+        index_path = self.index_path_for_key(index_key)
+        if os.path.isdir(index_path) and os.listdir(index_path):
+            return index_key
+        return None
+
+    def referenced_index_keys(self) -> set:
+        return {e['index_key'] for e in self.entries().values() if e.get('index_key')}
+
+    def referenced_content_hashes(self) -> set:
+        return {e['content_hash'] for e in self.entries().values() if e.get('content_hash')}
+
+
+_catalogs: dict = {}
+_catalogs_lock = threading.Lock()
+
+def get_index_catalog(indices_dir: str) -> IndexCatalog:
+    """Instância compartilhada do catálogo por diretório (um único lock por arquivo no processo)."""
+    key = os.path.abspath(indices_dir)
+    with _catalogs_lock:
+        if key not in _catalogs:
+            _catalogs[key] = IndexCatalog(indices_dir)
+        return _catalogs[key]
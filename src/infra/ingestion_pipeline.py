@@ -0,0 +1,206 @@
+import queue
+import hashlib
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+
+from src.infra.chunk_strategies import ChunkStrategy
+import logging
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+class _StageFailure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+def page_fingerprint(text: str) -> str:
+    """Impressão digital do conteúdo de uma página (usada para reaproveitar chunks e vetores na reindexação)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class PreviousPages:
+    """
+    Páginas de um índice anterior disponíveis para reaproveitamento, por hash de conteúdo.
+    Cada página anterior é usada no máximo uma vez (páginas repetidas no PDF consomem cópias diferentes).
+    """
+    def __init__(self, chunks: List[Document], vectors: np.ndarray, page_fingerprints: List[dict]):
+        self._available = {}
+        for page in page_fingerprints:
+            start, end = page['chunk_start'], page['chunk_start'] + page['chunk_count']
+            self._available.setdefault(page['hash'], deque()).append((chunks[start:end], vectors[start:end]))
+
+    def take(self, page_hash: str, chunks: List[Document]) -> Optional[np.ndarray]:
+        """Vetores dos chunks de uma página anterior idêntica, ou None se a página precisa ser embedada."""
+        candidates = self._available.get(page_hash)
+        if not candidates:
+            return None
+        previous_chunks, previous_vectors = candidates.popleft()
+        # Mesmo texto e mesma configuração geram os mesmos chunks; confere antes de reaproveitar os vetores
+        if len(previous_chunks) != len(chunks) or any(
+            prev.page_content != new.page_content for prev, new in zip(previous_chunks, chunks)
+        ):
+            return None
+        return previous_vectors
+
+@dataclass
+class IngestionResult:
+    index: FAISS
+    chunks: List[Document]
+    page_fingerprints: List[dict]
+    pages_reused: int
+    chunks_embedded: int
+
+class IngestionPipeline:
+    """
+    Pipeline de indexação em estágios concorrentes ligados por filas limitadas:
+
+        extração de páginas -> chunking (+ impressão digital) -> embedding em lotes + FAISS.add_embeddings
+
+    Extração e chunking rodam em threads próprias enquanto o lote anterior é embedado, e as filas
+    limitam quantas páginas ficam à frente do embedding. O texto das páginas é descartado após o
+    chunking e os vetores vão direto para o índice FAISS, que é construído incrementalmente.
+    """
+    def __init__(
+        self,
+        chunk_strategy: ChunkStrategy,
+        embeddings,
+        batch_size: int = 64,
+        queue_size: int = 16,
+        on_progress: Optional[Callable[[int, int, Optional[int]], None]] = None
+    ):
+        self.chunk_strategy = chunk_strategy
+        self.embeddings = embeddings
+        self.batch_size = max(1, batch_size)
+        self.queue_size = max(1, queue_size)
+        self.on_progress = on_progress # (páginas processadas, chunks, total de páginas ou None)
+
+    def run(self, pages: Iterable[Document], previous_pages: Optional[PreviousPages] = None) -> IngestionResult:
+        stop = threading.Event()
+        page_queue = queue.Queue(maxsize=self.queue_size)
+        chunk_queue = queue.Queue(maxsize=self.queue_size)
+        threads = [
+            threading.Thread(target=self._extract_stage, args=(pages, page_queue, stop), name="ingestion-extract", daemon=True),
+            threading.Thread(target=self._chunk_stage, args=(page_queue, chunk_queue, previous_pages, stop), name="ingestion-chunk", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            return self._embed_stage(chunk_queue)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    @staticmethod
+    def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _get(q: queue.Queue, stop: Optional[threading.Event] = None):
+        while True:
+            try:
+                item = q.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if stop is not None and stop.is_set():
+                    return _DONE
+        if isinstance(item, _StageFailure):
+            raise item.error
+        return item
+
+    def _extract_stage(self, pages: Iterable[Document], out: queue.Queue, stop: threading.Event):
+        iterator = iter(pages)
+        try:
+            for page in iterator:
+                if not self._put(out, page, stop):
+                    return
+            self._put(out, _DONE, stop)
+        except BaseException as e:
+            self._put(out, _StageFailure(e), stop)
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close:
+                close() # Encerra o gerador (e o pool de extração) se o pipeline parou antes do fim
+
+    def _chunk_stage(self, source: queue.Queue, out: queue.Queue, previous_pages: Optional[PreviousPages], stop: threading.Event):
+        try:
+            while True:
+                page = self._get(source, stop)
+                if page is _DONE:
+                    self._put(out, _DONE, stop)
+                    return
+                chunks = self.chunk_strategy.split([page])
+                page_hash = page_fingerprint(page.page_content)
+                reused = previous_pages.take(page_hash, chunks) if previous_pages else None
+                item = ({'page': page.metadata.get('page'), 'hash': page_hash}, chunks, reused, page.metadata.get('total_pages'))
+                if not self._put(out, item, stop):
+                    return
+        except BaseException as e:
+            self._put(out, _StageFailure(e), stop)
+
+    def _embed_stage(self, source: queue.Queue) -> IngestionResult:
+        state = {'index': None, 'chunks': [], 'pages': [], 'reused': 0, 'embedded': 0, 'total_pages': None}
+        pending = [] # Páginas aguardando o lote de embedding, na ordem do PDF
+        pending_new_chunks = 0
+        while True:
+            item = self._get(source)
+            if item is _DONE:
+                break
+            pending.append(item)
+            pending_new_chunks += 0 if item[2] is not None else len(item[1])
+            if pending_new_chunks >= self.batch_size or pending_new_chunks == 0:
+                self._flush(pending, state)
+                pending, pending_new_chunks = [], 0
+        self._flush(pending, state)
+
+        if state['index'] is None:
+            raise ValueError("No text could be extracted from the PDF; nothing to index.")
+        return IngestionResult(
+            index=state['index'],
+            chunks=state['chunks'],
+            page_fingerprints=state['pages'],
+            pages_reused=state['reused'],
+            chunks_embedded=state['embedded']
+        )
+
+    def _flush(self, pending: list, state: dict):
+        """Embeda os chunks novos das páginas pendentes num único lote e adiciona tudo ao índice, em ordem."""
+        if not pending:
+            return
+        new_texts = [c.page_content for _, chunks, reused, _ in pending if reused is None for c in chunks]
+        new_vectors = iter(self.embeddings.embed_documents(new_texts) if new_texts else [])
+
+        text_embeddings, metadatas = [], []
+        for fingerprint, chunks, reused, total_pages in pending:
+            vectors = reused if reused is not None else [next(new_vectors) for _ in chunks]
+            fingerprint['chunk_start'] = len(state['chunks'])
+            fingerprint['chunk_count'] = len(chunks)
+            for chunk, vector in zip(chunks, vectors):
+                state['chunks'].append(chunk)
+                chunk.metadata['chunk_index'] = len(state['chunks'])
+                text_embeddings.append((chunk.page_content, vector))
+                metadatas.append(chunk.metadata)
+            state['pages'].append(fingerprint)
+            state['reused'] += reused is not None
+            state['total_pages'] = total_pages or state['total_pages']
+        state['embedded'] += len(new_texts)
+
+        if text_embeddings:
+            if state['index'] is None:
+                state['index'] = FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas)
+            else:
+                state['index'].add_embeddings(text_embeddings, metadatas=metadatas)
+        if self.on_progress:
+            self.on_progress(len(state['pages']), len(state['chunks']), state['total_pages'])
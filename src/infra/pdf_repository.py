@@ -1,14 +1,134 @@
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Iterator
 from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
 import logging
 # Import PyMuPDFLoader
 from langchain_community.document_loaders import PyMuPDFLoader
+import pymupdf
 
 
 logger = logging.getLogger(__name__)
 
+def _pdf_date(value: str) -> str:
+    """Datas PDF ('D:20240131120000+03'00'') em ISO 8601, como o PyMuPDFLoader; outros valores ficam como estão."""
+    try:
+        return datetime.strptime(value.replace("'", ""), "D:%Y%m%d%H%M%S%z").isoformat("T")
+    except ValueError:
+        return value
+
+def _document_metadata(doc: pymupdf.Document, pdf_path: str) -> dict:
+    """Metadados comuns a todas as páginas, com as mesmas chaves e valores do PyMuPDFLoader."""
+    metadata = {
+        "producer": "PyMuPDF",
+        "creator": "PyMuPDF",
+        "creationdate": "",
+        "source": pdf_path,
+        "file_path": pdf_path,
+        "total_pages": len(doc),
+    }
+    for key, value in doc.metadata.items():
+        if not isinstance(value, (str, int)):
+            continue
+        normalized = key.lower()
+        if normalized in ("creationdate", "moddate"):
+            metadata[normalized] = _pdf_date(value)
+        else:
+            metadata[normalized] = value.strip() if isinstance(value, str) else value
+    for key in ("modDate", "creationDate"): # O loader também mantém as datas originais
+        if key in doc.metadata:
+            metadata[key] = doc.metadata[key]
+    return metadata
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> list:
+    """
+    Extrai as páginas [start, end) num processo do pool. Cada worker abre o arquivo com o PyMuPDF e monta
+    texto e metadados só com a API pública dele, no mesmo formato do PyMuPDFLoader usado na extração serial.
+    """
+    with pymupdf.open(pdf_path) as doc:
+        doc_metadata = _document_metadata(doc, pdf_path)
+        return [
+            Document(page_content=doc[page_number].get_text().strip(), metadata=doc_metadata | {"page": page_number})
+            for page_number in range(start, end)
+        ]
+
 class PDFRepository:
+    def __init__(self, workers: int = 1, parallel_min_pages: int = 100):
+        """
+        workers: processos usados na extração de PDFs grandes (0 = número de CPUs, 1 = serial).
+        parallel_min_pages: abaixo disso o custo de subir o pool não compensa e a extração é serial.
+        """
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.parallel_min_pages = parallel_min_pages
+
     def load(self, pdf_path: str):
         """Carrega o PDF e retorna lista de Document."""
+        if self.workers > 1:
+            try:
+                with pymupdf.open(pdf_path) as doc:
+                    page_count = len(doc)
+                    is_encrypted = doc.is_encrypted
+                if page_count >= self.parallel_min_pages and not is_encrypted:
+                    return self._load_parallel(pdf_path, page_count)
+            except Exception as e:
+                logger.warning(f"Parallel extraction failed for {pdf_path}: {e}. Falling back to serial extraction.")
+        return self._load_serial(pdf_path)
+
+    def iter_pages(self, pdf_path: str) -> Iterator[Document]:
+        """
+        Gera as páginas do PDF em ordem, sem materializar o documento inteiro (usado pelo pipeline de
+        ingestão). Em PDFs grandes as faixas de páginas são extraídas em paralelo, com poucas faixas à frente.
+        Diferente de `load`, erros de leitura são propagados.
+        """
+        page_count, is_encrypted = 0, True
+        if self.workers > 1:
+            with pymupdf.open(pdf_path) as doc:
+                page_count, is_encrypted = len(doc), doc.is_encrypted
+        if self.workers > 1 and page_count >= self.parallel_min_pages and not is_encrypted:
+            yield from self._iter_parallel(pdf_path, page_count)
+        else:
+            yield from PyMuPDFLoader(file_path=pdf_path).lazy_load()
+
+    def _page_ranges(self, page_count: int) -> list:
+        # Algumas faixas por worker equilibram páginas mais pesadas (imagens, tabelas) entre os processos
+        range_count = min(page_count, min(self.workers, page_count) * 4)
+        bounds = [page_count * i // range_count for i in range(range_count + 1)]
+        return list(zip(bounds, bounds[1:]))
+
+    def _pool_size(self, page_count: int) -> int:
+        return min(self.workers, page_count)
+
+    def _pool(self, page_count: int) -> ProcessPoolExecutor:
+        # 'spawn': o processo da API tem threads (uvicorn, torch) e fork com threads pode travar
+        return ProcessPoolExecutor(max_workers=self._pool_size(page_count), mp_context=multiprocessing.get_context("spawn"))
+
+    def _iter_parallel(self, pdf_path: str, page_count: int) -> Iterator[Document]:
+        ranges = deque(self._page_ranges(page_count))
+        max_pending = self._pool_size(page_count) * 2 # Limita páginas extraídas à frente do consumidor
+        pool = self._pool(page_count)
+        try:
+            pending = deque()
+            while ranges or pending:
+                while ranges and len(pending) < max_pending:
+                    start, end = ranges.popleft()
+                    pending.append(pool.submit(_extract_page_range, pdf_path, start, end))
+                yield from pending.popleft().result()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _load_parallel(self, pdf_path: str, page_count: int):
+        """Divide as páginas em faixas contíguas, extrai cada faixa num processo e junta na ordem das páginas."""
+        with self._pool(page_count) as pool:
+            futures = [pool.submit(_extract_page_range, pdf_path, start, end) for start, end in self._page_ranges(page_count)]
+            documents = [doc for future in futures for doc in future.result()]
+        logger.info(f"Successfully loaded {len(documents)} documents from {pdf_path} using {self._pool_size(page_count)} extraction processes.")
+        return documents
+
+    def _load_serial(self, pdf_path: str):
         # Use PyMuPDFLoader instead of PyPDFLoader
         loader = PyMuPDFLoader(file_path=pdf_path)
         try:
@@ -1,11 +1,81 @@
 from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
 from langchain_community.retrievers import BM25Retriever
+from src.infra.bm25_index import BM25Index
+from src.infra.embedding_cache import QueryEmbeddingCache
+
+def query_model_name(embedding_function) -> str:
+    """Identifica o modelo nas chaves do cache de perguntas (o CachedEmbeddings é desembrulhado)."""
+    model = getattr(embedding_function, 'model', embedding_function)
+    return getattr(model, 'model_name', None) or f"{type(model).__name__}@{id(model)}"
+
+def _embed_uncached(embedding_function, queries: Sequence[str]) -> np.ndarray:
+    model = getattr(embedding_function, 'model', embedding_function)
+    if hasattr(model, 'embed_documents') and not getattr(model, 'query_encode_kwargs', None):
+        vectors = model.embed_documents(list(queries))
+    elif hasattr(embedding_function, 'embed_query'):
+        vectors = [embedding_function.embed_query(q) for q in queries]
+    else:
+        vectors = [embedding_function(q) for q in queries]
+    return np.asarray(vectors, dtype=np.float32)
+
+def embed_queries(embedding_function, queries: Sequence[str], cache: Optional[QueryEmbeddingCache] = None) -> np.ndarray:
+    """
+    Embeddings das perguntas em um único lote quando possível, consultando antes o cache de perguntas.
+
+    Só usa embed_documents se o modelo codifica perguntas e documentos da mesma forma
+    (sem query_encode_kwargs); o CachedEmbeddings é desembrulhado para não gravar perguntas no cache de chunks.
+    """
+    queries = list(queries)
+    if cache is None:
+        return _embed_uncached(embedding_function, queries)
+    model_name = query_model_name(embedding_function)
+    vectors = cache.get_many(model_name, queries)
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        computed = _embed_uncached(embedding_function, [queries[i] for i in missing])
+        cache.put_many(model_name, [queries[i] for i in missing], computed)
+        for i, vector in zip(missing, computed):
+            vectors[i] = vector
+    return np.vstack(vectors).astype(np.float32, copy=False)
+
+def similarity_search_many_with_score(vector_store, vectors: np.ndarray, k: int) -> List[List[Tuple[Document, float]]]:
+    """Equivalente a similarity_search_with_score_by_vector para várias perguntas, com uma só chamada ao FAISS."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if getattr(vector_store, '_normalize_L2', False):
+        faiss.normalize_L2(vectors)
+    scores, indices = vector_store.index.search(vectors, k)
+    results = []
+    for row_scores, row_indices in zip(scores, indices):
+        docs = []
+        for score, i in zip(row_scores, row_indices):
+            if i == -1:
+                continue
+            _id = vector_store.index_to_docstore_id[int(i)]
+            doc = vector_store.docstore.search(_id)
+            if not isinstance(doc, Document):
+                raise ValueError(f"Could not find document for id {_id}, got {doc}")
+            docs.append((doc, score))
+        results.append(docs)
+    return results
 
 class RetrieverStrategy(ABC):
     @abstractmethod
     def retrieve(self, query: str) -> list:
         pass
 
+    # Recuperação em duas etapas para várias perguntas: `search_many` faz o trabalho em lote
+    # e `rerank` o trabalho por pergunta (que pode rodar em paralelo). Por padrão, tudo fica no search_many.
+    def search_many(self, queries: List[str]) -> List[list]:
+        return [self.retrieve(q) for q in queries]
+
+    def rerank(self, query: str, candidates: list) -> list:
+        return candidates
+
 class VectorRetrieverStrategy(RetrieverStrategy):
     def __init__(self, vector_store, k: int):
         self.retriever = vector_store.as_retriever(search_kwargs={'k': k})
@@ -19,21 +89,32 @@ class BM25RetrieverStrategy(RetrieverStrategy):
         return self.retriever.invoke(query)
 
 class HybridRetrieverStrategy(RetrieverStrategy):
-    def __init__(self, vector_store, threshold: float, initial_k: int, final_k: int, documents: list):
+    def __init__(self, vector_store, threshold: float, initial_k: int, final_k: int, documents: list, bm25_index: BM25Index = None, query_cache: Optional[QueryEmbeddingCache] = None):
         self.vector_store = vector_store
+        self.query_cache = query_cache
         self.threshold = threshold
         self.initial_k = initial_k
         self.final_k = final_k
         self.documents = documents
+        # índice BM25 construído uma única vez (normalmente carregado do disco junto com o FAISS)
+        self.bm25_index = bm25_index if bm25_index is not None else BM25Index.from_documents(documents)
 
     def retrieve(self, query: str) -> list:
-        # passo 1: busca vetorial ampla com scores
-        initial = self.vector_store.similarity_search_with_score(query, k=self.initial_k)
+        # passo 1: busca vetorial ampla com scores (o embedding da pergunta pode vir do cache)
+        vector = embed_queries(self.vector_store.embedding_function, [query], self.query_cache)[0]
+        initial = self.vector_store.similarity_search_with_score_by_vector(vector.tolist(), k=self.initial_k)
+        return self.rerank(query, initial)
+
+    def search_many(self, queries: List[str]) -> List[list]:
+        # passo 1, em lote: um único lote de embeddings e uma única busca no FAISS para todas as perguntas
+        vectors = embed_queries(self.vector_store.embedding_function, queries, self.query_cache)
+        return similarity_search_many_with_score(self.vector_store, vectors, self.initial_k)
+
+    def rerank(self, query: str, candidates: list) -> list:
         # passo 2: filtrar por threshold
-        filtered = [doc for doc, score in initial if score < self.threshold]
+        filtered = [doc for doc, score in candidates if score < self.threshold]
         if not filtered:
             # fallback top final_k vetoriais
-            return [doc for doc, _ in initial][:self.final_k]
-        # passo 3: BM25 sobre filtrados
-        bm25 = BM25Retriever.from_documents(filtered, k=min(self.final_k, len(filtered)))
-        return bm25.invoke(query)
\ No newline at end of file
+            return [doc for doc, _ in candidates][:self.final_k]
+        # passo 3: reordenar filtrados com o BM25 pré-computado
+        return self.bm25_index.top_n(query, filtered, self.final_k)
@@ -0,0 +1,109 @@
+import math
+from dataclasses import dataclass
+
+import faiss
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("auto", "flat", "ivfflat", "hnsw", "ivfpq")
+# Em 'auto', acima disto os vetores são comprimidos com product quantization
+AUTO_IVFPQ_MIN_CHUNKS = 500_000
+# Pontos de treino por centróide recomendados pelo FAISS
+MIN_POINTS_PER_CENTROID = 39
+
+@dataclass
+class VectorIndexOptions:
+    """Tipo do índice FAISS e parâmetros de construção/busca. Todos usam distância L2, como o índice flat."""
+    index_type: str = "auto"
+    auto_ann_min_chunks: int = 10_000 # Em 'auto', abaixo disto a busca exata (flat) é rápida o bastante
+    ivf_nlist: int = 0 # 0 = ~4*sqrt(n)
+    nprobe: int = 16
+    hnsw_m: int = 32
+    hnsw_ef_construction: int = 200
+    hnsw_ef_search: int = 128
+    pq_m: int = 16 # Subquantizadores; ajustado para um divisor da dimensão
+
+    @classmethod
+    def from_settings(cls, settings) -> "VectorIndexOptions":
+        return cls(
+            index_type=settings.VECTOR_INDEX_TYPE.lower(),
+            auto_ann_min_chunks=settings.VECTOR_INDEX_AUTO_ANN_MIN_CHUNKS,
+            ivf_nlist=settings.VECTOR_INDEX_IVF_NLIST,
+            nprobe=settings.VECTOR_INDEX_NPROBE,
+            hnsw_m=settings.VECTOR_INDEX_HNSW_M,
+            hnsw_ef_construction=settings.VECTOR_INDEX_HNSW_EF_CONSTRUCTION,
+            hnsw_ef_search=settings.VECTOR_INDEX_HNSW_EF_SEARCH,
+            pq_m=settings.VECTOR_INDEX_PQ_M,
+        )
+
+def resolve_index_type(options: VectorIndexOptions, n: int) -> str:
+    """Tipo efetivo para n vetores: resolve 'auto' e cai para flat quando não há pontos para treinar."""
+    index_type = options.index_type if options.index_type in INDEX_TYPES else "auto"
+    if index_type != options.index_type:
+        logger.warning(f"Unknown VECTOR_INDEX_TYPE '{options.index_type}'. Using 'auto'.")
+    if index_type == "auto":
+        if n < options.auto_ann_min_chunks:
+            return "flat"
+        return "ivfpq" if n >= AUTO_IVFPQ_MIN_CHUNKS else "hnsw"
+    if index_type == "ivfflat" and n < MIN_POINTS_PER_CENTROID:
+        logger.warning(f"Only {n} vectors: too few to train an IVF index. Using 'flat'.")
+        return "flat"
+    if index_type == "ivfpq" and n < 256 * MIN_POINTS_PER_CENTROID:
+        logger.warning(f"Only {n} vectors: too few to train product quantization. Using 'flat'.")
+        return "flat"
+    return index_type
+
+def _nlist(options: VectorIndexOptions, n: int) -> int:
+    nlist = options.ivf_nlist or int(4 * math.sqrt(n))
+    return max(1, min(nlist, n // MIN_POINTS_PER_CENTROID))
+
+def _pq_m(options: VectorIndexOptions, d: int) -> int:
+    return max(m for m in range(1, min(options.pq_m, d) + 1) if d % m == 0)
+
+def build_index(vectors: np.ndarray, index_type: str, options: VectorIndexOptions) -> faiss.Index:
+    """Constrói (treinando se preciso) um índice do tipo pedido com os vetores, na mesma ordem."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, d = vectors.shape
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(d)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, options.hnsw_m)
+        index.hnsw.efConstruction = options.hnsw_ef_construction
+    elif index_type == "ivfflat":
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(d), d, _nlist(options, n), faiss.METRIC_L2)
+    elif index_type == "ivfpq":
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(d), d, _nlist(options, n), _pq_m(options, d), 8)
+    else:
+        raise ValueError(f"Unsupported vector index type: {index_type}")
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    apply_search_params(index, options)
+    return index
+
+def index_type_of(index: faiss.Index) -> str:
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivfflat"
+    return "flat"
+
+def apply_search_params(index: faiss.Index, options: VectorIndexOptions):
+    """Parâmetros de busca não são persistidos pelo FAISS de forma confiável: aplicados após construir/carregar."""
+    index_type = index_type_of(index)
+    if index_type == "hnsw":
+        index.hnsw.efSearch = options.hnsw_ef_search
+    elif index_type in ("ivfflat", "ivfpq"):
+        index.nprobe = options.nprobe
+
+def reconstruct_all(index: faiss.Index) -> np.ndarray:
+    """Todos os vetores do índice, na ordem das posições. Em IVFPQ são aproximações (comprimidos)."""
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
@@ -1,37 +1,188 @@
 import os
+import json
 import pickle
+import shutil
+import uuid
+import tempfile
+import faiss
 from langchain_community.vectorstores import FAISS
+from src.infra.bm25_index import BM25Index
+from src.infra.chunk_store import ChunkStore, ChunkStoreDocstore, PositionIds
+from src.infra.vector_index_factory import (
+    VectorIndexOptions, resolve_index_type, build_index, index_type_of, apply_search_params, reconstruct_all
+)
+import logging
+
+logger = logging.getLogger(__name__)
 
 class VectorStoreRepository:
-    def __init__(self, storage_path: str, embeddings):
+    PAGES_FILE = "index_pages.json" # impressões digitais por página (hash do texto -> posições dos chunks)
+    FAISS_FILE = "index.faiss"
+    LEGACY_DOCSTORE_FILE = "index.pkl" # formato antigo (FAISS.save_local)
+    LEGACY_CHUNKS_FILE = "index_chunks.pkl" # formato antigo
+
+    def __init__(self, storage_path: str, embeddings, index_options: VectorIndexOptions = None, mmap: bool = False):
         self.storage_path = storage_path
         self.embeddings = embeddings
+        self.index_options = index_options or VectorIndexOptions(index_type="flat")
+        self.mmap = mmap
+        self.memory_mapped = False # True quando o índice carregado está mapeado do arquivo (page cache compartilhado)
         self.index = None
+        self.bm25_index = None
 
     def exists(self) -> bool:
         return os.path.exists(self.storage_path) and bool(os.listdir(self.storage_path))
 
     def load(self):
-        """Carrega índice FAISS existente e chunks associados."""
-        self.index = FAISS.load_local(self.storage_path, self.embeddings, allow_dangerous_deserialization=True)
-        chunks_path = os.path.join(self.storage_path, "index_chunks.pkl")
+        """
+        Carrega índice FAISS existente e chunks associados. Índices no formato colunar (ChunkStore)
+        abrem em O(1), com os chunks lidos sob demanda; índices antigos usam os pickles do LangChain.
+        """
+        faiss_index = self._read_faiss_index()
+        if ChunkStore.exists(self.storage_path):
+            chunks = ChunkStore.open(self.storage_path)
+            docstore, index_to_docstore_id = ChunkStoreDocstore(chunks), PositionIds(len(chunks))
+        else:
+            docstore, index_to_docstore_id, chunks = self._load_legacy_chunks()
+        self.index = FAISS(
+            embedding_function=self.embeddings,
+            index=faiss_index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id
+        )
+        apply_search_params(self.index.index, self.index_options)
+        self.bm25_index = BM25Index.load(self.storage_path)
+        if self.bm25_index is None and chunks:
+            # Índices antigos não têm BM25 persistido: constrói uma vez e salva
+            self.bm25_index = BM25Index.from_documents(chunks)
+            self.bm25_index.save(self.storage_path)
+        return self.index, chunks
+
+    def _load_legacy_chunks(self):
+        """Formato antigo: docstore do LangChain em index.pkl e os chunks de novo em index_chunks.pkl."""
+        with open(os.path.join(self.storage_path, self.LEGACY_DOCSTORE_FILE), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
         chunks = None
+        chunks_path = os.path.join(self.storage_path, self.LEGACY_CHUNKS_FILE)
         if os.path.exists(chunks_path):
             with open(chunks_path, "rb") as f:
                 chunks = pickle.load(f)
-        return self.index, chunks
+        return docstore, index_to_docstore_id, chunks
+
+    def _read_faiss_index(self, allow_mmap: bool = True):
+        """
+        Lê o index.faiss. Com mmap, o arquivo é mapeado somente leitura: os vetores ficam no page cache
+        do SO, compartilhado entre os workers do uvicorn, e só as páginas consultadas são lidas do disco.
+        O índice carregado nunca é modificado (reindexações criam um índice novo em outro diretório).
+        """
+        index_path = os.path.join(self.storage_path, self.FAISS_FILE)
+        if self.mmap and allow_mmap:
+            try:
+                flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+                faiss_index = faiss.read_index(index_path, flags)
+                self.memory_mapped = True
+                return faiss_index
+            except Exception as e:
+                logger.warning(f"Memory-mapped load failed for {self.storage_path}: {e}. Reading the index into memory.")
+        self.memory_mapped = False
+        return faiss.read_index(index_path)
 
-    def save(self, index, chunks):
-        """Salva índice FAISS e chunks associados no storage."""
-        os.makedirs(self.storage_path, exist_ok=True)
-        index.save_local(self.storage_path)
-        chunks_path = os.path.join(self.storage_path, "index_chunks.pkl")
-        with open(chunks_path, "wb") as f:
-            pickle.dump(chunks, f)
-
-    def create(self, documents: list):
-        """Cria um novo índice FAISS a partir de documentos e salva os chunks."""
-        index = FAISS.from_documents(documents, self.embeddings)
-        self.save(index, documents)
+    def load_page_fingerprints(self):
+        """Retorna a lista de páginas [{'page', 'hash', 'chunk_start', 'chunk_count'}] salva com o índice, ou None."""
+        pages_path = os.path.join(self.storage_path, self.PAGES_FILE)
+        if not os.path.exists(pages_path):
+            return None
+        with open(pages_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def optimize_index(self, index):
+        """
+        Troca o índice flat construído pelo LangChain pelo tipo configurado (IVF/HNSW/PQ), com os mesmos
+        vetores na mesma ordem, então o mapeamento posição -> docstore continua válido. Todos usam L2,
+        logo as distâncias continuam comparáveis com VECTOR_DISTANCE_THRESHOLD.
+        """
+        faiss_index = index.index
+        index_type = resolve_index_type(self.index_options, faiss_index.ntotal)
+        if index_type == index_type_of(faiss_index):
+            apply_search_params(faiss_index, self.index_options)
+            return index
+        index.index = build_index(reconstruct_all(faiss_index), index_type, self.index_options)
+        logger.info(f"Vector index built as '{index_type}' for {faiss_index.ntotal} vectors.")
+        return index
+
+    def load_for_reuse(self):
+        """
+        Carrega chunks, vetores e impressões digitais das páginas de um índice existente para reindexação
+        incremental. Retorna None se o índice não existe ou não tem impressões digitais (formato antigo).
+        """
+        if not self.exists():
+            return None
+        page_fingerprints = self.load_page_fingerprints()
+        if page_fingerprints is None:
+            return None
+        if ChunkStore.exists(self.storage_path):
+            chunks = ChunkStore.open(self.storage_path)
+        else:
+            chunks = self._load_legacy_chunks()[2]
+        if chunks is None:
+            return None
+        faiss_index = self._read_faiss_index(allow_mmap=False)
+        if index_type_of(faiss_index) == "ivfpq":
+            return None # Vetores comprimidos: reaproveitá-los degradaria a busca; o cache de embeddings cobre o re-embed
+        vectors = reconstruct_all(faiss_index)
+        if len(vectors) != len(chunks):
+            return None
+        return chunks, vectors, page_fingerprints
+
+    def save(self, index, chunks, page_fingerprints=None):
+        """Salva índice FAISS, chunks (ChunkStore), índice BM25 e impressões digitais das páginas no storage.
+
+        Os arquivos são escritos num diretório temporário ao lado e publicados com rename, para que
+        um índice parcialmente escrito nunca seja carregado (os diretórios são compartilhados entre PDFs idênticos).
+        """
+        parent_dir = os.path.dirname(os.path.abspath(self.storage_path))
+        os.makedirs(parent_dir, exist_ok=True)
+        staging_path = tempfile.mkdtemp(dir=parent_dir, prefix=".staging-")
+        try:
+            if index.index.ntotal != len(chunks):
+                raise ValueError(f"Index has {index.index.ntotal} vectors but {len(chunks)} chunks were given.")
+            # Os chunks são gravados uma única vez, na ordem dos vetores, e servem ao docstore e ao BM25
+            faiss.write_index(index.index, os.path.join(staging_path, self.FAISS_FILE))
+            ChunkStore.write(staging_path, chunks)
+            if isinstance(chunks, ChunkStore):
+                bm25_index = BM25Index.from_texts(chunks.iter_texts(), chunks.chunk_ids)
+            else:
+                bm25_index = BM25Index.from_documents(chunks)
+            bm25_index.save(staging_path)
+            if page_fingerprints is not None:
+                with open(os.path.join(staging_path, self.PAGES_FILE), "w", encoding="utf-8") as f:
+                    json.dump(page_fingerprints, f)
+            self._publish(staging_path, parent_dir)
+        except BaseException:
+            shutil.rmtree(staging_path, ignore_errors=True)
+            raise
         self.index = index
-        return index
\ No newline at end of file
+        self.bm25_index = bm25_index
+
+    def _publish(self, staging_path: str, parent_dir: str):
+        """
+        Troca o diretório do índice pelo staging. O índice anterior é primeiro movido para o lado e só
+        removido depois, já que rename não substitui um diretório não vazio. Se outro processo publicar
+        o mesmo índice (mesma chave = mesmo conteúdo e configuração) entre os dois renames, o dele é mantido.
+        """
+        retired_path = None
+        if os.path.exists(self.storage_path):
+            retired_path = os.path.join(parent_dir, f".retired-{os.path.basename(self.storage_path)}-{uuid.uuid4().hex[:8]}")
+            try:
+                os.rename(self.storage_path, retired_path)
+            except FileNotFoundError: # Outro processo já o moveu
+                retired_path = None
+        try:
+            os.rename(staging_path, self.storage_path)
+        except OSError:
+            if not (os.path.isdir(self.storage_path) and os.listdir(self.storage_path)):
+                raise
+            logger.info(f"Index at {self.storage_path} was published concurrently by another process. Keeping it.")
+            shutil.rmtree(staging_path, ignore_errors=True)
+        if retired_path:
+            shutil.rmtree(retired_path, ignore_errors=True)
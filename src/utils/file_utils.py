@@ -1,7 +1,13 @@
 import os
 import glob
 import shutil
+import asyncio
+import hashlib
+import time
+import tempfile
+from typing import Tuple
 from src.config.settings import settings # Assuming settings are now in config.py
+from src.infra.index_catalog import get_index_catalog, compute_index_config_hash
 
 def list_available_pdfs() -> list[str]:
     """Lists all available PDFs in the configured PDFS_DIR and current directory."""
@@ -15,10 +21,10 @@ def list_available_pdfs() -> list[str]:
 
 
 def has_index(pdf_filename_or_path: str) -> bool:
-    """Checks if an index exists for the given PDF filename or path."""
-    basename = os.path.basename(pdf_filename_or_path).split('.')[0]
-    index_path = os.path.join(settings.INDICES_DIR, f"index_{basename}")
-    return os.path.exists(index_path) and len(os.listdir(index_path)) > 0
+    """Checks if an up-to-date index (current content and config) exists for the given PDF filename or path."""
+    pdf_path_in_managed_dir = os.path.join(settings.PDFS_DIR, os.path.basename(pdf_filename_or_path))
+    catalog = get_index_catalog(settings.INDICES_DIR)
+    return catalog.cached_index_key(pdf_path_in_managed_dir, compute_index_config_hash(settings)) is not None
 
 def select_pdf_cli() -> str | None:
     """CLI prompt to select a PDF."""
@@ -56,43 +62,73 @@ def select_pdf_cli() -> str | None:
         print("Nenhuma seleção feita.")
         return None
 
+# Staging/retired directories (and unreferenced indices) younger than this may belong to a build still
+# running in another process (API worker or CLI) and are left alone by the cleanup
+INDEX_BUILD_GRACE_SECONDS = 3600
+
+def _recently_modified(path: str) -> bool:
+    try:
+        return time.time() - os.path.getmtime(path) < INDEX_BUILD_GRACE_SECONDS
+    except OSError:
+        return True # Vanished or being replaced right now
+
 def cleanup_unused_indices_cli():
-    """Removes indices for PDFs that no longer exist and checks index integrity."""
+    """Removes indices no longer referenced by any existing PDF and checks index integrity."""
     if not os.path.exists(settings.INDICES_DIR):
         return
 
     print("\nVerificando integridade e limpando índices não utilizados...")
-    
+
+    # Indices are content-addressed and may be shared by several PDFs: an index is kept while
+    # at least one catalog entry whose PDF still exists in PDFS_DIR points to it.
+    catalog = get_index_catalog(settings.INDICES_DIR)
+    for pdf_filename in list(catalog.entries().keys()):
+        if not os.path.exists(os.path.join(settings.PDFS_DIR, pdf_filename)):
+            print(f"LIMPEZA: PDF '{pdf_filename}' não encontrado em '{settings.PDFS_DIR}'. Removendo do catálogo.")
+            catalog.remove(pdf_filename)
+    owners = {}
+    for pdf_filename, entry in catalog.entries().items():
+        if entry.get('index_key'):
+            owners.setdefault(f"index_{entry['index_key']}", []).append(pdf_filename)
+
     indices = [d for d in os.listdir(settings.INDICES_DIR) if os.path.isdir(os.path.join(settings.INDICES_DIR, d)) and d.startswith("index_")]
     print(f"Encontrados {len(indices)} índices no diretório {settings.INDICES_DIR}")
+
+    for leftover in [d for d in os.listdir(settings.INDICES_DIR) if d.startswith((".staging-", ".retired-"))]:
+        leftover_path = os.path.join(settings.INDICES_DIR, leftover)
+        if not _recently_modified(leftover_path): # Interrupted builds
+            shutil.rmtree(leftover_path, ignore_errors=True)
     
     for index_dir_name in indices:
-        pdf_basename = index_dir_name.replace("index_", "")
-        pdf_filename = f"{pdf_basename}.pdf"
-        pdf_path_in_pdfs_dir = os.path.join(settings.PDFS_DIR, pdf_filename)
         current_index_path = os.path.join(settings.INDICES_DIR, index_dir_name)
         
-        if not os.path.exists(pdf_path_in_pdfs_dir):
-            print(f"LIMPEZA: PDF '{pdf_filename}' não encontrado em '{settings.PDFS_DIR}'. Removendo índice '{index_dir_name}'.")
+        if index_dir_name not in owners:
+            if _recently_modified(current_index_path): # Just built: its PDF may not be in the catalog yet
+                continue
+            print(f"LIMPEZA: Nenhum PDF referencia o índice '{index_dir_name}'. Removendo índice.")
             try:
                 shutil.rmtree(current_index_path)
             except Exception as e:
                 print(f"Erro ao remover índice '{current_index_path}': {e}")
             continue
+        pdf_filename = ", ".join(owners[index_dir_name])
         
         try:
             index_faiss = os.path.join(current_index_path, "index.faiss")
-            index_pkl = os.path.join(current_index_path, "index.pkl")
+            # Chunks no formato colunar (chunks_meta.json) ou no formato antigo (docstore em index.pkl)
+            chunks_file = os.path.join(current_index_path, "chunks_meta.json")
+            if not os.path.exists(chunks_file):
+                chunks_file = os.path.join(current_index_path, "index.pkl")
             
-            if not (os.path.exists(index_faiss) and os.path.exists(index_pkl)):
+            if not (os.path.exists(index_faiss) and os.path.exists(chunks_file)):
                 print(f"AVISO: Índice incompleto para {pdf_filename} em '{current_index_path}'. Será reconstruído quando usado.")
                 continue
                 
             faiss_size = os.path.getsize(index_faiss)
-            pkl_size = os.path.getsize(index_pkl)
+            chunks_size = os.path.getsize(chunks_file)
             
-            if faiss_size < 1000 or pkl_size < 100: # Heuristic minimum sizes
-                print(f"AVISO: Índice suspeito para {pdf_filename} (tamanhos: faiss={faiss_size}B, pkl={pkl_size}B). Será reconstruído.")
+            if faiss_size < 1000 or chunks_size < 100: # Heuristic minimum sizes
+                print(f"AVISO: Índice suspeito para {pdf_filename} (tamanhos: faiss={faiss_size}B, chunks={chunks_size}B). Será reconstruído.")
                 
         except Exception as e:
             print(f"ERRO ao verificar índice {index_dir_name}: {e}")
@@ -120,3 +156,44 @@ def ensure_pdf_is_in_pdfs_dir(pdf_path_or_filename: str) -> str:
             print(f"PDF '{pdf_basename}' copiado para '{settings.PDFS_DIR}'.")
     
     return target_pdf_path
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when a streamed upload exceeds the configured maximum size."""
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        super().__init__(f"Upload exceeds the maximum size of {max_bytes} bytes.")
+
+async def save_upload_streaming(upload, target_path: str, max_bytes: int, chunk_size: int = 1024 * 1024) -> Tuple[int, str]:
+    """
+    Copies an uploaded file to `target_path` chunk by chunk, so memory per upload stays constant, and
+    computes a SHA-256 of the content along the way. With Starlette's UploadFile the body has already been
+    received and spooled to a temp file, so this is a second write and `max_bytes` is only a backstop for
+    requests without a Content-Length (UploadSizeLimitMiddleware refuses the others before receiving them).
+    Data goes to a temp file in the target directory and is moved into place atomically at the end;
+    on any error (including UploadTooLargeError) the temp file is removed and the target is untouched.
+    Returns (size_in_bytes, sha256_hexdigest).
+    """
+    target_dir = os.path.dirname(os.path.abspath(target_path))
+    fd, tmp_path = tempfile.mkstemp(dir=target_dir, prefix=".upload-", suffix=".part")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(max_bytes)
+                hasher.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+            await asyncio.to_thread(out.flush)
+            await asyncio.to_thread(os.fsync, out.fileno())
+        os.replace(tmp_path, target_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return size, hasher.hexdigest()
@@ -1,6 +1,7 @@
 import pytest
 import asyncio
 from fastapi.testclient import TestClient
+from langchain_core.embeddings import DeterministicFakeEmbedding
 import os
 import shutil
 
@@ -37,9 +38,10 @@ def test_client() -> TestClient:
     os.makedirs(test_pdfs_dir, exist_ok=True)
     os.makedirs(test_indices_dir, exist_ok=True)
     
-    # Provide a client
-    client = TestClient(fastapi_app)
-    yield client
+    # Provide a client. Used as a context manager so the app lifespan runs and background
+    # workers (e.g. indexing jobs) live on a single event loop across requests.
+    with TestClient(fastapi_app) as client:
+        yield client
 
     # Teardown: Clean up test directories after tests in the module are done
     # Be careful with this if tests run in parallel or if you want to inspect output
@@ -59,6 +61,18 @@ def temp_pdf_file(tmp_path_factory):
         f.write("%PDF-1.4\n%âãÏÓ\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n2 0 obj<</Type/Pages/Count 1/Kids[3 0 R]>>endobj\n3 0 obj<</Type/Page/MediaBox[0 0 612 792]/Parent 2 0 R/Resources<<>>>>endobj\nxref\n0 4\n0000000000 65535 f\n0000000010 00000 n\n0000000059 00000 n\n0000000118 00000 n\ntrailer<</Size 4/Root 1 0 R>>\nstartxref\n178\n%%EOF")
     return fn
 
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Fake embedding model that records each embed_documents batch: its size in `batches`, its texts in `embedded`."""
+    def embed_documents(self, texts):
+        self.__dict__.setdefault('batches', []).append(len(texts))
+        self.__dict__.setdefault('embedded', []).extend(texts)
+        return super().embed_documents(texts)
+
+@pytest.fixture
+def counting_embeddings():
+    """Factory for CountingEmbeddings, e.g. `counting_embeddings(size=8)`."""
+    return lambda size=8: CountingEmbeddings(size=size)
+
 @pytest.fixture(scope="module")
 def mock_ollama_client_success(mocker):
     """Mocks ollama.AsyncClient to simulate successful LLM responses."""
@@ -3,19 +3,36 @@ from fastapi.testclient import TestClient
 import os
 import shutil
 import json
+import time
 import asyncio
 
 from src.config.settings import settings # For accessing PDFS_DIR, INDICES_DIR
+from src.infra.index_catalog import compute_file_sha256, compute_index_config_hash, build_index_key
 
 # Assuming conftest.py provides test_client and temp_pdf_file fixtures
 # pytestmark = pytest.mark.asyncio # if using async test functions directly
 
+def index_path_for(pdf_path: str) -> str:
+    """Content-addressed index directory for a PDF under the current chunking/embedding config."""
+    index_key = build_index_key(compute_file_sha256(str(pdf_path)), compute_index_config_hash(settings))
+    return os.path.join(settings.INDICES_DIR, f"index_{index_key}")
+
+def wait_for_indexing_job(test_client: TestClient, job_id: str, timeout: float = 300.0) -> dict:
+    """Polls the job status endpoint until the background indexing job finishes."""
+    deadline = time.time() + timeout
+    while True:
+        response = test_client.get(f"/jobs/{job_id}")
+        assert response.status_code == 200
+        job = response.json()
+        if job["status"] in ("completed", "failed") or time.time() > deadline:
+            return job
+        time.sleep(0.2)
+
 def test_upload_pdf_success(test_client: TestClient, temp_pdf_file: str):
     """Test successful PDF upload and basic indexing trigger."""
     # Clean up any existing index for this test file to ensure it's created
     pdf_basename = os.path.basename(temp_pdf_file)
-    index_name = pdf_basename.split('.')[0]
-    test_index_path = os.path.join(settings.INDICES_DIR, f"index_{index_name}")
+    test_index_path = index_path_for(temp_pdf_file)
     if os.path.exists(test_index_path):
         shutil.rmtree(test_index_path)
     
@@ -27,11 +44,16 @@ def test_upload_pdf_success(test_client: TestClient, temp_pdf_file: str):
     with open(temp_pdf_file, "rb") as f:
         response = test_client.post("/upload-pdf/", files={"file": (pdf_basename, f, "application/pdf")})
 
-    assert response.status_code == 200
+    assert response.status_code == 202
     data = response.json()
     assert data["pdf_filename"] == pdf_basename
-    assert data["message"] == "PDF processed and index created/updated successfully." # Or similar success message
-    assert data["index_status"] == "Indexed"
+    assert data["index_status"] == "Queued"
+    assert data["job_id"]
+
+    # Indexing runs in the background; wait for the job to finish
+    job = wait_for_indexing_job(test_client, data["job_id"])
+    assert job["status"] == "completed"
+    assert job["progress"] == 1.0
 
     # Verify PDF is in PDFS_DIR
     assert os.path.exists(target_pdf_in_managed_dir)
@@ -68,8 +90,7 @@ async def test_ask_streaming_success(test_client: TestClient, temp_pdf_file: str
     """Test /ask endpoint with streaming response after a PDF is uploaded."""
     # 1. Upload a PDF first to ensure it's processed and indexed.
     pdf_basename = os.path.basename(temp_pdf_file)
-    index_name = pdf_basename.split('.')[0]
-    test_index_path = os.path.join(settings.INDICES_DIR, f"index_{index_name}")
+    test_index_path = index_path_for(temp_pdf_file)
     target_pdf_in_managed_dir = os.path.join(settings.PDFS_DIR, pdf_basename)
 
     # Clean up from previous runs if any
@@ -78,7 +99,8 @@ async def test_ask_streaming_success(test_client: TestClient, temp_pdf_file: str
 
     with open(temp_pdf_file, "rb") as f_upload:
         upload_response = test_client.post("/upload-pdf/", files={"file": (pdf_basename, f_upload, "application/pdf")})
-    assert upload_response.status_code == 200
+    assert upload_response.status_code == 202
+    assert wait_for_indexing_job(test_client, upload_response.json()["job_id"])["status"] == "completed"
     
     # Mock the LLMClient's generate method within QueryService for this test
     # to avoid actual Ollama calls and control the output.
@@ -174,6 +196,11 @@ def test_ask_pdf_not_found(test_client: TestClient):
     assert "PDF 'non_existent_document.pdf' not found" in error_event["data"]["error"]
     assert any(event["type"] == "end_stream" for event in received_events)
 
+def test_get_unknown_indexing_job(test_client: TestClient):
+    """Test job status endpoint for an unknown job id."""
+    response = test_client.get("/jobs/does-not-exist")
+    assert response.status_code == 404
+
 # Add more tests:
 # - /ask with LLM failure (mock LLMClient to raise an exception)
 # - /ask-non-streaming (if keeping it): success, PDF not found, caching
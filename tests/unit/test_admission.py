@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from src.core.admission import AdmissionController, GenerationQueueFullError, classify_priority
+
+
+def test_waiters_are_admitted_by_priority_then_arrival():
+    async def main():
+        controller = AdmissionController(max_concurrent=1, max_queue_size=10)
+        running = controller.ticket('normal')
+        bulk = controller.ticket('bulk')
+        normal = controller.ticket('normal')
+        interactive = controller.ticket('interactive')
+        positions = (interactive.position, normal.position, bulk.position)
+
+        order = []
+        async def wait(name, ticket):
+            async with ticket:
+                await ticket.wait()
+                order.append(name)
+                await asyncio.sleep(0)
+
+        waiters = asyncio.gather(wait('bulk', bulk), wait('normal', normal), wait('interactive', interactive))
+        await asyncio.sleep(0)
+        running.release()
+        await waiters
+        return positions, order, controller.stats()
+
+    positions, order, stats = asyncio.run(main())
+
+    assert positions == (1, 2, 3)
+    assert order == ['interactive', 'normal', 'bulk']
+    assert stats['active'] == 0 and stats['queued'] == 0
+
+def test_full_queue_fails_fast_and_abandoned_tickets_free_their_place():
+    async def main():
+        controller = AdmissionController(max_concurrent=1, max_queue_size=1)
+        controller.ticket()
+        waiting = controller.ticket()
+        with pytest.raises(GenerationQueueFullError):
+            controller.ticket()
+        waiting.release() # cliente desistiu antes de ser atendido
+        return controller.ticket().position, controller.stats()['rejected_total']
+
+    assert asyncio.run(main()) == (1, 1)
+
+def test_queue_positions_are_reported_until_admitted():
+    async def main():
+        controller = AdmissionController(max_concurrent=1, max_queue_size=10)
+        first = controller.ticket()
+        second = controller.ticket()
+        third = controller.ticket()
+
+        async def release_in_order():
+            await asyncio.sleep(0.01)
+            first.release()
+            await asyncio.sleep(0.01)
+            second.release()
+
+        releaser = asyncio.ensure_future(release_in_order())
+        positions = [p async for p in third.positions()]
+        await releaser
+        return positions, third.admitted
+
+    assert asyncio.run(main()) == ([2, 1], True)
+
+def test_classify_priority():
+    assert classify_priority("Qual o prazo?", None, interactive_max_chars=50) == 'interactive'
+    assert classify_priority("x" * 100, None, interactive_max_chars=50) == 'normal'
+    assert classify_priority("Qual o prazo?", 'bulk', interactive_max_chars=50) == 'bulk'
+    assert classify_priority("Qual o prazo?", 'urgente') == 'normal'
@@ -0,0 +1,50 @@
+import pytest
+from langchain_core.documents import Document
+from rank_bm25 import BM25Okapi
+
+from src.infra.bm25_index import BM25Index
+
+
+@pytest.fixture
+def chunks():
+    texts = [
+        "o contrato prevê multa por atraso na entrega",
+        "a entrega deve ocorrer em trinta dias",
+        "o pagamento é feito em duas parcelas",
+        "multa de dez por cento sobre o valor do contrato",
+        "cláusula de rescisão sem multa",
+    ]
+    return [Document(page_content=t, metadata={'chunk_index': i + 1}) for i, t in enumerate(texts)]
+
+def test_scores_match_rank_bm25(chunks):
+    index = BM25Index.from_documents(chunks)
+    reference = BM25Okapi([c.page_content.split() for c in chunks])
+    query = "multa por atraso no contrato"
+
+    scores = index.get_scores(query, [1, 2, 3, 4, 5])
+
+    assert scores.tolist() == pytest.approx(reference.get_scores(query.split()).tolist(), rel=1e-5)
+
+def test_top_n_only_scores_candidates(chunks):
+    index = BM25Index.from_documents(chunks)
+    candidates = [chunks[1], chunks[3], chunks[4]]
+
+    top = index.top_n("multa contrato", candidates, 2)
+
+    assert [doc.metadata['chunk_index'] for doc in top] == [4, 5]
+
+def test_unknown_chunk_ids_score_zero(chunks):
+    index = BM25Index.from_documents(chunks)
+    assert index.get_scores("multa", [999]).tolist() == [0.0]
+
+def test_save_and_load_roundtrip(chunks, tmp_path):
+    index = BM25Index.from_documents(chunks)
+    index.save(str(tmp_path))
+
+    loaded = BM25Index.load(str(tmp_path))
+
+    assert loaded is not None
+    assert loaded.get_scores("entrega em dias", [1, 2, 3]).tolist() == pytest.approx(
+        index.get_scores("entrega em dias", [1, 2, 3]).tolist()
+    )
+    assert BM25Index.load(str(tmp_path / "missing")) is None
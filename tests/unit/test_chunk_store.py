@@ -0,0 +1,50 @@
+import pickle
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+
+from src.infra.chunk_store import ChunkStore
+from src.infra.vector_store_repository import VectorStoreRepository
+
+
+def make_chunks():
+    common = {'source': 'pdfs/contrato.pdf', 'file_path': 'pdfs/contrato.pdf', 'total_pages': 2, 'title': 'Contrato'}
+    return [
+        Document(page_content="Cláusula 1 — objeto", metadata={**common, 'page': 0, 'paragraph': 1, 'chunk_index': 1}),
+        Document(page_content="", metadata={**common, 'page': 0, 'chunk_index': 2}),
+        Document(page_content="Cláusula 2 — prazo", metadata={**common, 'page': 1, 'paragraph': 2, 'chunk_index': 3, 'heading': 'Prazo'}),
+    ]
+
+def test_round_trip_preserves_text_and_metadata(tmp_path):
+    chunks = make_chunks()
+    ChunkStore.write(str(tmp_path), chunks)
+
+    store = ChunkStore.open(str(tmp_path))
+
+    assert len(store) == 3
+    assert [d.page_content for d in store] == [c.page_content for c in chunks]
+    assert [d.metadata for d in store] == [c.metadata for c in chunks]
+    assert store.chunk_ids.tolist() == [1, 2, 3]
+
+def test_metadata_override_only_replaces_existing_keys(tmp_path):
+    ChunkStore.write(str(tmp_path), make_chunks())
+    store = ChunkStore.open(str(tmp_path))
+
+    store.override_metadata(source='pdfs/copia.pdf', author='ninguém')
+
+    assert store[0].metadata['source'] == 'pdfs/copia.pdf'
+    assert 'author' not in store[0].metadata
+
+def test_legacy_pickle_indices_still_load(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=8)
+    chunks = make_chunks()
+    index_dir = tmp_path / "index_legacy"
+    FAISS.from_documents(chunks, embeddings).save_local(str(index_dir))
+    with open(index_dir / "index_chunks.pkl", "wb") as f:
+        pickle.dump(chunks, f)
+
+    store, loaded_chunks = VectorStoreRepository(str(index_dir), embeddings).load()
+
+    assert [c.page_content for c in loaded_chunks] == [c.page_content for c in chunks]
+    assert store.similarity_search("Cláusula 2 — prazo", k=1)[0].metadata['chunk_index'] == 3
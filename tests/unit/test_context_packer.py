@@ -0,0 +1,61 @@
+from langchain_core.documents import Document
+
+from src.core.context_packer import ContextPacker, HeuristicTokenCounter, remove_overlap
+
+
+class WordCounter(HeuristicTokenCounter):
+    """Uma palavra = um token, para contas fáceis de conferir."""
+    def count(self, text: str) -> int:
+        return len(text.split())
+
+def chunk(index: int, words: str, source: str = "doc.pdf") -> Document:
+    return Document(page_content=words, metadata={'source': source, 'chunk_index': index})
+
+def words(prefix: str, n: int) -> str:
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+def test_chunks_are_taken_by_relevance_within_the_budget():
+    docs = [chunk(7, words("a", 40)), chunk(2, words("b", 40)), chunk(4, words("c", 40))]
+    packer = ContextPacker(WordCounter(), context_window=150, answer_reserve_tokens=20, min_chunk_tokens=10)
+
+    packed = packer.pack(docs, prompt_overhead_tokens=30) # orçamento: 100 tokens
+
+    assert packed.budget_tokens == 100
+    assert packed.context_tokens <= packed.budget_tokens
+    # As duas mais relevantes inteiras e a terceira truncada, na ordem do documento
+    assert [d.metadata['chunk_index'] for d in packed.documents] == [2, 4, 7]
+    assert packed.truncated == 1
+    assert packed.documents[1].page_content == words("c", 20)
+    assert packed.prompt_tokens == packed.context_tokens + 30
+
+def test_chunks_that_do_not_fit_usefully_are_dropped():
+    docs = [chunk(1, words("a", 90)), chunk(5, words("b", 90))]
+    packer = ContextPacker(WordCounter(), context_window=100, answer_reserve_tokens=0, min_chunk_tokens=20)
+
+    packed = packer.pack(docs, prompt_overhead_tokens=0)
+
+    assert [d.metadata['chunk_index'] for d in packed.documents] == [1]
+    assert packed.dropped == [docs[1]]
+    assert packed.stats()['chunks_dropped'] == 1
+
+def test_overlap_between_adjacent_chunks_is_removed():
+    first = "O contrato vigora por doze meses. A multa por rescisão antecipada é de 10% do valor."
+    second = "A multa por rescisão antecipada é de 10% do valor. O foro eleito é o de São Paulo."
+    docs = [chunk(4, second), chunk(3, first), chunk(3, second, source="outro.pdf")]
+    packer = ContextPacker(HeuristicTokenCounter(), context_window=1000, answer_reserve_tokens=0)
+
+    packed = packer.pack(docs, prompt_overhead_tokens=0)
+
+    assert packed.text.count("A multa por rescisão") == 2 # uma vez por PDF
+    assert [d.page_content for d in packed.documents] == [first, "O foro eleito é o de São Paulo.", second]
+    assert packed.overlap_chars_removed == len(second) - len("O foro eleito é o de São Paulo.")
+
+def test_remove_overlap_ignores_short_coincidences():
+    assert remove_overlap("termina com a", "a seguir vem outra frase") == "a seguir vem outra frase"
+
+def test_heuristic_counter_counts_long_words_and_punctuation():
+    counter = HeuristicTokenCounter()
+
+    assert counter.count("") == 0
+    assert counter.count("casa, paralelepípedo!") == 1 + 1 + 4 + 1
+    assert counter.count(counter.truncate(words("palavra", 50), 30)) <= 30
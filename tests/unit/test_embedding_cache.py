@@ -0,0 +1,29 @@
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.infra.embedding_cache import EmbeddingCache, CachedEmbeddings
+
+
+def test_only_missing_texts_reach_the_model(tmp_path, counting_embeddings):
+    model = counting_embeddings(size=8)
+    embeddings = CachedEmbeddings(model, EmbeddingCache(str(tmp_path), "fake-model"))
+    first = embeddings.embed_documents(["aviso legal", "cláusula 1"])
+
+    second = embeddings.embed_documents(["aviso  legal\n", "cláusula 2", "cláusula 2"])
+
+    assert model.embedded == ["aviso legal", "cláusula 1", "cláusula 2"]
+    assert second[0] == first[0]
+    assert second[1] == second[2]
+    assert embeddings.cache.stats()['hits'] == 1
+
+def test_cache_is_shared_through_disk(tmp_path):
+    writer = EmbeddingCache(str(tmp_path), "fake-model")
+    vectors = DeterministicFakeEmbedding(size=8).embed_documents(["cabeçalho"])
+    writer.put_many(["cabeçalho"], vectors)
+
+    reader = EmbeddingCache(str(tmp_path), "fake-model")
+
+    cached, missing = reader.get_many(["cabeçalho", "outro"])
+    assert cached == pytest.approx(vectors[0], rel=1e-6)
+    assert missing is None
+    assert EmbeddingCache(str(tmp_path), "other-model").get_many(["cabeçalho"]) == [None]
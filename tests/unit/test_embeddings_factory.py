@@ -0,0 +1,65 @@
+import time
+import threading
+
+import pytest
+
+from src.infra.embeddings_factory import EmbeddingFactory, EmbeddingModelRegistry
+
+
+class StubModel:
+    def __init__(self, name):
+        self.name = name
+        self.queries = []
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [0.0]
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Substitui o carregamento do HuggingFace por um modelo falso lento; registra cada carga."""
+    loaded = []
+    def get_model(name, device, show_progress=True):
+        time.sleep(0.05) # Janela para as chamadas concorrentes se sobreporem
+        loaded.append((name, device))
+        return StubModel(name)
+    monkeypatch.setattr(EmbeddingFactory, "get_model", staticmethod(get_model))
+    return loaded
+
+def test_concurrent_acquires_load_the_model_once(loads):
+    registry = EmbeddingModelRegistry()
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(registry.acquire("m", "cpu"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loads == [("m", "cpu")]
+    assert len({id(model) for model in models}) == 1
+    assert registry.stats()['references'] == {"m@cpu": 8}
+
+def test_model_is_unloaded_when_its_last_reference_is_released(loads):
+    registry = EmbeddingModelRegistry()
+    first = registry.acquire("m", "cpu")
+    registry.acquire("m", "cpu")
+
+    registry.release("m", "cpu")
+    assert registry.stats() == {'models_loaded': 1, 'references': {"m@cpu": 1}, 'pinned': []}
+
+    registry.release("m", "cpu")
+    assert registry.stats() == {'models_loaded': 0, 'references': {}, 'pinned': []}
+    assert registry.acquire("m", "cpu") is not first # Carregado de novo
+    assert len(loads) == 2
+
+def test_pinned_model_survives_its_last_release(loads):
+    registry = EmbeddingModelRegistry()
+    warmed = registry.warm_up("m", "cpu")
+    registry.acquire("m", "cpu")
+
+    registry.release("m", "cpu")
+
+    assert registry.stats() == {'models_loaded': 1, 'references': {}, 'pinned': ["m@cpu"]}
+    assert registry.acquire("m", "cpu") is warmed
+    assert warmed.queries == ["warm-up"]
+    assert len(loads) == 1
@@ -0,0 +1,57 @@
+import os
+import time
+import multiprocessing
+
+from src.config.settings import settings
+from src.infra.index_catalog import IndexCatalog
+from src.utils import file_utils
+
+
+def record_many(indices_dir, pdfs_dir, worker, count):
+    catalog = IndexCatalog(indices_dir) # Uma instância por processo, como cada worker da API
+    for i in range(count):
+        pdf_path = os.path.join(pdfs_dir, f"w{worker}-{i}.pdf")
+        catalog.record_index(pdf_path, content_hash=f"{worker}{i}", index_key=f"k{worker}-{i}")
+
+def test_concurrent_processes_do_not_lose_catalog_updates(tmp_path):
+    pdfs_dir = tmp_path / "pdfs"
+    pdfs_dir.mkdir()
+    for worker in range(4):
+        for i in range(25):
+            (pdfs_dir / f"w{worker}-{i}.pdf").write_bytes(b"%PDF")
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=record_many, args=(str(tmp_path), str(pdfs_dir), w, 25)) for w in range(4)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+
+    assert len(IndexCatalog(str(tmp_path)).entries()) == 100
+
+def test_cleanup_keeps_staging_directories_of_running_builds(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INDICES_DIR", str(tmp_path / "indices"))
+    monkeypatch.setattr(settings, "PDFS_DIR", str(tmp_path / "pdfs"))
+    os.makedirs(settings.PDFS_DIR)
+    running = tmp_path / "indices" / ".staging-running"
+    interrupted = tmp_path / "indices" / ".staging-interrupted"
+    for path in (running, interrupted):
+        path.mkdir(parents=True)
+        (path / "index.faiss").write_bytes(b"x")
+    old = time.time() - 2 * file_utils.INDEX_BUILD_GRACE_SECONDS
+    os.utime(interrupted, (old, old))
+
+    file_utils.cleanup_unused_indices_cli()
+
+    assert running.exists()
+    assert not interrupted.exists()
+
+def test_content_hash_stays_referenced_while_another_pdf_has_the_same_bytes(tmp_path):
+    catalog = IndexCatalog(str(tmp_path))
+    a, b = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    for path in (a, b):
+        path.write_bytes(b"%PDF")
+        catalog.remember_content_hash(str(path), "antigo")
+
+    catalog.remember_content_hash(str(a), "novo") # a.pdf foi reenviado com outro conteúdo
+
+    assert catalog.referenced_content_hashes() == {"antigo", "novo"}
@@ -0,0 +1,47 @@
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.infra.chunk_strategies import ChunkStrategyFactory
+from src.infra.ingestion_pipeline import IngestionPipeline, PreviousPages
+
+
+def make_pages(texts):
+    return [Document(page_content=t, metadata={'page': i, 'total_pages': len(texts)}) for i, t in enumerate(texts)]
+
+@pytest.fixture
+def strategy():
+    return ChunkStrategyFactory.get_strategy(mode='paragraphs')
+
+def test_pipeline_matches_batch_split_and_embeds_in_batches(strategy, counting_embeddings):
+    texts = [f"Parágrafo um da página {i}.\n\nParágrafo dois da página {i}." for i in range(5)]
+    embeddings = counting_embeddings(size=8)
+
+    result = IngestionPipeline(strategy, embeddings, batch_size=4, queue_size=2).run(iter(make_pages(texts)))
+
+    expected = strategy.split(make_pages(texts))
+    assert [c.page_content for c in result.chunks] == [c.page_content for c in expected]
+    assert [c.metadata['chunk_index'] for c in result.chunks] == list(range(1, 11))
+    assert result.index.index.ntotal == 10
+    assert embeddings.batches == [4, 4, 2]
+    assert [p['chunk_start'] for p in result.page_fingerprints] == [0, 2, 4, 6, 8]
+
+def test_unchanged_pages_reuse_previous_vectors(strategy, counting_embeddings):
+    embeddings = counting_embeddings(size=8)
+    first = IngestionPipeline(strategy, embeddings).run(make_pages(["página A", "página B", "página C"]))
+    previous = PreviousPages(first.chunks, first.index.index.reconstruct_n(0, 3), first.page_fingerprints)
+    embeddings.batches.clear()
+
+    second = IngestionPipeline(strategy, embeddings).run(make_pages(["página A", "página B revisada", "página C"]), previous)
+
+    assert second.pages_reused == 2
+    assert second.chunks_embedded == 1
+    assert embeddings.batches == [1]
+
+def test_extraction_errors_are_propagated(strategy):
+    def failing_pages():
+        yield make_pages(["página A"])[0]
+        raise RuntimeError("PDF corrompido")
+
+    with pytest.raises(RuntimeError, match="PDF corrompido"):
+        IngestionPipeline(strategy, DeterministicFakeEmbedding(size=8)).run(failing_pages())
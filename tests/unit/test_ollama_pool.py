@@ -0,0 +1,163 @@
+import json
+import time
+import socket
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.core.event_manager import EventManager, Observer
+from src.core.llm_client import GenerationOptions, LLMClient
+from src.core.ollama_pool import OllamaClientPool
+from src.core.prompt_builder import PromptBuilder
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Responde a /api/chat como o Ollama (NDJSON em streaming), identificando o servidor na resposta."""
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests += 1
+        self.server.last_request = request
+        name = self.server.name
+        self.send_response(200)
+        if request.get('stream'):
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.end_headers()
+            try:
+                for part in [name] * self.server.repeat + [""]:
+                    line = {'model': request['model'], 'message': {'role': 'assistant', 'content': part}, 'done': part == ""}
+                    self.wfile.write((json.dumps(line) + "\n").encode())
+                    self.wfile.flush()
+                    time.sleep(self.server.delay)
+            except (BrokenPipeError, ConnectionResetError):
+                self.server.aborted = True # o cliente fechou o stream no meio
+        else:
+            body = json.dumps({'model': request['model'], 'message': {'role': 'assistant', 'content': name}, 'done': True}).encode()
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def fake_servers():
+    servers = []
+    for name in ("a", "b"):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+        server.name, server.requests = name, 0
+        server.repeat, server.delay, server.aborted = 1, 0.0, False
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    yield servers
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+class Recorder(Observer):
+    def __init__(self):
+        self.events = []
+
+    def update(self, event_type, data=None):
+        self.events.append(data)
+
+def host_of(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+def unused_host():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+async def chat(pool, stream=False):
+    async with pool.endpoint() as endpoint:
+        if not stream:
+            return (await endpoint.client.chat(model="m", messages=[], stream=False))['message']['content']
+        return "".join([chunk['message']['content'] async for chunk in await endpoint.client.chat(model="m", messages=[], stream=True)])
+
+def test_requests_are_spread_over_all_hosts(fake_servers):
+    pool = OllamaClientPool([host_of(s) for s in fake_servers], timeout=5)
+
+    async def main():
+        return [await chat(pool, stream=i % 2 == 0) for i in range(6)]
+
+    answers = asyncio.run(main())
+
+    assert sorted(answers) == ["a", "a", "a", "b", "b", "b"]
+    assert [s.requests for s in fake_servers] == [3, 3]
+
+def test_least_outstanding_host_is_picked():
+    pool = OllamaClientPool(["http://a:1", "http://b:1"], timeout=5)
+    pool.endpoints[0].outstanding = 2
+
+    assert all(pool.pick() is pool.endpoints[1] for _ in range(4))
+
+def test_failing_host_is_ejected(fake_servers):
+    pool = OllamaClientPool([unused_host(), host_of(fake_servers[0])], timeout=5, max_failures=2, ejection_seconds=60)
+    dead = pool.endpoints[0]
+
+    async def main():
+        answers = []
+        for _ in range(8):
+            try:
+                answers.append(await chat(pool))
+            except Exception:
+                answers.append(None)
+        return answers
+
+    answers = asyncio.run(main())
+
+    assert answers.count(None) == 2 # só até a ejeção
+    assert pool.stats()['endpoints'][0]['healthy'] is False
+    assert dead.requests == 2
+
+def test_llm_client_retries_on_another_host_before_streaming(fake_servers):
+    client = LLMClient(event_manager=EventManager(), prompt_builder=PromptBuilder())
+    client.pool = OllamaClientPool([unused_host(), host_of(fake_servers[1])], timeout=5)
+    client.pool._rotation = iter([0, 0]) # começa pelo host fora do ar
+
+    async def main():
+        return "".join([part async for part in client.generate("contexto", "pergunta")])
+
+    assert asyncio.run(main()) == "b"
+    assert client.pool.endpoints[0].failures == 1
+
+def test_llm_client_sends_generation_options_and_reports_ttft(fake_servers):
+    events, recorder = EventManager(), Recorder()
+    events.subscribe('generation_first_token', recorder)
+    client = LLMClient(event_manager=events, prompt_builder=PromptBuilder(layout="system_prefix"))
+    client.pool = OllamaClientPool([host_of(fake_servers[0])], timeout=5)
+    client.options = GenerationOptions(keep_alive="-1", num_ctx=2048)
+
+    async def main():
+        return "".join([part async for part in client.generate("contexto", "pergunta", options=GenerationOptions(num_predict=64))])
+
+    assert asyncio.run(main()) == "a"
+    request = fake_servers[0].last_request
+    assert request['options'] == {'num_ctx': 2048, 'num_predict': 64}
+    assert request['keep_alive'] == -1
+    assert request['messages'][0] == {'role': 'system', 'content': PromptBuilder.BASE_INSTRUCTIONS}
+    assert len(recorder.events) == 1 and recorder.events[0]['ttft'] >= 0
+
+def test_closing_the_stream_cancels_the_generation(fake_servers):
+    server = fake_servers[0]
+    server.repeat, server.delay = 200, 0.02
+    events, recorder = EventManager(), Recorder()
+    events.subscribe('generation_cancelled', recorder)
+    client = LLMClient(event_manager=events, prompt_builder=PromptBuilder())
+    client.pool = OllamaClientPool([host_of(server)], timeout=5)
+
+    async def main():
+        stream = client.generate("contexto", "pergunta")
+        assert await stream.__anext__() == "a"
+        await stream.aclose() # p.ex. o cliente do /ask desconectou
+        await asyncio.sleep(0.2)
+
+    asyncio.run(main())
+
+    assert recorder.events[0]['answer_length'] == 1
+    assert server.aborted
+    assert client.pool.endpoints[0].outstanding == 0
+    assert client.admission.active == 0
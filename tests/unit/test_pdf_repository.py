@@ -0,0 +1,37 @@
+import pymupdf
+
+from src.infra.pdf_repository import PDFRepository
+
+
+def make_pdf(path, page_count):
+    doc = pymupdf.open()
+    for i in range(page_count):
+        doc.new_page().insert_text((72, 72), f"Página {i + 1}: cláusula {i} do contrato.")
+    doc.set_metadata({'title': 'Contrato de teste', 'author': 'QA', 'creationDate': "D:20240131120000+03'00'"})
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+def test_parallel_extraction_matches_serial_loader(tmp_path):
+    pdf_path = make_pdf(tmp_path / "contrato.pdf", 9)
+
+    serial = PDFRepository(workers=1).load(pdf_path)
+    parallel = PDFRepository(workers=2, parallel_min_pages=1).load(pdf_path)
+
+    assert [d.page_content for d in parallel] == [d.page_content for d in serial]
+    assert [d.metadata for d in parallel] == [d.metadata for d in serial]
+    assert [d.metadata['page'] for d in parallel] == list(range(9))
+
+def test_parallel_extraction_metadata_keys(tmp_path):
+    pdf_path = make_pdf(tmp_path / "contrato.pdf", 2)
+
+    first, _ = PDFRepository(workers=2, parallel_min_pages=1).load(pdf_path)
+
+    # Chaves usadas adiante (fontes, chunking, reindexação): não podem depender de detalhes internos do LangChain
+    assert set(first.metadata) == {
+        'source', 'file_path', 'page', 'total_pages', 'format', 'title', 'author', 'subject', 'keywords',
+        'producer', 'creator', 'creationdate', 'moddate', 'trapped', 'creationDate', 'modDate'
+    }
+    assert (first.metadata['source'], first.metadata['page'], first.metadata['total_pages']) == (pdf_path, 0, 2)
+    assert first.metadata['creationdate'] == "2024-01-31T12:00:00+03:00"
+    assert first.metadata['title'] == "Contrato de teste"
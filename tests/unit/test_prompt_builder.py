@@ -22,4 +22,20 @@ def test_prompt_builder_handles_empty_context_and_question():
     assert "Pergunta: \n\n" in prompt # Empty question
     assert prompt.endswith("Resposta:")
 
+def test_system_prefix_layout_keeps_instructions_byte_identical():
+    builder = PromptBuilder(layout="system_prefix")
+
+    first = builder.build_messages("contexto A", "pergunta 1")
+    second = builder.build_messages("contexto B", "pergunta 2")
+
+    assert [m['role'] for m in first] == ['system', 'user']
+    assert first[0] == second[0] == {'role': 'system', 'content': PromptBuilder.BASE_INSTRUCTIONS}
+    assert first[1]['content'] == "Contexto: contexto A\n\nPergunta: pergunta 1\n\nResposta:"
+
+def test_single_message_layout_sends_the_whole_prompt_as_user_message():
+    builder = PromptBuilder(layout="single_message")
+
+    assert builder.build_messages("ctx", "q") == [{'role': 'user', 'content': builder.build("ctx", "q")}]
+    assert builder.version != PromptBuilder(layout="system_prefix").version
+
 # Add more tests for edge cases or different instruction sets if PromptBuilder evolves.
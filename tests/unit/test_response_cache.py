@@ -0,0 +1,53 @@
+import time
+
+from src.core.response_cache import MemoryResponseCache, SQLiteResponseCache, response_cache_key
+
+
+def make_entry(answer="Prazo de 30 dias."):
+    sources = ["Fonte: contrato.pdf, Página 2"]
+    return {
+        'final_answer': answer,
+        'sources': sources,
+        'streamed_parts': [("sources", {"sources": sources}), ("text_chunk", {"chunk": answer})]
+    }
+
+def test_key_depends_on_content_model_prompt_and_question():
+    base = response_cache_key("abc", "llama3.2", "1", "Qual o prazo?")
+
+    assert base == response_cache_key("abc", "llama3.2", "1", "Qual o prazo?")
+    assert base != response_cache_key("def", "llama3.2", "1", "Qual o prazo?")
+    assert base != response_cache_key("abc", "mistral", "1", "Qual o prazo?")
+    assert base != response_cache_key("abc", "llama3.2", "2", "Qual o prazo?")
+
+def test_sqlite_entries_are_shared_between_connections_and_replay_the_stream(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    SQLiteResponseCache(path, max_entries=10, ttl_seconds=60).set("k", make_entry(), content_hash="abc")
+
+    other_worker = SQLiteResponseCache(path, max_entries=10, ttl_seconds=60)
+
+    assert other_worker.get("k") == make_entry()
+
+def test_sqlite_expires_and_evicts_least_recently_used(tmp_path):
+    cache = SQLiteResponseCache(str(tmp_path / "responses.sqlite3"), max_entries=2, ttl_seconds=60)
+    cache.set("a", make_entry("a"))
+    cache.set("b", make_entry("b"))
+    time.sleep(0.01)
+    cache.get("a") # 'b' becomes the least recently used
+    cache.set("c", make_entry("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+    cache.ttl_seconds = 0.01
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+def test_invalidate_only_drops_entries_of_that_pdf(tmp_path):
+    for cache in (MemoryResponseCache(10, 60), SQLiteResponseCache(str(tmp_path / "r.sqlite3"), 10, 60)):
+        cache.set("a", make_entry(), content_hash="pdf-a")
+        cache.set("b", make_entry(), content_hash="pdf-b")
+
+        cache.invalidate("pdf-a")
+
+        assert cache.get("a") is None
+        assert cache.get("b") == make_entry()
@@ -0,0 +1,39 @@
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+
+from src.infra.embedding_cache import QueryEmbeddingCache
+from src.infra.retriever_strategies import HybridRetrieverStrategy
+
+
+def make_strategy(embeddings, threshold=float('inf')):
+    texts = ["multa por atraso", "prazo de entrega", "forma de pagamento", "rescisão do contrato"]
+    chunks = [Document(page_content=t, metadata={'chunk_index': i + 1}) for i, t in enumerate(texts)]
+    store = FAISS.from_documents(chunks, embeddings)
+    return HybridRetrieverStrategy(store, threshold=threshold, initial_k=3, final_k=2, documents=chunks)
+
+def test_batched_search_matches_one_query_at_a_time(counting_embeddings):
+    embeddings = counting_embeddings(size=16)
+    strategy = make_strategy(embeddings)
+    queries = ["multa por atraso?", "prazo de entrega?", "forma de pagamento?"]
+    embeddings.batches.clear()
+
+    candidates = strategy.search_many(queries)
+
+    assert embeddings.batches == [3]
+    for query, query_candidates in zip(queries, candidates):
+        assert strategy.rerank(query, query_candidates) == strategy.retrieve(query)
+
+def test_query_embeddings_are_served_from_the_shared_cache(counting_embeddings):
+    embeddings = counting_embeddings(size=16)
+    cache = QueryEmbeddingCache(max_entries=10)
+    first = make_strategy(embeddings)
+    second = make_strategy(embeddings) # outro PDF, mesmo modelo
+    first.query_cache = second.query_cache = cache
+    embeddings.batches.clear()
+
+    expected = [d.page_content for d in first.retrieve("multa por atraso?")]
+    assert [d.page_content for d in second.retrieve("multa  por atraso?")] == expected
+    second.search_many(["multa por atraso?", "prazo de entrega?"])
+
+    assert embeddings.batches == [1, 1]
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 2
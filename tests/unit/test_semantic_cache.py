@@ -0,0 +1,35 @@
+import numpy as np
+
+from src.core.semantic_cache import SemanticResponseCache
+
+
+def test_hit_above_threshold_and_miss_below():
+    cache = SemanticResponseCache(threshold=0.9, max_entries=10)
+    cache.store([1.0, 0.0, 0.0], "What is the deadline?", {'final_answer': "30 dias"})
+
+    value, question, similarity = cache.lookup([0.95, 0.05, 0.0])
+    assert value == {'final_answer': "30 dias"}
+    assert question == "What is the deadline?"
+    assert similarity > 0.9
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+def test_evicts_oldest_entries_and_clears():
+    cache = SemanticResponseCache(threshold=0.99, max_entries=2)
+    for i, vector in enumerate(np.eye(3)):
+        cache.store(vector, f"q{i}", i)
+
+    assert len(cache) == 2
+    assert cache.lookup(np.eye(3)[0]) is None
+    assert cache.lookup(np.eye(3)[2])[0] == 2
+
+    cache.clear()
+    assert cache.lookup(np.eye(3)[2]) is None
+
+def test_expired_entries_are_not_served():
+    cache = SemanticResponseCache(threshold=0.9, max_entries=10, ttl_seconds=1)
+    cache.store([1.0, 0.0], "q", "resposta")
+    cache._entries[0] = ("q", "resposta", 0.0) # gravado há muito tempo
+
+    assert cache.lookup([1.0, 0.0]) is None
+    assert len(cache) == 0
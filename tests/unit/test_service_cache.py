@@ -0,0 +1,92 @@
+from src.core.service_cache import ServiceCache
+
+
+class FakeIndexService:
+    def __init__(self, size: int = 0):
+        self.size = size
+        self.closed = False
+
+    def estimate_memory_bytes(self) -> int:
+        return self.size
+
+    def close(self):
+        self.closed = True
+
+def make_pair(size: int = 0):
+    return (FakeIndexService(size), object())
+
+def test_evicts_least_recently_used_by_count():
+    cache = ServiceCache(max_entries=2)
+    a, b, c = make_pair(), make_pair(), make_pair()
+    cache.put("a.pdf", a)
+    cache.put("b.pdf", b)
+    cache.get("a.pdf") # 'a' becomes most recently used
+
+    cache.put("c.pdf", c)
+
+    assert "b.pdf" not in cache
+    assert "a.pdf" in cache and "c.pdf" in cache
+    assert b[0].closed and not a[0].closed
+    assert cache.stats()['evictions'] == 1
+
+def test_evicts_by_byte_budget_but_keeps_newest_entry():
+    cache = ServiceCache(max_entries=10, max_bytes=100)
+    small = make_pair(60)
+    huge = make_pair(500)
+    cache.put("small.pdf", small)
+
+    cache.put("huge.pdf", huge)
+
+    assert "small.pdf" not in cache
+    assert "huge.pdf" in cache
+    assert small[0].closed and not huge[0].closed
+
+def test_replacing_entry_closes_previous_services():
+    cache = ServiceCache(max_entries=2)
+    old, new = make_pair(), make_pair()
+    cache.put("a.pdf", old)
+
+    cache.put("a.pdf", new)
+
+    assert old[0].closed and not new[0].closed
+    assert cache.get("a.pdf") is new
+
+def test_hit_and_miss_counters():
+    cache = ServiceCache(max_entries=2)
+    cache.put("a.pdf", make_pair())
+    cache.get("a.pdf")
+    cache.get("missing.pdf")
+
+    stats = cache.stats()
+
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['hit_rate'] == 0.5
+
+def test_services_evicted_while_in_use_are_closed_by_their_last_user():
+    cache = ServiceCache(max_entries=1)
+    a = make_pair()
+    cache.put("a.pdf", a)
+
+    with cache.in_use(a):
+        with cache.in_use(a):
+            cache.put("b.pdf", make_pair()) # 'a' is evicted while two requests still use it
+        assert "a.pdf" not in cache
+        assert not a[0].closed
+        assert cache.stats()['retired_in_use'] == 1
+
+    assert a[0].closed
+    assert cache.stats()['in_use'] == 0 and cache.stats()['retired_in_use'] == 0
+
+def test_retire_closes_popped_services_once_unused():
+    cache = ServiceCache(max_entries=2)
+    busy, idle = make_pair(), make_pair()
+    cache.put("busy.pdf", busy)
+    cache.put("idle.pdf", idle)
+
+    with cache.in_use(busy):
+        cache.retire(cache.pop("busy.pdf"))
+        cache.retire(cache.pop("idle.pdf"))
+        assert idle[0].closed and not busy[0].closed
+
+    assert busy[0].closed
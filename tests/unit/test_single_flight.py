@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from src.core.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call_and_its_result():
+    calls = []
+
+    async def load():
+        calls.append("load")
+        await asyncio.sleep(0.05)
+        return object()
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.run("a.pdf", load) for _ in range(5)))
+        return results, flight.in_flight("a.pdf")
+
+    results, still_in_flight = asyncio.run(main())
+
+    assert calls == ["load"]
+    assert all(result is results[0] for result in results)
+    assert not still_in_flight
+
+def test_exception_reaches_every_caller():
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise FileNotFoundError("a.pdf")
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(*(flight.run("a.pdf", failing) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+
+    assert len(results) == 3
+    assert all(isinstance(result, FileNotFoundError) for result in results)
+
+@pytest.mark.parametrize("load_fails", [False, True])
+def test_without_join_existing_the_call_waits_for_the_in_flight_one_and_runs_its_own(load_fails):
+    timeline = []
+
+    async def load():
+        timeline.append("load started")
+        await asyncio.sleep(0.05)
+        timeline.append("load finished")
+        if load_fails:
+            raise RuntimeError("índice corrompido")
+        return "loaded"
+
+    async def rebuild():
+        timeline.append("rebuild started") # Nunca escreve no diretório enquanto o load roda
+        return "rebuilt"
+
+    async def main():
+        flight = SingleFlight()
+        loading = asyncio.ensure_future(flight.run("a.pdf", load))
+        await asyncio.sleep(0) # O load já está em andamento
+        rebuilt = await flight.run("a.pdf", rebuild, join_existing=False)
+        return await asyncio.gather(loading, return_exceptions=True), rebuilt
+
+    (loaded,), rebuilt = asyncio.run(main())
+
+    assert timeline == ["load started", "load finished", "rebuild started"]
+    assert rebuilt == "rebuilt"
+    assert isinstance(loaded, RuntimeError) if load_fails else loaded == "loaded"
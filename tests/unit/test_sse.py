@@ -0,0 +1,102 @@
+import json
+import asyncio
+
+from src.api.sse import SSEWriter, sse_frame
+
+
+def parse(frames):
+    events = []
+    for frame in "".join(frames).split("\n\n"):
+        if frame:
+            event_line, data_line = frame.split("\n")
+            events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+def test_text_chunks_are_batched_and_order_is_kept():
+    async def events():
+        yield "sources", {"sources": ["Fonte: a.pdf"]}
+        for token in ("Olá", ", ", "mundo", "!"):
+            yield "text_chunk", {"chunk": token}
+        yield "end_stream", {"message": "Stream ended."}
+
+    async def main():
+        return [frame async for frame in SSEWriter(flush_interval=10).stream(events())]
+
+    frames = asyncio.run(main())
+
+    assert parse(frames) == [
+        ("sources", {"sources": ["Fonte: a.pdf"]}),
+        ("text_chunk", {"chunk": "Olá"}), # o primeiro token não espera a janela
+        ("text_chunk", {"chunk": ", mundo!"}),
+        ("end_stream", {"message": "Stream ended."}),
+    ]
+    assert len(frames) == 3 # o texto pendente e o end_stream saem numa única escrita
+
+def test_pending_text_is_flushed_when_the_window_ends():
+    async def events():
+        for token in ("a", "b", "c"):
+            yield "text_chunk", {"chunk": token}
+        await asyncio.sleep(0.2)
+        yield "end_stream", {}
+
+    async def main():
+        received = []
+        async for frame in SSEWriter(flush_interval=0.02).stream(events()):
+            received.append((asyncio.get_running_loop().time(), frame))
+        return received
+
+    received = asyncio.run(main())
+
+    assert [frame for _, frame in received[:2]] == [sse_frame("text_chunk", {"chunk": "a"}), sse_frame("text_chunk", {"chunk": "bc"})]
+    assert received[2][0] - received[1][0] > 0.1 # "bc" não esperou o próximo evento
+
+def test_slow_client_pauses_the_producer_and_closing_cancels_it():
+    produced = []
+
+    async def events():
+        for i in range(100):
+            produced.append(i)
+            yield "queue_position", {"position": i}
+
+    async def main():
+        stream = SSEWriter(max_buffered_events=4).stream(events())
+        await stream.__anext__()
+        await asyncio.sleep(0.05) # cliente lento: não lê
+        buffered = len(produced)
+        await stream.aclose() # cliente desconectou
+        await asyncio.sleep(0.05)
+        return buffered
+
+    buffered = asyncio.run(main())
+
+    assert buffered <= 4 + 2
+    assert len(produced) == buffered
+
+def test_disconnected_client_cancels_the_event_stream():
+    cancelled = []
+    disconnected = False
+
+    async def events():
+        yield "sources", {"sources": []}
+        try:
+            await asyncio.sleep(10) # p.ex. esperando uma vaga no LLM, sem nada para escrever
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        yield "text_chunk", {"chunk": "nunca enviado"}
+
+    async def is_disconnected():
+        return disconnected
+
+    async def main():
+        nonlocal disconnected
+        frames = []
+        async for frame in SSEWriter(disconnect_poll_interval=0.01).stream(events(), is_disconnected):
+            frames.append(frame)
+            disconnected = True
+        return frames
+
+    frames = asyncio.run(asyncio.wait_for(main(), 2))
+
+    assert parse(frames) == [("sources", {"sources": []})]
+    assert cancelled == [True]
@@ -0,0 +1,96 @@
+import asyncio
+
+from src.core.stream_coalescer import StreamCoalescer
+
+
+def test_concurrent_streams_share_one_run_and_late_joiners_get_the_prefix():
+    runs = []
+
+    async def generate():
+        runs.append(1)
+        for i in range(4):
+            yield i
+            await asyncio.sleep(0.01)
+
+    async def collect(coalescer, delay=0.0):
+        await asyncio.sleep(delay)
+        return [item async for item in coalescer.stream("pergunta", generate)]
+
+    async def main():
+        coalescer = StreamCoalescer()
+        results = await asyncio.gather(collect(coalescer), collect(coalescer, delay=0.025))
+        return coalescer, results
+
+    coalescer, results = asyncio.run(main())
+
+    assert runs == [1]
+    assert results == [[0, 1, 2, 3], [0, 1, 2, 3]]
+    assert not coalescer.in_flight("pergunta")
+
+def test_errors_reach_every_subscriber():
+    async def generate():
+        yield "sources"
+        await asyncio.sleep(0.01)
+        raise RuntimeError("Ollama indisponível")
+
+    async def collect(coalescer):
+        return [item async for item in coalescer.stream("pergunta", generate)]
+
+    async def main():
+        coalescer = StreamCoalescer()
+        return await asyncio.gather(collect(coalescer), collect(coalescer), return_exceptions=True)
+
+    results = asyncio.run(main())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+def test_run_continues_while_a_subscriber_remains():
+    produced = []
+
+    async def generate():
+        for i in range(3):
+            await asyncio.sleep(0.01)
+            produced.append(i)
+            yield i
+
+    async def main():
+        coalescer = StreamCoalescer()
+        leaving = coalescer.stream("pergunta", generate)
+        staying = asyncio.ensure_future(collect(coalescer.stream("pergunta", generate)))
+        assert await leaving.__anext__() == 0
+        await leaving.aclose() # um dos clientes desconectou
+        return await staying
+
+    async def collect(stream):
+        return [item async for item in stream]
+
+    assert asyncio.run(main()) == [0, 1, 2]
+    assert produced == [0, 1, 2]
+
+def test_run_is_cancelled_when_every_subscriber_leaves():
+    produced = []
+    cancelled = []
+
+    async def generate():
+        try:
+            for i in range(3):
+                await asyncio.sleep(0.01)
+                produced.append(i)
+                yield i
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main():
+        coalescer = StreamCoalescer()
+        stream = coalescer.stream("pergunta", generate)
+        assert await stream.__anext__() == 0
+        await stream.aclose() # cliente desconectou
+        await asyncio.sleep(0.05)
+        return coalescer
+
+    coalescer = asyncio.run(main())
+
+    assert produced == [0]
+    assert cancelled == [True]
+    assert not coalescer.in_flight("pergunta")
@@ -0,0 +1,51 @@
+import io
+import os
+import asyncio
+import hashlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.datastructures import UploadFile
+
+from src.api.upload_limit import UploadSizeLimitMiddleware
+from src.utils.file_utils import save_upload_streaming, UploadTooLargeError
+
+
+def save(content: bytes, target, max_bytes: int):
+    upload = UploadFile(io.BytesIO(content), filename="doc.pdf")
+    return asyncio.run(save_upload_streaming(upload, str(target), max_bytes=max_bytes, chunk_size=7))
+
+def test_upload_is_saved_with_its_size_and_sha256(tmp_path):
+    content = b"%PDF-1.4 conteudo de teste " * 10
+
+    size, content_hash = save(content, tmp_path / "doc.pdf", max_bytes=len(content))
+
+    assert (size, content_hash) == (len(content), hashlib.sha256(content).hexdigest())
+    assert (tmp_path / "doc.pdf").read_bytes() == content
+
+def test_oversized_upload_keeps_the_existing_file_and_leaves_no_part_file(tmp_path):
+    target = tmp_path / "doc.pdf"
+    target.write_bytes(b"versao anterior")
+
+    with pytest.raises(UploadTooLargeError):
+        save(b"x" * 100, target, max_bytes=50)
+
+    assert target.read_bytes() == b"versao anterior"
+    assert os.listdir(tmp_path) == ["doc.pdf"] # nenhum .upload-*.part sobrando
+
+def test_middleware_refuses_declared_oversized_bodies_before_the_endpoint():
+    app = FastAPI()
+    calls = []
+
+    @app.post("/upload-pdf/")
+    async def upload():
+        calls.append(True)
+        return {}
+
+    app.add_middleware(UploadSizeLimitMiddleware, path="/upload-pdf/", max_bytes=1024 * 1024)
+    client = TestClient(app)
+
+    assert client.post("/upload-pdf/", content=b"x" * (2 * 1024 * 1024)).status_code == 413
+    assert client.post("/upload-pdf/", content=b"x" * 1024).status_code == 200
+    assert calls == [True]
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.infra.chunk_strategies import ChunkStrategyFactory
+from src.infra.ingestion_pipeline import IngestionPipeline
+from src.infra.vector_index_factory import VectorIndexOptions, resolve_index_type, index_type_of
+from src.infra.vector_store_repository import VectorStoreRepository
+
+
+class TableEmbeddings(DeterministicFakeEmbedding):
+    """Embeddings fixed in advance: "chunk {i}" maps to row i of `vectors`."""
+    def __init__(self, vectors):
+        super().__init__(size=vectors.shape[1])
+        self.__dict__['vectors'] = vectors
+
+    def embed_documents(self, texts):
+        return [self.vectors[int(text.split()[1])].tolist() for text in texts]
+
+def test_auto_uses_flat_for_small_documents_and_ann_for_large():
+    options = VectorIndexOptions(index_type="auto", auto_ann_min_chunks=1000)
+
+    assert resolve_index_type(options, 999) == "flat"
+    assert resolve_index_type(options, 1000) == "hnsw"
+    assert resolve_index_type(VectorIndexOptions(index_type="ivfpq"), 100) == "flat" # Too few vectors to train
+
+@pytest.mark.parametrize("index_type", ["ivfflat", "hnsw", "ivfpq"])
+def test_ann_index_keeps_docstore_mapping_and_l2_scores(tmp_path, index_type):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(10000, 16)).astype(np.float32)
+    pages = (Document(page_content=f"chunk {i}", metadata={'page': i}) for i in range(len(vectors)))
+    options = VectorIndexOptions(index_type=index_type, nprobe=64, pq_m=8)
+    repo = VectorStoreRepository(str(tmp_path / "index"), DeterministicFakeEmbedding(size=16), index_options=options)
+    # Same build path as IndexService._create_index
+    pipeline = IngestionPipeline(ChunkStrategyFactory.get_strategy(mode='paragraphs'), TableEmbeddings(vectors), batch_size=1024)
+    result = pipeline.run(pages)
+    repo.save(repo.optimize_index(result.index), result.chunks, result.page_fingerprints)
+
+    store, _ = VectorStoreRepository(str(tmp_path / "index"), DeterministicFakeEmbedding(size=16), index_options=options).load()
+    (doc, score), = store.similarity_search_with_score_by_vector(vectors[42].tolist(), k=1)
+
+    assert index_type_of(store.index) == index_type
+    assert doc.metadata['chunk_index'] == 43
+    # Exact L2 for flat-storage indices; PQ scores are approximate but still L2-scaled
+    assert score == pytest.approx(0.0, abs=1e-4 if index_type != "ivfpq" else 5.0)
@@ -0,0 +1,72 @@
+import os
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.infra.chunk_strategies import ChunkStrategyFactory
+from src.infra.ingestion_pipeline import IngestionPipeline
+from src.infra.vector_store_repository import VectorStoreRepository
+
+
+def make_pages():
+    texts = ["primeira página", "segunda página, parte um\n\nsegunda página, parte dois"]
+    return [Document(page_content=t, metadata={'page': i, 'total_pages': len(texts)}) for i, t in enumerate(texts)]
+
+def build(repo: VectorStoreRepository, page_fingerprints: bool = True):
+    """Constrói o índice pelo mesmo caminho do IndexService._create_index: pipeline, otimização e save."""
+    result = IngestionPipeline(ChunkStrategyFactory.get_strategy(mode='paragraphs'), repo.embeddings).run(make_pages())
+    index = repo.optimize_index(result.index)
+    repo.save(index, result.chunks, result.page_fingerprints if page_fingerprints else None)
+    return result
+
+def test_load_for_reuse_round_trips_vectors_and_page_fingerprints(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=8)
+    repo = VectorStoreRepository(storage_path=str(tmp_path / "index_x"), embeddings=embeddings)
+    result = build(repo)
+    vectors = result.index.index.reconstruct_n(0, result.index.index.ntotal)
+
+    loaded_chunks, loaded_vectors, loaded_pages = VectorStoreRepository(
+        storage_path=str(tmp_path / "index_x"), embeddings=embeddings
+    ).load_for_reuse()
+
+    assert [c.page_content for c in loaded_chunks] == [c.page_content for c in result.chunks]
+    assert (loaded_vectors == vectors).all()
+    assert loaded_pages == result.page_fingerprints
+    assert [(p['chunk_start'], p['chunk_count']) for p in loaded_pages] == [(0, 1), (1, 2)]
+
+def test_load_for_reuse_skips_indices_without_fingerprints(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=8)
+    repo = VectorStoreRepository(storage_path=str(tmp_path / "index_old"), embeddings=embeddings)
+    build(repo, page_fingerprints=False)
+
+    assert repo.load_for_reuse() is None
+
+def test_mmap_load_serves_the_same_results(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=8)
+    build(VectorStoreRepository(storage_path=str(tmp_path / "index_x"), embeddings=embeddings))
+
+    mapped_repo = VectorStoreRepository(storage_path=str(tmp_path / "index_x"), embeddings=embeddings, mmap=True)
+    mapped, _ = mapped_repo.load()
+    heap, _ = VectorStoreRepository(storage_path=str(tmp_path / "index_x"), embeddings=embeddings).load()
+
+    assert mapped_repo.memory_mapped
+    query = "segunda página"
+    assert mapped.similarity_search_with_score(query, k=3) == heap.similarity_search_with_score(query, k=3)
+
+def test_save_replaces_an_existing_index_and_keeps_a_concurrently_published_one(tmp_path, monkeypatch):
+    embeddings = DeterministicFakeEmbedding(size=8)
+    path = str(tmp_path / "index_x")
+    repo = VectorStoreRepository(storage_path=path, embeddings=embeddings)
+    result = build(repo)
+    build(repo) # Reindexação sobre um diretório existente
+
+    real_rename = os.rename
+    def rename_after_other_worker(src, dst):
+        if os.path.basename(src).startswith(".staging-") and not os.path.exists(dst):
+            real_rename(path + "-other", dst) # Outro worker publicou o mesmo índice entre os dois renames
+        real_rename(src, dst)
+    build(VectorStoreRepository(storage_path=path + "-other", embeddings=embeddings))
+    monkeypatch.setattr(os, "rename", rename_after_other_worker)
+    repo.save(result.index, result.chunks, result.page_fingerprints)
+
+    assert sorted(os.listdir(tmp_path)) == ["index_x"] # Sem staging nem índice antigo sobrando
+    assert len(VectorStoreRepository(storage_path=path, embeddings=embeddings).load()[1]) == 3